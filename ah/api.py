@@ -1,18 +1,32 @@
 from __future__ import annotations
+import json
 import logging
 import requests
 from requests.adapters import HTTPAdapter, Retry
-from typing import Dict, Any, List, Tuple, Generator
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    Any,
+    List,
+    Tuple,
+    Generator,
+    Iterator,
+    Optional,
+)
 from urllib.parse import urlparse
 from enum import Enum
 
 from semver import Version
 
 from ah import config, __version__
-from ah.vendors.blizzardapi import BlizzardApi
+from ah.vendors.blizzardapi import BlizzardApi, AsyncWowGameDataApi
 from ah.models import Namespace
 from ah.cache import bound_cache, BoundCacheMixin, Cache
 from ah.defs import SECONDS_IN
+from ah.throttle import TokenBucket
+from ah.storage import ZstdCodec
+from ah.errors import NotModifiedError
 
 __all__ = (
     "BNAPI",
@@ -22,50 +36,431 @@ __all__ = (
 
 
 class BNAPI(BoundCacheMixin):
+    # validators of last saved auctions / commodities response are kept this long
+    VALIDATORS_EXPIRES_IN = config.DEFAULT_CACHE_EXPIRES_IN
+    # auctions / commodities response bodies are cached this long
+    BODY_EXPIRES_IN = SECONDS_IN.HOUR
+    BODY_CHUNK_SIZE = 64 * 1024
+
     def __init__(
-        self, client_id: str, client_secret: str, cache: Cache, *args, **kwargs
+        self,
+        client_id: str,
+        client_secret: str,
+        cache: Cache,
+        *args,
+        rate_limiter: TokenBucket = None,
+        conditional: bool = False,
+        async_limit: int = 100,
+        **kwargs,
     ) -> None:
+        """`conditional`: request auctions and commodities with validators of
+        the last response (kept in `cache`), raise `NotModifiedError` if the
+        snapshot hasn't changed since, instead of downloading it again.
+        responses are not cached by time then. validators of a response are
+        only used once `commit_validators` is called for it, so a snapshot that
+        failed to be saved is downloaded again.
+
+        otherwise auctions and commodities are cached as raw response bodies,
+        compressed, and parsed on read, blocking or streamed alike.
+
+        `async_*` methods are coroutine counterparts over an asyncio client,
+        with at most `async_limit` connections open, to fan out many requests
+        from one thread. they share cache and `rate_limiter` with the blocking
+        ones. `async_close` before the event loop ends.
+        """
         super().__init__(*args, cache=cache, **kwargs)
+        self.conditional = conditional
+        # resource -> validators of responses not committed yet
+        self._pending_validators = {}
         self._api = BlizzardApi(client_id, client_secret)
+        self._async_api = AsyncWowGameDataApi(
+            client_id, client_secret, limit=async_limit
+        )
+        self._body_codec = ZstdCodec()
+        # shared by all threads using this instance, cache hits are not throttled
+        self.rate_limiter = rate_limiter or TokenBucket(
+            config.BN_RATE_LIMIT, capacity=config.BN_RATE_LIMIT_BURST
+        )
+
+    @property
+    def _game_data(self) -> Any:
+        # every access is followed by exactly one request, take a token for it
+        self.rate_limiter.acquire()
+        return self._api.wow.game_data
+
+    async def _get_async_game_data(self) -> AsyncWowGameDataApi:
+        await self.rate_limiter.acquire_async()
+        return self._async_api
+
+    async def async_close(self) -> None:
+        await self._async_api.close()
 
     @bound_cache(SECONDS_IN.WEEK)
     def get_connected_realms_index(self, namespace: Namespace) -> Any:
-        return self._api.wow.game_data.get_connected_realms_index(
+        return self._game_data.get_connected_realms_index(
             namespace.region, namespace.get_locale(), namespace.to_str()
         )
 
     @bound_cache(SECONDS_IN.WEEK)
     def get_connected_realm(self, namespace: Namespace, connected_realm_id: int) -> Any:
-        return self._api.wow.game_data.get_connected_realm(
+        return self._game_data.get_connected_realm(
             namespace.region,
             namespace.get_locale(),
             namespace.to_str(),
             connected_realm_id,
         )
 
-    @bound_cache(SECONDS_IN.HOUR)
+    @classmethod
+    def _get_resource(
+        cls,
+        namespace: Namespace,
+        connected_realm_id: int = None,
+        auction_house_id: int = None,
+    ) -> Tuple:
+        if connected_realm_id:
+            return (
+                "auctions",
+                namespace.to_str(),
+                connected_realm_id,
+                auction_house_id,
+            )
+
+        return ("commodities", namespace.to_str())
+
+    def _get_snapshot(self, resource: Tuple) -> Tuple[Dict, Dict]:
+        """cache key and entry of the last committed response of `resource`,
+        `{"validators": ..., "state": ...}`, empty if there is none.
+        """
+        key = {"fname": "snapshot", "resource": resource}
+        snapshot = self._cache.get(key, default={}, expires=self.VALIDATORS_EXPIRES_IN)
+        return key, snapshot
+
+    def commit_validators(
+        self,
+        namespace: Namespace,
+        connected_realm_id: int = None,
+        auction_house_id: int = None,
+        state: Any = None,
+    ) -> None:
+        """use validators of the last response of auctions (commodities if
+        `connected_realm_id` not given) for the next request. `state` is kept
+        with them, see `get_validators_state`.
+        """
+        resource = self._get_resource(namespace, connected_realm_id, auction_house_id)
+        validators = self._pending_validators.pop(resource, None)
+        if validators:
+            key, _ = self._get_snapshot(resource)
+            self._cache.set(key, {"validators": validators, "state": state})
+
+    def get_validators_state(
+        self,
+        namespace: Namespace,
+        connected_realm_id: int = None,
+        auction_house_id: int = None,
+    ) -> Optional[Any]:
+        """`state` committed with the validators that auctions (commodities if
+        `connected_realm_id` not given) were last requested with, `None` if
+        there is none.
+        """
+        resource = self._get_resource(namespace, connected_realm_id, auction_house_id)
+        _, snapshot = self._get_snapshot(resource)
+        return snapshot.get("state")
+
+    def drop_validators(
+        self,
+        namespace: Namespace,
+        connected_realm_id: int = None,
+        auction_house_id: int = None,
+    ) -> None:
+        """request auctions (commodities if `connected_realm_id` not given)
+        without validators next time.
+        """
+        resource = self._get_resource(namespace, connected_realm_id, auction_house_id)
+        self._pending_validators.pop(resource, None)
+        key, snapshot = self._get_snapshot(resource)
+        if snapshot:
+            self._cache.set(key, {})
+
+    def _request_conditional(
+        self, resource: Tuple, request: Callable[[Dict], Any], stream: bool = False
+    ) -> Any:
+        """`request(validators)` with validators last committed for `resource`,
+        raises `NotModifiedError` if it returned `None` (304).
+        """
+        _, snapshot = self._get_snapshot(resource)
+        validators = dict(snapshot.get("validators", {}))
+        resp = request(validators)
+        if resp is None:
+            raise NotModifiedError(f"{resource!r} not modified since {validators!r}")
+
+        if not stream:
+            self._pending_validators[resource] = validators
+            return resp
+
+        # validators of a broken download can't be committed
+        def iter_chunks():
+            yield from resp
+            self._pending_validators[resource] = validators
+
+        return iter_chunks()
+
+    def _iter_body(
+        self, key: Dict, request: Callable[[], Iterator[bytes]]
+    ) -> Iterator[bytes]:
+        """body chunks of the response cached under `key`, or of `request()`,
+        which is cached once fully received.
+
+        bodies are cached zstd compressed as they arrive, and decompressed
+        chunk by chunk on cache hits, so both go through the same streaming
+        parsers and never hold the whole uncompressed body.
+        """
+        body = self._cache.get(key, expires=self.BODY_EXPIRES_IN)
+        if body is not None:
+            return self._body_codec.decompressor().read_to_iter(
+                body, write_size=self.BODY_CHUNK_SIZE
+            )
+
+        chunks = request()
+
+        def iter_chunks():
+            compressor = self._body_codec.compressor().compressobj()
+            parts = []
+            for chunk in chunks:
+                parts.append(compressor.compress(chunk))
+                yield chunk
+
+            parts.append(compressor.flush())
+            self._cache.set(key, b"".join(parts), compress=False)
+
+        return iter_chunks()
+
+    async def _async_get_body(
+        self, key: Dict, request: Callable[[], Awaitable[bytes]]
+    ) -> bytes:
+        """`_iter_body` of a coroutine `request` returning the whole body"""
+        body = self._cache.get(key, expires=self.BODY_EXPIRES_IN)
+        if body is not None:
+            return self._body_codec.decompressor().decompress(body)
+
+        body = await request()
+        compressed = self._body_codec.compressor().compress(body)
+        self._cache.set(key, compressed, compress=False)
+        return body
+
+    @classmethod
+    def _get_auctions_key(
+        cls, namespace: Namespace, connected_realm_id: int, auction_house_id: int
+    ) -> Dict:
+        return {
+            "fname": "auctions_body",
+            "args": (namespace, connected_realm_id, auction_house_id),
+        }
+
+    @classmethod
+    def _get_commodities_key(cls, namespace: Namespace) -> Dict:
+        return {"fname": "commodities_body", "args": (namespace,)}
+
     def get_auctions(
         self,
         namespace: Namespace,
         connected_realm_id: int,
         auction_house_id: int = None,
     ) -> Any:
-        return self._api.wow.game_data.get_auctions(
-            namespace.region,
-            namespace.get_locale(),
-            namespace.to_str(),
-            connected_realm_id,
-            auction_house_id=auction_house_id,
+        if not self.conditional:
+            chunks = self.stream_auctions(
+                namespace, connected_realm_id, auction_house_id=auction_house_id
+            )
+            return json.loads(b"".join(chunks))
+
+        return self._request_conditional(
+            self._get_resource(namespace, connected_realm_id, auction_house_id),
+            lambda validators: self._game_data.get_auctions(
+                namespace.region,
+                namespace.get_locale(),
+                namespace.to_str(),
+                connected_realm_id,
+                auction_house_id=auction_house_id,
+                validators=validators,
+            ),
         )
 
-    @bound_cache(SECONDS_IN.HOUR)
     def get_commodities(self, namespace: Namespace) -> Any:
-        return self._api.wow.game_data.get_commodities(
+        if not self.conditional:
+            return json.loads(b"".join(self.stream_commodities(namespace)))
+
+        return self._request_conditional(
+            self._get_resource(namespace),
+            lambda validators: self._game_data.get_commodities(
+                namespace.region,
+                namespace.get_locale(),
+                namespace.to_str(),
+                validators=validators,
+            ),
+        )
+
+    def stream_auctions(
+        self,
+        namespace: Namespace,
+        connected_realm_id: int,
+        auction_house_id: int = None,
+    ) -> Iterator[bytes]:
+        """`get_auctions` as body chunks to be parsed incrementally"""
+        if not self.conditional:
+            return self._iter_body(
+                self._get_auctions_key(
+                    namespace, connected_realm_id, auction_house_id
+                ),
+                lambda: self._game_data.get_auctions(
+                    namespace.region,
+                    namespace.get_locale(),
+                    namespace.to_str(),
+                    connected_realm_id,
+                    auction_house_id=auction_house_id,
+                    stream=True,
+                ),
+            )
+
+        return self._request_conditional(
+            self._get_resource(namespace, connected_realm_id, auction_house_id),
+            lambda validators: self._game_data.get_auctions(
+                namespace.region,
+                namespace.get_locale(),
+                namespace.to_str(),
+                connected_realm_id,
+                auction_house_id=auction_house_id,
+                stream=True,
+                validators=validators,
+            ),
+            stream=True,
+        )
+
+    def stream_commodities(self, namespace: Namespace) -> Iterator[bytes]:
+        """`get_commodities` as body chunks to be parsed incrementally"""
+        if not self.conditional:
+            return self._iter_body(
+                self._get_commodities_key(namespace),
+                lambda: self._game_data.get_commodities(
+                    namespace.region,
+                    namespace.get_locale(),
+                    namespace.to_str(),
+                    stream=True,
+                ),
+            )
+
+        return self._request_conditional(
+            self._get_resource(namespace),
+            lambda validators: self._game_data.get_commodities(
+                namespace.region,
+                namespace.get_locale(),
+                namespace.to_str(),
+                stream=True,
+                validators=validators,
+            ),
+            stream=True,
+        )
+
+    @bound_cache(SECONDS_IN.WEEK, fname="get_connected_realms_index")
+    async def async_get_connected_realms_index(self, namespace: Namespace) -> Any:
+        game_data = await self._get_async_game_data()
+        return await game_data.get_connected_realms_index(
+            namespace.region, namespace.get_locale(), namespace.to_str()
+        )
+
+    @bound_cache(SECONDS_IN.WEEK, fname="get_connected_realm")
+    async def async_get_connected_realm(
+        self, namespace: Namespace, connected_realm_id: int
+    ) -> Any:
+        game_data = await self._get_async_game_data()
+        return await game_data.get_connected_realm(
             namespace.region,
             namespace.get_locale(),
             namespace.to_str(),
+            connected_realm_id,
+        )
+
+    async def _async_request_conditional(
+        self, resource: Tuple, request: Callable[[Dict], Awaitable[Any]]
+    ) -> Any:
+        """`_request_conditional` of a coroutine `request`"""
+        _, snapshot = self._get_snapshot(resource)
+        validators = dict(snapshot.get("validators", {}))
+        resp = await request(validators)
+        if resp is None:
+            raise NotModifiedError(f"{resource!r} not modified since {validators!r}")
+
+        self._pending_validators[resource] = validators
+        return resp
+
+    async def async_get_auctions_body(
+        self,
+        namespace: Namespace,
+        connected_realm_id: int,
+        auction_house_id: int = None,
+    ) -> bytes:
+        """`async_get_auctions` before parsing, to be parsed off the event loop"""
+
+        async def request(validators: Dict = None) -> bytes:
+            game_data = await self._get_async_game_data()
+            return await game_data.get_auctions(
+                namespace.region,
+                namespace.get_locale(),
+                namespace.to_str(),
+                connected_realm_id,
+                auction_house_id=auction_house_id,
+                validators=validators,
+                raw=True,
+            )
+
+        if not self.conditional:
+            return await self._async_get_body(
+                self._get_auctions_key(
+                    namespace, connected_realm_id, auction_house_id
+                ),
+                request,
+            )
+
+        return await self._async_request_conditional(
+            self._get_resource(namespace, connected_realm_id, auction_house_id),
+            request,
         )
 
+    async def async_get_auctions(
+        self,
+        namespace: Namespace,
+        connected_realm_id: int,
+        auction_house_id: int = None,
+    ) -> Any:
+        return json.loads(
+            await self.async_get_auctions_body(
+                namespace, connected_realm_id, auction_house_id=auction_house_id
+            )
+        )
+
+    async def async_get_commodities_body(self, namespace: Namespace) -> bytes:
+        """`async_get_commodities` before parsing, to be parsed off the event loop"""
+
+        async def request(validators: Dict = None) -> bytes:
+            game_data = await self._get_async_game_data()
+            return await game_data.get_commodities(
+                namespace.region,
+                namespace.get_locale(),
+                namespace.to_str(),
+                validators=validators,
+                raw=True,
+            )
+
+        if not self.conditional:
+            return await self._async_get_body(
+                self._get_commodities_key(namespace), request
+            )
+
+        return await self._async_request_conditional(
+            self._get_resource(namespace), request
+        )
+
+    async def async_get_commodities(self, namespace: Namespace) -> Any:
+        return json.loads(await self.async_get_commodities_body(namespace))
+
 
 class UpdateEnum(Enum):
     NONE = 0
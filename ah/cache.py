@@ -1,30 +1,211 @@
-"""this is a file-based key-value store, expriation is calculated by the file's last
-modified time.
+"""this is a key-value store in a single SQLite file, expiration is calculated by
+the time a key was set, kept in an index next to the values. recently used values
+are also kept in memory.
 """
 
 import os
+import re
 import time
 import pickle
 import hashlib
-from typing import Callable, Any, Union
+import inspect
+import sqlite3
+import threading
+from typing import Callable, Any, Dict, Optional, Tuple, Union
 from logging import getLogger
 from functools import wraps
+from collections import OrderedDict
 
 from ah.fs import ensure_path, remove_path
+from ah.storage import ZstdCodec
 from ah import config
 
 
+class CacheStats:
+    """lookups of a `bound_cache` function, and seconds spent in them, a miss
+    includes calling the function.
+    """
+
+    __slots__ = ("memory_hits", "disk_hits", "misses", "hit_time", "miss_time")
+
+    def __init__(self) -> None:
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.hit_time = 0.0
+        self.miss_time = 0.0
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(memory_hits={self.memory_hits}, "
+            f"disk_hits={self.disk_hits}, misses={self.misses}, "
+            f"hit_time={self.hit_time:.6f}, miss_time={self.miss_time:.6f})"
+        )
+
+    def copy(self) -> "CacheStats":
+        stats = CacheStats()
+        for name in self.__slots__:
+            setattr(stats, name, getattr(self, name))
+
+        return stats
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.disk_hits
+
+    @property
+    def hit_rate(self) -> float:
+        n = self.hits + self.misses
+        return self.hits / n if n else 0.0
+
+    @property
+    def avg_hit_time(self) -> float:
+        return self.hit_time / self.hits if self.hits else 0.0
+
+    @property
+    def avg_miss_time(self) -> float:
+        return self.miss_time / self.misses if self.misses else 0.0
+
+
 class Cache:
+    """values are pickled, and compressed with zstd if `compress` and large
+    enough. once the values add up to more than `max_size` bytes, least
+    recently used ones are evicted.
+
+    in front of the file, an in-process LRU tier keeps up to `memory_entries`
+    values, of up to `memory_size` bytes (pickled) in total. values got from
+    memory are the same objects every time, don't modify them.
+
+    safe to use from multiple threads, processes sharing `cache_path` are
+    serialized by SQLite's file lock.
+    """
+
     CACHE_EXPIRES_IN = config.DEFAULT_CACHE_EXPIRES_IN
+    DB_FILE_NAME = "cache.sqlite3"
+    # values smaller than this are not worth compressing
+    COMPRESS_MIN_SIZE = 1024
+    # per-key files of the old file based cache
+    LEGACY_FILE_PATTERN = re.compile(r"[0-9a-f]{64}")
 
-    def __init__(self, cache_path: str) -> None:
+    def __init__(
+        self,
+        cache_path: str,
+        max_size: int = config.DEFAULT_CACHE_MAX_SIZE,
+        compress: bool = config.DEFAULT_CACHE_COMPRESS,
+        memory_entries: int = config.DEFAULT_CACHE_MEMORY_ENTRIES,
+        memory_size: int = config.DEFAULT_CACHE_MEMORY_SIZE,
+    ) -> None:
         self._logger = getLogger(__name__)
         self.cache_path = cache_path
-        ensure_path(self.cache_path)
+        self.max_size = max_size
+        self.compress = compress
+        self.memory_entries = memory_entries
+        self.memory_size = memory_size
+        self._codec = ZstdCodec()
+        self._lock = threading.RLock()
+        self._conn = None
+        # key -> (ts_set, size, value), least recently used first
+        self._memory = OrderedDict()
+        self._memory_used = 0
+        # access ts of memory hits, written to the file before evicting
+        self._accessed = {}
+        self._stats = {}
+        self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        """connection to the cache file, (re)opened on first use"""
+        if self._conn is None:
+            ensure_path(self.cache_path)
+            conn = sqlite3.connect(
+                os.path.join(self.cache_path, self.DB_FILE_NAME),
+                timeout=30,
+                check_same_thread=False,
+                isolation_level=None,
+            )
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    ts_set REAL NOT NULL,
+                    ts_access REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    compressed INTEGER NOT NULL,
+                    value BLOB NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS entries_ts_set ON entries (ts_set);
+                CREATE INDEX IF NOT EXISTS entries_ts_access ON entries (ts_access);
+                """
+            )
+            self._conn = conn
+
+        return self._conn
+
+    def close(self) -> None:
+        """release the cache file, it's reopened on next use. values in memory
+        are dropped too, in case the file gets removed.
+        """
+        with self._lock:
+            if self._conn is not None:
+                self._flush_accessed(self._conn)
+                self._conn.close()
+                self._conn = None
+
+            self._clear_memory()
+
+    def _clear_memory(self) -> None:
+        self._memory.clear()
+        self._memory_used = 0
+        self._accessed.clear()
+
+    def _flush_accessed(self, conn: sqlite3.Connection) -> None:
+        if self._accessed:
+            conn.executemany(
+                "UPDATE entries SET ts_access = ? WHERE key = ?",
+                [(ts, key) for key, ts in self._accessed.items()],
+            )
+            self._accessed.clear()
+
+    def _memory_pop(self, key: str) -> None:
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_used -= entry[1]
+
+    def _memory_set(self, key: str, ts_set: float, size: int, value: Any) -> None:
+        self._memory_pop(key)
+        if size > self.memory_size or self.memory_entries <= 0:
+            return
+
+        self._memory[key] = (ts_set, size, value)
+        self._memory_used += size
+        while (
+            len(self._memory) > self.memory_entries
+            or self._memory_used > self.memory_size
+        ):
+            _, (_, size, _) = self._memory.popitem(last=False)
+            self._memory_used -= size
+
+    def record(self, fname: str, tier: Optional[str], seconds: float) -> None:
+        """count a lookup of `fname`, `tier` as returned by `lookup`"""
+        with self._lock:
+            stats = self._stats.get(fname)
+            if stats is None:
+                stats = self._stats[fname] = CacheStats()
+
+            if tier is None:
+                stats.misses += 1
+                stats.miss_time += seconds
+            else:
+                if tier == "memory":
+                    stats.memory_hits += 1
+                else:
+                    stats.disk_hits += 1
+
+                stats.hit_time += seconds
 
-    def _get_path(self, key: str) -> str:
-        """Get the path of a key."""
-        return os.path.join(self.cache_path, key)
+    def get_stats(self) -> Dict[str, CacheStats]:
+        """snapshot of lookups of every `bound_cache` function by name"""
+        with self._lock:
+            return {fname: stats.copy() for fname, stats in self._stats.items()}
 
     @classmethod
     def _get_key_str(cls, key: Any) -> str:
@@ -37,50 +218,141 @@ class Cache:
     ) -> Any:
         """Get a value from the cache.
         when expires >= 0, return cache if exists and not expired (current time minus
-        cache modification time), otherwise return default.
+        the time it was set), otherwise return default.
         when expires < 0, return cache if exists, otherwise return default.
 
+        """
+        value, tier = self.lookup(key, default=default, expires=expires)
+        return value
+
+    def lookup(
+        self, key: Any, default: Any = None, expires: Union[int, float] = -1
+    ) -> Tuple[Any, Optional[str]]:
+        """`get`, together with where the value was found: `"memory"`, `"disk"`
+        or `None` if it wasn't.
         """
         key = self._get_key_str(key)
+        ts_now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                ts_set, _, value = entry
+                if expires < 0 or ts_now - ts_set <= expires:
+                    self._memory.move_to_end(key)
+                    self._accessed[key] = ts_now
+                    self._logger.debug(f"cache get: {key} memory hit")
+                    return value, "memory"
+
+                self._memory_pop(key)
+
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT ts_set, compressed, value FROM entries WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                self._logger.debug(f"cache get: {key} not found")
+                return default, None
+
+            ts_set, compressed, data = row
+            if expires >= 0 and ts_now - ts_set > expires:
+                self._logger.debug(f"cache get: {key} expired")
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return default, None
+
+            conn.execute(
+                "UPDATE entries SET ts_access = ? WHERE key = ?", (ts_now, key)
+            )
+
+        self._logger.debug(f"cache get: {key} hit")
+        if compressed:
+            data = self._codec.decompressor().decompress(data)
 
-        path = self._get_path(key)
-        if not os.path.exists(path):
-            self._logger.debug(f"cache get: {key} not found")
-            return default
-
-        # check expiration
-        modtime = os.path.getmtime(path)
-        if expires >= 0 and time.time() - modtime > expires:
-            self._logger.debug(f"cache get: {key} expired")
-            os.remove(path)
-            return default
-
-        with open(path, "rb") as file:
-            self._logger.debug(f"cache get: {key} hit")
-            data = file.read()
-            return pickle.loads(data)
-
-    def set(self, key: Any, value: Any) -> None:
-        """Set a value in the cache."""
+        size = len(data)
+        value = pickle.loads(data)
+        with self._lock:
+            self._memory_set(key, ts_set, size, value)
+
+        return value, "disk"
+
+    def set(self, key: Any, value: Any, compress: bool = None) -> None:
+        """Set a value in the cache.
+        `compress` overrides `self.compress`, for values compressed already.
+        """
         key = self._get_key_str(key)
-        path = self._get_path(key)
         data = pickle.dumps(value)
-        with open(path, "wb") as file:
-            file.write(data)
+        size = len(data)
+        compressed = False
+        if compress is None:
+            compress = self.compress
+
+        if compress and len(data) >= self.COMPRESS_MIN_SIZE:
+            data_compressed = self._codec.compressor().compress(data)
+            if len(data_compressed) < len(data):
+                data = data_compressed
+                compressed = True
+
+        ts_now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries "
+                "(key, ts_set, ts_access, size, compressed, value) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, ts_now, ts_now, len(data), compressed, data),
+            )
+            self._memory_set(key, ts_now, size, value)
+            self._evict(conn)
+
         self._logger.debug(f"cache set: {key}")
 
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """remove least recently used values until under `max_size`"""
+        self._flush_accessed(conn)
+        (total,) = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if total <= self.max_size:
+            return
+
+        evicted = []
+        for key, size in conn.execute(
+            "SELECT key, size FROM entries ORDER BY ts_access"
+        ).fetchall():
+            if total <= self.max_size:
+                break
+
+            evicted.append((key,))
+            total -= size
+
+        conn.executemany("DELETE FROM entries WHERE key = ?", evicted)
+        for (key,) in evicted:
+            self._memory_pop(key)
+
+        self._logger.debug(f"cache evicted: {len(evicted)} values")
+
     def purge(self) -> None:
         """Purge the cache by removing files under cache dir."""
-        remove_path(self.cache_path)
+        with self._lock:
+            self.close()
+            remove_path(self.cache_path)
 
     def remove_expired(self, *, expires_in: int = CACHE_EXPIRES_IN) -> None:
-        """Remove expired cache."""
-        for key in os.listdir(self.cache_path):
-            path = self._get_path(key)
-            modtime = os.path.getmtime(path)
-            if time.time() - modtime > expires_in:
-                os.remove(path)
-                self._logger.debug(f"remove expired: {key}")
+        """Remove expired cache, and files left by the old file based cache."""
+        with self._lock:
+            conn = self._connect()
+            ts_expired = time.time() - expires_in
+            n_removed = conn.execute(
+                "DELETE FROM entries WHERE ts_set < ?", (ts_expired,)
+            ).rowcount
+            for key, (ts_set, _, _) in list(self._memory.items()):
+                if ts_set < ts_expired:
+                    self._memory_pop(key)
+
+            self._logger.debug(f"remove expired: {n_removed} values")
+
+        for file_name in os.listdir(self.cache_path):
+            if self.LEGACY_FILE_PATTERN.fullmatch(file_name):
+                os.remove(os.path.join(self.cache_path, file_name))
+                self._logger.debug(f"remove legacy: {file_name}")
 
 
 class BoundCacheMixin:
@@ -94,24 +366,60 @@ class BoundCacheMixin:
         self._cache = cache
 
 
-def bound_cache(expires: int) -> Callable:
+def bound_cache(expires: int, fname: str = None) -> Callable:
     """a decorator to cache the result of a function which returns a json-like object,
     key is the hash of the function name and it's arguments.
+
+    coroutine functions are cached the same way, `fname` overrides the function
+    name in key, for a coroutine to share cache with its blocking counterpart.
+
+    lookups are counted by function name (not `fname`) in the bound cache, see
+    `Cache.get_stats`.
     """
 
     def wrapper(func: Callable) -> Callable:
+        name = fname or func.__name__
+
+        if inspect.iscoroutinefunction(func):
+
+            @wraps(func)
+            async def async_inner(that: BoundCacheMixin, *args, **kwargs) -> Any:
+                key = {"fname": name, "args": args, "kwargs": kwargs}
+                if not hasattr(that, "_cache"):
+                    return await func(that, *args, **kwargs)
+
+                ts_start = time.perf_counter()
+                value, tier = that._cache.lookup(key, expires=expires)
+                if value is None:
+                    tier = None
+                    value = await func(that, *args, **kwargs)
+                    that._cache.set(key, value)
+
+                that._cache.record(
+                    func.__name__, tier, time.perf_counter() - ts_start
+                )
+                return value
+
+            return async_inner
+
         @wraps(func)
         def inner(that: BoundCacheMixin, *args, **kwargs) -> Any:
             # hash function should be SHA-256
-            key = {"fname": func.__name__, "args": args, "kwargs": kwargs}
+            key = {"fname": name, "args": args, "kwargs": kwargs}
             if hasattr(that, "_cache"):
-                cache = that._cache.get(key, expires=expires)
+                ts_start = time.perf_counter()
+                cache, tier = that._cache.lookup(key, expires=expires)
                 if cache is None:
+                    tier = None
                     value = func(that, *args, **kwargs)
                     that._cache.set(key, value)
                 else:
                     value = cache
 
+                that._cache.record(
+                    func.__name__, tier, time.perf_counter() - ts_start
+                )
+
             else:
                 value = func(that, *args, **kwargs)
 
@@ -11,8 +11,28 @@ MIN_RECORD_EXPIRES = 60 * SECONDS_IN.DAY
 LOGGING_LEVEL = os.environ.get("LOGGING_LEVEL", "INFO")
 DEFAULT_CACHE_PATH = os.path.join(get_temp_path(), "ah_cache")
 DEFAULT_CACHE_EXPIRES_IN = SECONDS_IN.WEEK
+# least recently used values are evicted past this size, values are compressed
+# with zstd if `DEFAULT_CACHE_COMPRESS`
+DEFAULT_CACHE_MAX_SIZE = 2 * 1024**3
+DEFAULT_CACHE_COMPRESS = True
+# recently used values are kept in memory too, up to this many / this size
+DEFAULT_CACHE_MEMORY_ENTRIES = 256
+DEFAULT_CACHE_MEMORY_SIZE = 64 * 1024**2
 DEFAULT_DB_PATH = "db"
 DEFAULT_DB_COMPRESS = True
+# zstd settings for `.zst` db files, threads: 0 single threaded, -1 one per core.
+# files written with a dictionary need the same dictionary to be read.
+DEFAULT_DB_ZSTD_LEVEL = 3
+DEFAULT_DB_ZSTD_THREADS = -1
+DEFAULT_DB_ZSTD_DICT = None
+# number of threads fetching auction snapshots concurrently, 1 for sequential
+DEFAULT_FETCH_WORKERS = 1
+# number of processes computing market values from a response, 1 for in process
+DEFAULT_PARSE_WORKERS = 1
+# Blizzard API allows 100 requests per second and 36,000 per hour,
+# refill at the hourly rate and allow bursts up to the per second limit
+BN_RATE_LIMIT = 10
+BN_RATE_LIMIT_BURST = 100
 # how often to take a snapshot of the system memory / cpu usage
 DEFAULT_SNAPSHOT_INTERVAL = 10
 MAX_SNAPSHOTS = 100
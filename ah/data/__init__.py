@@ -1,26 +1,17 @@
 import os
-import json
-from typing import Dict
-import logging
 
-__all__ = ("map_bonuses",)
+from ah.data.bonus_table import BonusTable
 
-_logger = logging.getLogger("ah.data")
+__all__ = ("BonusTable", "map_bonuses")
 
 
-def load_json(filename: str) -> Dict:
-    path = os.path.join(os.path.dirname(__file__), filename)
-    if not os.path.isfile(path):
-        _logger.warning(f"File {path} not found.")
-        return {}
+def get_path(filename: str) -> str:
+    return os.path.join(os.path.dirname(__file__), filename)
 
-    with open(path) as f:
-        return json.load(f)
 
-
-def key_to_int(d: Dict) -> Dict:
-    return {int(k): v for k, v in d.items()}
-
-
-map_bonuses = load_json("bonuses_curves.json")
-map_bonuses = key_to_int(map_bonuses)
+# loaded on first use, not on import. mapped from the binary file that
+# `bin/preprocess_data.py` builds along with the json one
+map_bonuses = BonusTable(
+    get_path("bonuses_curves.json"),
+    binary_path=get_path("bonuses_curves.bin"),
+)
@@ -0,0 +1,329 @@
+import json
+import mmap
+import struct
+import threading
+from numbers import Integral
+from logging import getLogger
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+__all__ = ("BonusTable",)
+
+
+class BonusTable(Mapping):
+    """ilvl info of item bonuses, loaded from `bonuses_curves.json` on first use
+    and kept column-wise instead of a dict per bonus.
+
+    every bonus is a row, rows are sorted by bonus id:
+    >>> table.ids               # bonus ids
+    >>> table.flags             # `HAS_*` bits, which of the fields below are set
+    >>> table.levels            # ilvl delta ("level")
+    >>> table.base_levels       # absolute ilvl ("base_level")
+    >>> table.curve_ids         # "curveId"
+    >>> table.point_offsets     # points of row `i` are `point_offsets[i:i + 2]`
+    >>> table.point_plvls       # player levels of all curves, concatenated
+    >>> table.point_ilvls       # item levels of all curves, concatenated
+
+    it's also a read-only mapping of bonus id -> dict of the fields, same as
+    in the json file.
+
+    if `binary_path` is given and the file is of the current `BINARY_VERSION`,
+    columns are memory-mapped from it instead, see `to_binary`. otherwise
+    they're built from the json file at `path`.
+    """
+
+    HAS_LEVEL = 1
+    HAS_BASE_LEVEL = 2
+    HAS_CURVE = 4
+
+    # binary file: header, then `COLUMNS` one after another, 8 bytes aligned.
+    # bump `BINARY_VERSION` on any change of the layout
+    BINARY_MAGIC = b"AHBT"
+    BINARY_VERSION = 1
+    # magic, version, reserved, number of bonuses, number of curve points
+    BINARY_HEADER = struct.Struct("<4sHHII")
+    # name, dtype, length: "n" number of bonuses, "m" number of curve points
+    COLUMNS = (
+        ("ids", "<i4", "n"),
+        ("flags", "i1", "n"),
+        ("levels", "<i4", "n"),
+        ("base_levels", "<i4", "n"),
+        ("curve_ids", "<i4", "n"),
+        ("point_offsets", "<i8", "n+1"),
+        ("point_plvls", "<i4", "m"),
+        ("point_ilvls", "<i4", "m"),
+    )
+
+    _logger = getLogger("BonusTable")
+
+    def __init__(self, path: Optional[str], binary_path: Optional[str] = None) -> None:
+        self.path = path
+        self.binary_path = binary_path
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Dict]) -> "BonusTable":
+        """table of `data`, in the same form as the json file"""
+        table = cls(None)
+        table._set_columns(data)
+        table._loaded = True
+        return table
+
+    def load(self) -> "BonusTable":
+        """load the table if not yet, safe to call from multiple threads"""
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._load()
+                    self._loaded = True
+
+        return self
+
+    def _load(self) -> None:
+        if self.binary_path:
+            try:
+                self._map_binary(self.binary_path)
+                self._logger.debug(
+                    f"{len(self.ids)} bonuses mapped from {self.binary_path}"
+                )
+                return
+
+            except FileNotFoundError:
+                self._logger.info(f"File {self.binary_path} not found.")
+            except ValueError as e:
+                self._logger.warning(f"Skipped {self.binary_path}: {e!s}")
+
+        try:
+            if self.path is None:
+                raise FileNotFoundError
+
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            self._logger.warning(f"File {self.path} not found.")
+            data = {}
+
+        self._set_columns(data)
+        self._logger.debug(f"{len(self.ids)} bonuses loaded from {self.path}")
+
+    @classmethod
+    def _get_layout(cls, n: int, m: int) -> Tuple[List[Tuple[str, str, int, int]], int]:
+        """`(name, dtype, offset, count)` of every column, and the file size"""
+        layout = []
+        offset = cls.BINARY_HEADER.size
+        counts = {"n": n, "n+1": n + 1, "m": m}
+        for name, dtype, length in cls.COLUMNS:
+            offset = (offset + 7) // 8 * 8
+            layout.append((name, dtype, offset, counts[length]))
+            offset += np.dtype(dtype).itemsize * counts[length]
+
+        return layout, offset
+
+    def _map_binary(self, path: str) -> None:
+        with open(path, "rb") as f:
+            if not f.seek(0, 2):
+                raise ValueError("empty file")
+
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(buffer) < self.BINARY_HEADER.size:
+            raise ValueError("truncated header")
+
+        magic, version, _, n, m = self.BINARY_HEADER.unpack_from(buffer)
+        if magic != self.BINARY_MAGIC:
+            raise ValueError(f"unknown magic {magic!r}")
+        if version != self.BINARY_VERSION:
+            raise ValueError(f"version {version}, expected {self.BINARY_VERSION}")
+
+        layout, size = self._get_layout(n, m)
+        if len(buffer) != size:
+            raise ValueError(f"size {len(buffer)}, expected {size}")
+
+        for name, dtype, offset, count in layout:
+            column = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+            setattr(self, name, column)
+
+        self._index_rows()
+
+    def to_binary(self, path: str) -> None:
+        """write the table for `binary_path`, see `COLUMNS`"""
+        self.load()
+        layout, size = self._get_layout(len(self.ids), len(self.point_plvls))
+        data = bytearray(size)
+        self.BINARY_HEADER.pack_into(
+            data,
+            0,
+            self.BINARY_MAGIC,
+            self.BINARY_VERSION,
+            0,
+            len(self.ids),
+            len(self.point_plvls),
+        )
+        for name, dtype, offset, count in layout:
+            column = np.asarray(getattr(self, name), dtype=dtype)
+            data[offset : offset + column.nbytes] = column.tobytes()
+
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def _set_columns(self, data: Dict[str, Dict]) -> None:
+        ids = sorted(map(int, data))
+        n = len(ids)
+        self.ids = np.array(ids, dtype=np.int32)
+        self.flags = np.zeros(n, dtype=np.int8)
+        self.levels = np.zeros(n, dtype=np.int32)
+        self.base_levels = np.zeros(n, dtype=np.int32)
+        self.curve_ids = np.zeros(n, dtype=np.int32)
+        self.point_offsets = np.zeros(n + 1, dtype=np.int64)
+        plvls, ilvls = [], []
+        for row, bonus_id in enumerate(ids):
+            info = data[str(bonus_id)]
+            if "level" in info:
+                self.flags[row] |= self.HAS_LEVEL
+                self.levels[row] = info["level"]
+            if "base_level" in info:
+                self.flags[row] |= self.HAS_BASE_LEVEL
+                self.base_levels[row] = info["base_level"]
+            if "curveId" in info:
+                self.flags[row] |= self.HAS_CURVE
+                self.curve_ids[row] = info["curveId"]
+                for plvl, ilvl in info.get("points", ()):
+                    plvls.append(plvl)
+                    ilvls.append(ilvl)
+
+            self.point_offsets[row + 1] = len(plvls)
+
+        self.point_plvls = np.array(plvls, dtype=np.int32)
+        self.point_ilvls = np.array(ilvls, dtype=np.int32)
+        self._index_rows()
+
+    def _index_rows(self) -> None:
+        # bonus id -> (row, flags, level, base_level, curve_id), `None` if not
+        # found. ids are small (~10k), a dense list is both smaller and faster
+        # than a dict, and python ints are faster than numpy scalars one by one
+        size = int(self.ids[-1]) + 1 if len(self.ids) else 0
+        # same for whole arrays of bonus ids, -1 if not found
+        self._row_index = np.full(size, -1, dtype=np.int64)
+        self._row_index[self.ids] = np.arange(len(self.ids))
+        self._rows = [None] * size
+        for row, (bonus_id, *info) in enumerate(
+            zip(
+                self.ids.tolist(),
+                self.flags.tolist(),
+                self.levels.tolist(),
+                self.base_levels.tolist(),
+                self.curve_ids.tolist(),
+            )
+        ):
+            self._rows[bonus_id] = (row, *info)
+
+    def get_info(self, bonus_id: int) -> Optional[Tuple[int, int, int, int, int]]:
+        """`(row, flags, level, base_level, curve_id)` of `bonus_id`, `None` if
+        not found
+        """
+        rows = self.load()._rows
+        if 0 <= bonus_id < len(rows):
+            return rows[bonus_id]
+
+        return None
+
+    def get_row(self, bonus_id: int) -> int:
+        """row of `bonus_id`, -1 if not found"""
+        info = self.get_info(bonus_id)
+        return -1 if info is None else info[0]
+
+    def get_rows(self, bonus_ids: np.ndarray) -> np.ndarray:
+        """`get_row` of every bonus id, raises `KeyError` if any is not found"""
+        row_index = self.load()._row_index
+        bonus_ids = np.asarray(bonus_ids, dtype=np.int64)
+        found = (bonus_ids >= 0) & (bonus_ids < len(row_index))
+        rows = np.full(len(bonus_ids), -1, dtype=np.int64)
+        rows[found] = row_index[bonus_ids[found]]
+        if (rows < 0).any():
+            raise KeyError(int(bonus_ids[np.argmax(rows < 0)]))
+
+        return rows
+
+    def get_ilvl_from_curve(self, row: int, plvl: int) -> Optional[int]:
+        """item level at player level `plvl` on the curve of `row`, clamped to
+        the ends of the curve and linearly interpolated between points.
+        """
+        lo, hi = self.point_offsets[row : row + 2].tolist()
+        if lo == hi:
+            raise ValueError("Invalid curve points")
+
+        plvls = self.point_plvls[lo:hi]
+        plvl = min(max(plvl, int(plvls[0])), int(plvls[-1]))
+        # first point at or above `plvl`, one before it is the last point below
+        i = int(np.searchsorted(plvls, plvl)) + lo
+        plvl2, ilvl2 = int(self.point_plvls[i]), int(self.point_ilvls[i])
+        if plvl2 == plvl:
+            return ilvl2
+
+        plvl1, ilvl1 = int(self.point_plvls[i - 1]), int(self.point_ilvls[i - 1])
+        return int((plvl - plvl1) * (ilvl2 - ilvl1) / (plvl2 - plvl1) + ilvl1 + 0.5)
+
+    def get_ilvls_from_curve(self, rows: np.ndarray, plvls: np.ndarray) -> np.ndarray:
+        """`get_ilvl_from_curve` of every row and player level"""
+        rows = np.asarray(rows, dtype=np.int64)
+        plvls = np.asarray(plvls, dtype=np.int64)
+        lo = self.point_offsets[rows]
+        hi = self.point_offsets[rows + 1]
+        if (lo == hi).any():
+            raise ValueError("Invalid curve points")
+
+        point_plvls = self.point_plvls.astype(np.int64)
+        point_ilvls = self.point_ilvls.astype(np.int64)
+        plvls = np.clip(plvls, point_plvls[lo], point_plvls[hi - 1])
+        # bisect every curve at once for the first point at or above `plvls`,
+        # curves are short, it takes a few rounds
+        left, right = lo, hi - 1
+        while (left < right).any():
+            mid = (left + right) // 2
+            below = point_plvls[mid] < plvls
+            left = np.where(below, mid + 1, left)
+            right = np.where(below, right, mid)
+
+        plvl2, ilvl2 = point_plvls[left], point_ilvls[left]
+        # `left` is above `lo` unless on a point, clamped for the ones that are
+        prev = np.maximum(left - 1, lo)
+        plvl1, ilvl1 = point_plvls[prev], point_ilvls[prev]
+        on_point = plvl2 == plvls
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # same arithmetic as `get_ilvl_from_curve`, rounds the same
+            interpolated = (plvls - plvl1) * (ilvl2 - ilvl1) / (plvl2 - plvl1)
+            interpolated = (interpolated + ilvl1 + 0.5).astype(np.int64)
+
+        return np.where(on_point, ilvl2, interpolated)
+
+    def __contains__(self, bonus_id: object) -> bool:
+        return isinstance(bonus_id, Integral) and self.get_row(bonus_id) >= 0
+
+    def __getitem__(self, bonus_id: int) -> Dict:
+        row = self.get_row(bonus_id) if isinstance(bonus_id, Integral) else -1
+        if row < 0:
+            raise KeyError(bonus_id)
+
+        info = {}
+        flags = int(self.flags[row])
+        if flags & self.HAS_LEVEL:
+            info["level"] = int(self.levels[row])
+        if flags & self.HAS_BASE_LEVEL:
+            info["base_level"] = int(self.base_levels[row])
+        if flags & self.HAS_CURVE:
+            info["curveId"] = int(self.curve_ids[row])
+            lo, hi = self.point_offsets[row : row + 2].tolist()
+            info["points"] = np.stack(
+                [self.point_plvls[lo:hi], self.point_ilvls[lo:hi]], axis=1
+            ).tolist()
+
+        return info
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.load().ids.tolist())
+
+    def __len__(self) -> int:
+        return len(self.load().ids)
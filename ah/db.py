@@ -4,13 +4,24 @@ import os
 import logging
 from typing import TYPE_CHECKING, Dict, Optional
 
-from ah.storage import BinaryFile, TextFile, BaseFile
+from attrs import evolve
+
+from ah.storage import (
+    BinaryFile,
+    MappedFile,
+    TextFile,
+    BaseFile,
+    Codec,
+    GzipCodec,
+    ZstdCodec,
+)
 from ah.models import (
     DBFileName,
     Namespace,
     DBExtEnum,
     DBTypeEnum,
     FactionEnum,
+    RealmCategoryEnum,
 )
 from ah.errors import DownloadError
 from ah import config
@@ -103,12 +114,28 @@ class GithubFileForker:
 
 class DBHelper:
     USE_COMPRESSION = config.DEFAULT_DB_COMPRESS
+    _logger = logging.getLogger("DBHelper")
 
     def __init__(
         self,
         data_path: str,
+        db_ext: Optional[DBExtEnum] = None,
+        zstd_codec: Optional[ZstdCodec] = None,
     ) -> None:
+        """`db_ext`: format of auctions and commodities db files, defaults to
+        `GZ` or `BIN` depending on `USE_COMPRESSION`. `MMAP` files are
+        uncompressed but can be read without decoding, see `MappedFile`.
+
+        `zstd_codec`: codec for `ZST` files, defaults to settings in `config`.
+        """
+        if db_ext is None:
+            db_ext = DBExtEnum.GZ if self.USE_COMPRESSION else DBExtEnum.BIN
+        elif db_ext == DBExtEnum.JSON:
+            raise ValueError(f"invalid db_ext: {db_ext!r}")
+
         self._data_path = data_path
+        self.db_ext = DBExtEnum(db_ext)
+        self._zstd_codec = zstd_codec
 
     def list_file(self):
         """list db or meta files under data_path"""
@@ -124,29 +151,83 @@ class DBHelper:
                 ret.append(file_name)
         return ret
 
+    def get_codec(self, ext: DBExtEnum) -> Optional[Codec]:
+        if ext == DBExtEnum.GZ:
+            return GzipCodec()
+
+        elif ext == DBExtEnum.ZST:
+            if self._zstd_codec is None:
+                if config.DEFAULT_DB_ZSTD_DICT:
+                    self._zstd_codec = ZstdCodec.from_dict_file(
+                        config.DEFAULT_DB_ZSTD_DICT,
+                        level=config.DEFAULT_DB_ZSTD_LEVEL,
+                        threads=config.DEFAULT_DB_ZSTD_THREADS,
+                    )
+                else:
+                    self._zstd_codec = ZstdCodec(
+                        level=config.DEFAULT_DB_ZSTD_LEVEL,
+                        threads=config.DEFAULT_DB_ZSTD_THREADS,
+                    )
+
+            return self._zstd_codec
+
+        return None
+
+    def _get_file(self, file_name: DBFileName) -> BaseFile:
+        file_path = os.path.join(self._data_path, str(file_name))
+        if file_name.db_type == DBTypeEnum.META:
+            return TextFile(file_path)
+        elif file_name.ext == DBExtEnum.MMAP:
+            return MappedFile(file_path)
+        else:
+            return BinaryFile(file_path, codec=self.get_codec(file_name.ext))
+
     def get_file(
         self,
         namespace: Namespace,
         db_type: DBTypeEnum,
         crid: Optional[int] = None,
         faction: Optional[FactionEnum] = None,
+        category: Optional[RealmCategoryEnum] = None,
     ) -> BaseFile:
+        """returns the db file in `db_ext` format, unless only a file in another
+        format exists, which gets converted on next compaction.
+
+        `REGION` files have no `MMAP` layout, they're `BIN` in that case.
+        """
         if db_type == DBTypeEnum.META:
             ext = DBExtEnum.JSON
+        elif db_type == DBTypeEnum.REGION and self.db_ext == DBExtEnum.MMAP:
+            ext = DBExtEnum.BIN
         else:
-            ext = DBExtEnum.GZ if self.USE_COMPRESSION else DBExtEnum.BIN
+            ext = self.db_ext
 
         file_name = DBFileName(
             namespace=namespace,
             db_type=db_type,
             crid=crid,
             faction=faction,
+            category=category,
             ext=ext,
         )
-        file_path = os.path.join(self._data_path, str(file_name))
-        if db_type == DBTypeEnum.META:
-            file = TextFile(file_path)
-        else:
-            file = BinaryFile(file_path, use_compression=self.USE_COMPRESSION)
+        file = self._get_file(file_name)
+        if db_type != DBTypeEnum.META and not file.exists():
+            for other_ext in DBExtEnum:
+                if other_ext in (DBExtEnum.JSON, ext):
+                    continue
+
+                if db_type == DBTypeEnum.REGION and other_ext == DBExtEnum.MMAP:
+                    continue
+
+                other_file_name = evolve(file_name, ext=other_ext)
+                if os.path.exists(os.path.join(self._data_path, str(other_file_name))):
+                    other_file = self._get_file(other_file_name)
+                    self._logger.debug(f"{file!r} not found, using {other_file!r}")
+                    return other_file
 
         return file
+
+    def get_db_ext_file(self, file: BaseFile) -> BaseFile:
+        """same db as `file`, in `db_ext` format"""
+        file_name = DBFileName.from_str(file.file_name)
+        return self._get_file(evolve(file_name, ext=self.db_ext))
@@ -14,3 +14,15 @@ class CompressTsError(ValueError, AHError):
 
 class GetConnectedRealmsIndexError(AHError):
     pass
+
+
+class JSONStreamError(ValueError, AHError):
+    pass
+
+
+class DBFormatError(ValueError, AHError):
+    pass
+
+
+class NotModifiedError(AHError):
+    pass
@@ -0,0 +1,166 @@
+"""incremental JSON parsing, for responses too large to be loaded at once.
+
+only the array we're interested in is parsed element by element, everything
+else in the top level object is decoded as a whole.
+
+>>> chunks = [b'{"_links": {}, "auctions": [{"id": 1}, ', b'{"id": 2}]}']
+>>> list(iter_json_array(chunks, "auctions"))
+[{'id': 1}, {'id': 2}]
+
+"""
+
+import re
+import json
+import codecs
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from ah.errors import JSONStreamError
+
+__all__ = ("iter_json_array",)
+
+
+class _StreamBuffer:
+    WHITESPACE = re.compile(r"[ \t\n\r]*")
+    NUMBER_CHARS = re.compile(r"[0-9.eE+-]*")
+    DECODER = json.JSONDecoder()
+    # a single value other than the streamed array should never be this large,
+    # stop buffering and fail instead of holding the whole response in memory
+    MAX_VALUE_SIZE = 16 * 1024 * 1024
+
+    def __init__(self, chunks: Iterable[bytes]) -> None:
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """read next chunk, drop consumed text. returns `False` on eof."""
+        if self.eof:
+            return False
+
+        try:
+            for chunk in self._chunks:
+                if chunk:
+                    text = self._decoder.decode(chunk)
+                    break
+
+            else:
+                text = self._decoder.decode(b"", final=True)
+                self.eof = True
+
+        except UnicodeDecodeError as e:
+            # invalid, or cut in the middle of a character
+            raise JSONStreamError(f"malformed UTF-8: {e!s}") from e
+
+        self.text = self.text[self.pos :] + text
+        self.pos = 0
+        return not self.eof or bool(text)
+
+    def skip_whitespace(self) -> None:
+        while True:
+            self.pos = self.WHITESPACE.match(self.text, self.pos).end()
+            if self.pos < len(self.text) or not self.fill():
+                return
+
+    def next_char(self) -> str:
+        """consume next non-whitespace char, empty string on eof."""
+        self.skip_whitespace()
+        if self.pos >= len(self.text):
+            return ""
+
+        char = self.text[self.pos]
+        self.pos += 1
+        return char
+
+    def peek_char(self) -> str:
+        self.skip_whitespace()
+        return self.text[self.pos : self.pos + 1]
+
+    def expect(self, chars: str) -> str:
+        char = self.next_char()
+        if not char or char not in chars:
+            raise JSONStreamError(
+                f"expecting one of {chars!r}, got {char or 'EOF'!r} "
+                f"near {self.text[self.pos - 20 : self.pos + 20]!r}"
+            )
+
+        return char
+
+    def decode(self) -> Any:
+        """decode next value, read more chunks until it's complete."""
+        self.skip_whitespace()
+        while True:
+            try:
+                value, end = self.DECODER.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError as e:
+                if len(self.text) - self.pos > self.MAX_VALUE_SIZE or not self.fill():
+                    raise JSONStreamError(f"malformed JSON value: {e!s}") from e
+
+                continue
+
+            # a number cut by chunk boundary decodes fine (`1.` of `1.5` as `1`),
+            # make sure it's whole
+            is_number = isinstance(value, (int, float)) and not isinstance(value, bool)
+            if (
+                not is_number
+                or self.NUMBER_CHARS.match(self.text, end).end() < len(self.text)
+            ):
+                self.pos = end
+                return value
+
+            length = end - self.pos
+            if not self.fill():
+                self.pos += length
+                return value
+
+
+def iter_json_array(
+    chunks: Iterable[bytes],
+    key: str,
+    others: Optional[Dict[str, Any]] = None,
+) -> Iterator[Any]:
+    """yield elements of the array under `key` of the top level JSON object
+    in `chunks`, as they're parsed. a `null` array yields nothing.
+
+    other top level fields are decoded into `others` if given, fields after
+    the array only become available once iteration finished.
+
+    """
+    buffer = _StreamBuffer(chunks)
+    buffer.expect("{")
+    if buffer.peek_char() == "}":
+        buffer.next_char()
+
+    else:
+        while True:
+            name = buffer.decode()
+            if not isinstance(name, str):
+                raise JSONStreamError(f"expecting object key, got {name!r}")
+
+            buffer.expect(":")
+            if name == key and buffer.peek_char() == "[":
+                buffer.next_char()
+                if buffer.peek_char() == "]":
+                    buffer.next_char()
+
+                else:
+                    while True:
+                        yield buffer.decode()
+                        if buffer.expect(",]") == "]":
+                            break
+
+            else:
+                value = buffer.decode()
+                if name != key:
+                    if others is not None:
+                        others[name] = value
+
+                elif value is not None:
+                    raise JSONStreamError(f"expecting array for {key!r}")
+
+            if buffer.expect(",}") == "}":
+                break
+
+    if buffer.next_char():
+        raise JSONStreamError("extra data after top level object")
@@ -2,6 +2,7 @@ from __future__ import annotations
 import abc
 import time
 import logging
+from array import array
 from typing import (
     List,
     Iterator,
@@ -12,12 +13,16 @@ from typing import (
     Optional,
     ClassVar,
     Tuple,
+    Type,
+    Iterable,
     TYPE_CHECKING,
 )
 
+import numpy as np
 from pydantic import model_validator, ConfigDict, Field
 
 from ah.models.base import _BaseModel, StrEnum_
+from ah.json_stream import iter_json_array
 
 if TYPE_CHECKING:
     from ah.api import BNAPI
@@ -39,6 +44,10 @@ __all__ = (
     "CommodityItem",
     "Commodity",
     "CommoditiesResponse",
+    "AuctionsStreamResponse",
+    "CommoditiesStreamResponse",
+    "DecodedAuction",
+    "DecodedAuctionsResponse",
     "Realm",
     "ConnectedRealm",
 )
@@ -452,6 +461,342 @@ class CommoditiesResponse(GenericAuctionsResponseInterface, _BaseModel):
         return self.timestamp
 
 
+class AuctionsStreamResponse(GenericAuctionsResponseInterface):
+    """auctions response parsed incrementally from chunks of the response body,
+    instead of loading the whole body and validating every auction up front.
+
+    auctions are validated one at a time while `get_auctions` is iterated, and
+    discarded once consumed, memory use doesn't grow with the response size.
+    the body can only be iterated once.
+
+    """
+
+    AUCTION_MODEL: ClassVar[Type[_BaseModel]] = Auction
+
+    def __init__(self, chunks: Iterable[bytes], timestamp: int = None) -> None:
+        self._chunks = chunks
+        self._consumed = False
+        self.timestamp = int(time.time()) if timestamp is None else timestamp
+
+    def _iter_auctions(self) -> Iterator[GenericAuctionInterface]:
+        for auction in iter_json_array(self._chunks, "auctions"):
+            yield self.AUCTION_MODEL.model_validate(auction)
+
+    def get_auctions(self) -> Iterator[GenericAuctionInterface]:
+        if self._consumed:
+            raise ValueError("auctions stream has already been consumed")
+
+        self._consumed = True
+        return self._iter_auctions()
+
+    def get_timestamp(self) -> int:
+        return self.timestamp
+
+    @classmethod
+    def from_api(
+        cls,
+        bn_api: BNAPI,
+        namespace: Namespace,
+        connected_realm_id: str,
+        faction: FactionEnum | None,
+    ) -> "AuctionsStreamResponse":
+        auction_house_id = AuctionsResponse.MAP_FACTION_AH_ID[faction]
+        chunks = bn_api.stream_auctions(
+            namespace,
+            connected_realm_id,
+            auction_house_id=auction_house_id,
+        )
+        return cls(chunks)
+
+
+class CommoditiesStreamResponse(AuctionsStreamResponse):
+    """commodities counterpart of `AuctionsStreamResponse`"""
+
+    AUCTION_MODEL: ClassVar[Type[_BaseModel]] = Commodity
+
+    @classmethod
+    def from_api(
+        cls, bn_api: BNAPI, namespace: Namespace
+    ) -> "CommoditiesStreamResponse":
+        return cls(bn_api.stream_commodities(namespace))
+
+
+class DecodedAuction(GenericAuctionInterface):
+    """a row of `DecodedAuctionsResponse`"""
+
+    __slots__ = ("item", "price", "buyout", "quantity", "time_left")
+
+    def __init__(
+        self,
+        item: GenericItemInterface,
+        price: int,
+        buyout: Optional[int],
+        quantity: int,
+        time_left: TimeLeft,
+    ) -> None:
+        self.item = item
+        self.price = price
+        self.buyout = buyout
+        self.quantity = quantity
+        self.time_left = time_left
+
+    def get_price(self) -> int:
+        return self.price
+
+    def get_buyout(self) -> Optional[int]:
+        return self.buyout
+
+    def get_quantity(self) -> int:
+        return self.quantity
+
+    def get_time_left(self) -> TimeLeft:
+        return self.time_left
+
+    def get_item(self) -> GenericItemInterface:
+        return self.item
+
+
+class DecodedAuctionsResponse(GenericAuctionsResponseInterface):
+    """auctions / commodities response in a compact column-wise form, decoded
+    from raw dicts of a trusted source (the API) without validating a model
+    for every auction.
+
+    semantic checks of the models (`check_bid_buyout`, `check_pet_fields`,
+    `time_left` values, required fields) are done in bulk: pet fields once per
+    unique item, the rest as array checks after decoding. field types and
+    unknown fields are not checked, hence "trusted".
+
+    >>> resp.items          # unique items, `AuctionItem` or `CommodityItem`
+    >>> resp.item_index     # for every auction, index into `items`
+    >>> resp.prices         # buyout, or bid if no buyout, or unit price
+    >>> resp.buyouts        # 0 if no buyout
+    >>> resp.quantities
+    >>> resp.time_lefts     # index into `TIME_LEFTS`
+
+    """
+
+    PET_FIELDS: ClassVar[Tuple[str, ...]] = (
+        "pet_breed_id",
+        "pet_level",
+        "pet_quality_id",
+        "pet_species_id",
+    )
+    TIME_LEFTS: ClassVar[List[TimeLeft]] = list(TimeLeft)
+    MAP_TIME_LEFT_INDEX: ClassVar[Dict[str, int]] = {
+        time_left.value: i for i, time_left in enumerate(TimeLeft)
+    }
+
+    def __init__(
+        self,
+        items: List[GenericItemInterface],
+        item_index: np.ndarray,
+        prices: np.ndarray,
+        buyouts: np.ndarray,
+        quantities: np.ndarray,
+        time_lefts: np.ndarray,
+        timestamp: int = None,
+    ) -> None:
+        self.items = items
+        self.item_index = item_index
+        self.prices = prices
+        self.buyouts = buyouts
+        self.quantities = quantities
+        self.time_lefts = time_lefts
+        self.timestamp = int(time.time()) if timestamp is None else timestamp
+
+    def __len__(self) -> int:
+        return len(self.item_index)
+
+    def get_auctions(self) -> Iterator[DecodedAuction]:
+        for index, price, buyout, quantity, time_left in zip(
+            self.item_index.tolist(),
+            self.prices.tolist(),
+            self.buyouts.tolist(),
+            self.quantities.tolist(),
+            self.time_lefts.tolist(),
+        ):
+            yield DecodedAuction(
+                self.items[index],
+                price,
+                buyout,
+                quantity,
+                self.TIME_LEFTS[time_left],
+            )
+
+    def get_timestamp(self) -> int:
+        return self.timestamp
+
+    @classmethod
+    def _check_rows(
+        cls,
+        prices: np.ndarray,
+        time_lefts: np.ndarray,
+        raw_time_lefts: Dict[int, str],
+    ) -> None:
+        (missing,) = np.nonzero(prices < 0)
+        if len(missing):
+            raise ValueError(
+                "At least one of 'bid' and 'buyout' needs to be present, "
+                f"{len(missing)} auctions missing both, first at {missing[0]}"
+            )
+
+        (invalid,) = np.nonzero(time_lefts < 0)
+        if len(invalid):
+            raise ValueError(
+                f"Invalid 'time_left' {raw_time_lefts[invalid[0]]!r} "
+                f"of {len(invalid)} auctions, first at {invalid[0]}"
+            )
+
+    @classmethod
+    def decode_auctions(
+        cls, auctions: Iterable[Dict[str, Any]], timestamp: int = None
+    ) -> "DecodedAuctionsResponse":
+        """decode `auctions` field of an auctions response"""
+        # item fields that matter to item strings, to find unique items
+        map_key_index = {}
+        raw_items = []
+        item_index = array("q")
+        prices = array("q")
+        buyouts = array("q")
+        quantities = array("q")
+        time_lefts = array("b")
+        # only kept for error message
+        raw_time_lefts = {}
+        get_time_left_index = cls.MAP_TIME_LEFT_INDEX.get
+        try:
+            for auction in auctions:
+                item = auction["item"]
+                bonus_lists = item.get("bonus_lists")
+                modifiers = item.get("modifiers")
+                key = (
+                    item["id"],
+                    tuple(bonus_lists) if bonus_lists else None,
+                    (
+                        tuple((mod["type"], mod["value"]) for mod in modifiers)
+                        if modifiers
+                        else None
+                    ),
+                    *(item.get(field) for field in cls.PET_FIELDS),
+                )
+                index = map_key_index.get(key)
+                if index is None:
+                    index = map_key_index[key] = len(raw_items)
+                    raw_items.append(item)
+
+                item_index.append(index)
+                buyout = auction.get("buyout")
+                price = buyout or auction.get("bid")
+                prices.append(-1 if price is None else price)
+                buyouts.append(buyout or 0)
+                quantities.append(auction["quantity"])
+                time_left = get_time_left_index(auction["time_left"], -1)
+                if time_left < 0:
+                    raw_time_lefts[len(time_lefts)] = auction["time_left"]
+
+                time_lefts.append(time_left)
+
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Malformed auction at {len(quantities)}: {e!r}") from e
+
+        columns = [
+            np.frombuffer(column, dtype=column.typecode)
+            for column in (item_index, prices, buyouts, quantities, time_lefts)
+        ]
+        cls._check_rows(columns[1], columns[4], raw_time_lefts)
+        for item in raw_items:
+            values = [item.get(field) for field in cls.PET_FIELDS]
+            if any(values) and not all(values):
+                raise ValueError(f"Missing pet field: {item!r}")
+
+        items = [AuctionItem.model_construct(**item) for item in raw_items]
+        return cls(items, *columns, timestamp=timestamp)
+
+    @classmethod
+    def decode_commodities(
+        cls, commodities: Iterable[Dict[str, Any]], timestamp: int = None
+    ) -> "DecodedAuctionsResponse":
+        """decode `auctions` field of a commodities response"""
+        map_id_index = {}
+        item_index = array("q")
+        prices = array("q")
+        quantities = array("q")
+        time_lefts = array("b")
+        raw_time_lefts = {}
+        get_time_left_index = cls.MAP_TIME_LEFT_INDEX.get
+        try:
+            for commodity in commodities:
+                item_id = commodity["item"]["id"]
+                index = map_id_index.get(item_id)
+                if index is None:
+                    index = map_id_index[item_id] = len(map_id_index)
+
+                item_index.append(index)
+                prices.append(commodity["unit_price"])
+                quantities.append(commodity["quantity"])
+                time_left = get_time_left_index(commodity["time_left"], -1)
+                if time_left < 0:
+                    raw_time_lefts[len(time_lefts)] = commodity["time_left"]
+
+                time_lefts.append(time_left)
+
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Malformed commodity at {len(quantities)}: {e!r}") from e
+
+        item_index, prices, quantities, time_lefts = (
+            np.frombuffer(column, dtype=column.typecode)
+            for column in (item_index, prices, quantities, time_lefts)
+        )
+        cls._check_rows(prices, time_lefts, raw_time_lefts)
+        items = [CommodityItem.model_construct(id=item_id) for item_id in map_id_index]
+        # for commodity, buyout = unit price
+        return cls(
+            items,
+            item_index,
+            prices,
+            prices,
+            quantities,
+            time_lefts,
+            timestamp=timestamp,
+        )
+
+    @classmethod
+    def from_api(
+        cls,
+        bn_api: BNAPI,
+        namespace: Namespace,
+        connected_realm_id: int = None,
+        faction: FactionEnum | None = None,
+        stream: bool = False,
+    ) -> "DecodedAuctionsResponse":
+        """request and decode auctions, or commodities if `connected_realm_id`
+        not given. with `stream`, auctions are decoded as the body arrives.
+
+        """
+        if connected_realm_id:
+            auction_house_id = AuctionsResponse.MAP_FACTION_AH_ID[faction]
+            if stream:
+                chunks = bn_api.stream_auctions(
+                    namespace, connected_realm_id, auction_house_id=auction_house_id
+                )
+                auctions = iter_json_array(chunks, "auctions")
+            else:
+                resp = bn_api.get_auctions(
+                    namespace, connected_realm_id, auction_house_id=auction_house_id
+                )
+                auctions = resp.get("auctions") or []
+
+            return cls.decode_auctions(auctions)
+
+        else:
+            if stream:
+                chunks = bn_api.stream_commodities(namespace)
+                commodities = iter_json_array(chunks, "auctions")
+            else:
+                commodities = bn_api.get_commodities(namespace).get("auctions") or []
+
+            return cls.decode_commodities(commodities)
+
+
 class Realm(_BaseModel):
     id: int
     region: Any = None
@@ -519,6 +864,16 @@ class ConnectedRealm(_BaseModel):
         resp = bn_api.get_connected_realm(namespace, connected_realm_id)
         return cls.model_validate(resp)
 
+    @classmethod
+    async def async_from_api(
+        cls,
+        bn_api: BNAPI,
+        namespace: Namespace,
+        connected_realm_id: int,
+    ) -> "ConnectedRealm":
+        resp = await bn_api.async_get_connected_realm(namespace, connected_realm_id)
+        return cls.model_validate(resp)
+
     model_config = ConfigDict(extra="ignore")
 
     @model_validator(mode="after")
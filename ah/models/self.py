@@ -1,13 +1,17 @@
 from __future__ import annotations
 from functools import partial
-from heapq import heappush, heappop, nsmallest
+from heapq import heappush, heappop
 from collections import defaultdict
 from logging import Logger, getLogger
 from copy import deepcopy
 from functools import total_ordering, lru_cache
 from itertools import chain
+from array import array
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 import re
+import asyncio
 import json
+import struct
 from typing import (
     List,
     Dict,
@@ -17,6 +21,7 @@ from typing import (
     Optional,
     Union,
     Iterable,
+    Iterator,
     Set,
     TYPE_CHECKING,
 )
@@ -30,10 +35,9 @@ from ah.protobuf.item_db_pb2 import (
     ItemString as ItemStringPB,
     ItemStringType as ItemStringTypePB,
 )
-from ah.storage import BinaryFile, TextFile
+from ah.storage import BinaryFile, MappedFile, TextFile
 from ah.models.base import (
     _RootDictMixin,
-    _RootListMixin,
     ConverterWrapper as CW,
     StrEnum_,
     IntEnum_,
@@ -42,6 +46,7 @@ from ah.models.blizzard import (
     Namespace,
     GenericAuctionsResponseInterface,
     GenericItemInterface,
+    DecodedAuctionsResponse,
     AuctionItem,
     CommodityItem,
     FactionEnum,
@@ -49,8 +54,8 @@ from ah.models.blizzard import (
     ConnectedRealm,
 )
 from ah.defs import SECONDS_IN
-from ah.data import map_bonuses
-from ah.errors import CompressTsError, GetConnectedRealmsIndexError
+from ah.data import BonusTable, map_bonuses
+from ah.errors import CompressTsError, DBFormatError, GetConnectedRealmsIndexError
 
 if TYPE_CHECKING:
     from ah.db import GithubFileForker
@@ -66,6 +71,8 @@ __all__ = (
     "ItemString",
     "MapItemStringMarketValueRecords",
     "MapItemStringMarketValueRecord",
+    "MapItemStringMarketValueRecordsView",
+    "DailyMarketValueSums",
     "RealmCategoryEnum",
     "Meta",
 )
@@ -95,14 +102,25 @@ class DBTypeEnum(StrEnum_):
     AUCTIONS = "auctions"
     COMMODITIES = "commodities"
     META = "meta"
+    # per `RealmCategoryEnum` aggregate, see `DailyMarketValueSums`
+    REGION = "region"
 
 
 class DBExtEnum(StrEnum_):
     GZ = "gz"
+    ZST = "zst"
     BIN = "bin"
+    # uncompressed columnar layout, see `MapItemStringMarketValueRecords.MMAP_*`
+    MMAP = "mmap"
     JSON = "json"
 
 
+class RealmCategoryEnum(StrEnum_):
+    DEFAULT = "default"
+    HARDCORE = "hardcore"
+    SEASONAL = "seasonal"
+
+
 @define(kw_only=True, frozen=True)
 class DBFileName:
     _logger: ClassVar[Logger] = getLogger("DBFileName")
@@ -112,6 +130,9 @@ class DBFileName:
     faction: Optional[FactionEnum] = field(
         default=None, converter=CW.optional(CW.norm(FactionEnum))
     )
+    category: Optional[RealmCategoryEnum] = field(
+        default=None, converter=CW.optional(CW.norm(RealmCategoryEnum))
+    )
     ext: DBExtEnum = field(converter=CW.norm(DBExtEnum))
     SEP: ClassVar[str] = "_"
     SEP_EXT: ClassVar[str] = "."
@@ -121,19 +142,38 @@ class DBFileName:
 
     def validate_root(self):
         # if db_type == META, then ext must be JSON
-        # elif db_type in (AUCTIONS, COMMODITIES), then ext must in (BIN, GZ)
+        # elif db_type in (AUCTIONS, COMMODITIES), then ext must not be JSON
         # else: raise ValueError
         if self.db_type == DBTypeEnum.META:
             if self.ext != DBExtEnum.JSON:
                 raise ValueError("ext must be JSON if db_type.type is META")
         elif self.db_type in (DBTypeEnum.COMMODITIES, DBTypeEnum.AUCTIONS):
-            if self.ext not in (DBExtEnum.BIN, DBExtEnum.GZ):
+            if self.ext == DBExtEnum.JSON:
                 raise ValueError(
-                    "ext must be BIN or GZ if db_type.type is COMMODITIES or AUCTIONS"
+                    "ext must be BIN, GZ, ZST or MMAP if db_type.type is "
+                    "COMMODITIES or AUCTIONS"
                 )
+        elif self.db_type == DBTypeEnum.REGION:
+            if self.ext in (DBExtEnum.JSON, DBExtEnum.MMAP):
+                raise ValueError("ext must be BIN, GZ or ZST if db_type.type is REGION")
         else:
             raise ValueError(f"Invalid db_type: {self.db_type}")
 
+        # if db_type == REGION, then category must be set, crid and faction must
+        # be None (it's for both factions)
+        # else category must be None
+        if self.db_type == DBTypeEnum.REGION:
+            if self.category is None:
+                raise ValueError("category must be set if db_type.type is REGION")
+            if self.crid is not None or self.faction is not None:
+                raise ValueError(
+                    "crid and faction must be None if db_type.type is REGION"
+                )
+            return
+
+        elif self.category is not None:
+            raise ValueError("category must be None if db_type.type is not REGION")
+
         # if db_type == AUCTIONS, then crid must be set
         # elif db_type in (META, COMMODITIES), then crid must be None
         # else: raise ValueError
@@ -175,12 +215,12 @@ class DBFileName:
                 )
 
     def is_compress(self) -> bool:
-        return self.ext == DBExtEnum.GZ
+        return self.ext in (DBExtEnum.GZ, DBExtEnum.ZST)
 
     def to_str(self) -> str:
         parts = filter(
             lambda x: x is not None,
-            [self.namespace, self.db_type, self.crid, self.faction],
+            [self.namespace, self.db_type, self.category, self.crid, self.faction],
         )
         parts = map(lambda s: s if isinstance(s, str) else str(s), parts)
         return f"{self.SEP.join(parts)}{self.SEP_EXT}{self.ext}"
@@ -193,15 +233,21 @@ class DBFileName:
         # 1. namespace, db_type, crid, faction
         # 2. namespace, db_type, crid
         # 3. namespace, db_type
+        # 4. namespace, db_type, category
 
         # pad parts with None
         parts += [None] * (4 - len(parts))
         namespace, db_type, crid, faction = parts
+        category = None
+        if db_type == DBTypeEnum.REGION:
+            category, crid = crid, None
+
         return cls(
             namespace=namespace,
             db_type=db_type,
             crid=crid,
             faction=faction,
+            category=category,
             ext=ext,
         )
 
@@ -245,19 +291,34 @@ class MarketValueRecord:
         return self.timestamp < other.timestamp
 
 
-@define(kw_only=True)
-class MarketValueRecords(_RootListMixin[MarketValueRecord]):
+@define(kw_only=True, init=False, eq=False)
+class MarketValueRecords:
     """
-    Holds an list of MarketValueRecord, ordered by timestamp in ascending order.
+    Holds market value records of an item, ordered by timestamp in ascending order.
 
-    >>> market_value_records = [
-            $market_value_record,
-            ...
-        ]
+    Records are stored column-wise, one numpy array per `MarketValueRecord` field,
+    all arrays share the same length. `MarketValueRecord` objects are only
+    materialized when indexing or iterating.
+
+    >>> market_value_records = {
+            "timestamp": np.array([...], dtype=np.int32),
+            "market_value": np.array([...], dtype=np.int64),
+            "num_auctions": np.array([...], dtype=np.int32),
+            "min_buyout": np.array([...], dtype=np.int64),
+        }
     """
 
     _logger: ClassVar[Logger] = getLogger("MarketValueRecords")
-    __root__: List[MarketValueRecord] = field(default=Factory(list), alias="__root__")
+    timestamp: np.ndarray = field(factory=partial(np.empty, 0, dtype=np.int32))
+    market_value: np.ndarray = field(factory=partial(np.empty, 0, dtype=np.int64))
+    num_auctions: np.ndarray = field(factory=partial(np.empty, 0, dtype=np.int32))
+    min_buyout: np.ndarray = field(factory=partial(np.empty, 0, dtype=np.int64))
+    COLUMNS: ClassVar[Dict[str, type]] = {
+        "timestamp": np.int32,
+        "market_value": np.int64,
+        "num_auctions": np.int32,
+        "min_buyout": np.int64,
+    }
     DAY_WEIGHTS: ClassVar[List[int]] = [
         4,
         5,
@@ -277,6 +338,100 @@ class MarketValueRecords(_RootListMixin[MarketValueRecord]):
     ]
     HISTORICAL_DAYS: ClassVar[int] = 60
 
+    def __init__(self, __root__: Iterable[MarketValueRecord] = None) -> None:
+        self.__attrs_init__()
+        if __root__:
+            self.__root__ = __root__
+
+    @classmethod
+    def from_columns(
+        cls,
+        timestamp: Iterable[int],
+        market_value: Iterable[int],
+        num_auctions: Iterable[int],
+        min_buyout: Iterable[int],
+    ) -> "MarketValueRecords":
+        o = cls()
+        o.timestamp = np.asarray(timestamp, dtype=np.int32)
+        o.market_value = np.asarray(market_value, dtype=np.int64)
+        o.num_auctions = np.asarray(num_auctions, dtype=np.int32)
+        o.min_buyout = np.asarray(min_buyout, dtype=np.int64)
+        return o
+
+    @property
+    def __root__(self) -> List[MarketValueRecord]:
+        return list(self)
+
+    @__root__.setter
+    def __root__(self, records: Iterable[MarketValueRecord]) -> None:
+        records = list(records)
+        for name, dtype in self.COLUMNS.items():
+            column = np.fromiter(
+                (getattr(r, name) for r in records), dtype=dtype, count=len(records)
+            )
+            setattr(self, name, column)
+
+    def _take(self, index: Union[np.ndarray, slice]) -> None:
+        """keep only records selected by `index` (a mask, index array or slice)"""
+        for name in self.COLUMNS:
+            setattr(self, name, getattr(self, name)[index])
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    def __iter__(self) -> Iterator[MarketValueRecord]:
+        for ts, mv, na, mb in zip(
+            self.timestamp.tolist(),
+            self.market_value.tolist(),
+            self.num_auctions.tolist(),
+            self.min_buyout.tolist(),
+        ):
+            yield MarketValueRecord(
+                timestamp=ts, market_value=mv, num_auctions=na, min_buyout=mb
+            )
+
+    def __getitem__(self, index: int) -> MarketValueRecord:
+        return MarketValueRecord(
+            timestamp=self.timestamp[index],
+            market_value=self.market_value[index],
+            num_auctions=self.num_auctions[index],
+            min_buyout=self.min_buyout[index],
+        )
+
+    def __setitem__(self, index: int, value: MarketValueRecord) -> None:
+        for name in self.COLUMNS:
+            getattr(self, name)[index] = getattr(value, name)
+
+    def __eq__(self, other: "MarketValueRecords") -> bool:
+        # same as comparing lists of `MarketValueRecord`, whose `__eq__`
+        # only compares timestamp
+        if not isinstance(other, MarketValueRecords):
+            return NotImplemented
+        return np.array_equal(self.timestamp, other.timestamp)
+
+    def append(self, value: MarketValueRecord) -> None:
+        for name, dtype in self.COLUMNS.items():
+            column = getattr(self, name)
+            setattr(self, name, np.append(column, dtype(getattr(value, name))))
+
+    def extend(self, other: "MarketValueRecords") -> int:
+        for name in self.COLUMNS:
+            column = np.concatenate((getattr(self, name), getattr(other, name)))
+            setattr(self, name, column)
+
+        return len(other)
+
+    def pop(self, index: int) -> MarketValueRecord:
+        record = self[index]
+        mask = np.ones(len(self), dtype=bool)
+        mask[index] = False
+        self._take(mask)
+        return record
+
+    def sort(self) -> None:
+        # stable, same as `list.sort` on `MarketValueRecord`
+        self._take(np.argsort(self.timestamp, kind="stable"))
+
     def add(self, market_value_record: MarketValueRecord, sort: bool = False) -> int:
         # TODO: go over all methods having `sort` parameter, making sure it
         # doesn't do extra work. (for example, for `ItemStringMarketValueRecords`,
@@ -288,13 +443,22 @@ class MarketValueRecords(_RootListMixin[MarketValueRecord]):
         return 1
 
     def empty(self):
-        self.__root__ = []
+        self._take(slice(0, 0))
 
     @classmethod
     def get_compress_end_ts(cls, ts_now: int) -> int:
         # round down to the end of last UTC day
         return ts_now - ts_now % SECONDS_IN.DAY
 
+    @classmethod
+    def get_compress_range(cls, ts_now: int, ts_expires_in: int) -> Tuple[int, int]:
+        """returns the end timestamp and the number of days to compress"""
+        # keep recent records that didn't span over a day
+        ts_end = cls.get_compress_end_ts(ts_now)
+        # round up so we don't miss any records
+        n_days = (ts_expires_in + SECONDS_IN.DAY - 1) // SECONDS_IN.DAY
+        return ts_end, n_days
+
     def compress(self, ts_now: int, ts_expires_in: int, ts_compressed: int = 0) -> int:
         """average all records in every day before `ts_now` down to one.
         the average sample range is `[mid_day - 12hr, mid_day + 12hr]`,
@@ -302,30 +466,35 @@ class MarketValueRecords(_RootListMixin[MarketValueRecord]):
         the averaged record's timestamp is the mid_day.
         also remove records that are older than `ts_expires_in`.
         """
-        # keep recent records that didn't span over a day
-        ts_end = self.get_compress_end_ts(ts_now)
-        # round up so we don't miss any records
-        n_days = (ts_expires_in + SECONDS_IN.DAY - 1) // SECONDS_IN.DAY
-        compressed_records = self.average_by_day(
-            self,
+        ts_end, n_days = self.get_compress_range(ts_now, ts_expires_in)
+        _, _, compressed_records = self.batch_average_by_day(
+            [self],
             ts_end,
             n_days,
-            return_mvr=True,
             ts_compressed=ts_compressed,
         )
-        compressed_records = filter(None, compressed_records)
+        return self.replace_compressed(ts_end, compressed_records)
+
+    def replace_compressed(
+        self, ts_end: int, compressed_records: "MarketValueRecords"
+    ) -> int:
+        """replace records before `ts_end` with `compressed_records`"""
         n_before = len(self)
         # remove records that gets compressed
         self.remove_expired(ts_end)
         # prepend compressed records
-        self.__root__ = [*compressed_records, *self]
+        for name in self.COLUMNS:
+            column = np.concatenate(
+                (getattr(compressed_records, name), getattr(self, name))
+            )
+            setattr(self, name, column)
         n_after = len(self)
         return n_before - n_after
 
     def remove_expired(self, ts_expires: int) -> int:
         """remove records that are older than `ts_expires` (timestamp < ts_expires)"""
         len_before = len(self)
-        self.__root__ = [record for record in self if record.timestamp >= ts_expires]
+        self._take(self.timestamp >= ts_expires)
         return len_before - len(self)
 
     def get_recent_num_auctions(self, ts_last_update_begin: int) -> int:
@@ -334,26 +503,30 @@ class MarketValueRecords(_RootListMixin[MarketValueRecord]):
         # because sometimes there are no auctions for an item
         if (
             self
-            and self[-1].timestamp >= ts_last_update_begin
-            and self[-1].num_auctions
+            and self.timestamp[-1] >= ts_last_update_begin
+            and self.num_auctions[-1]
         ):
-            return self[-1].num_auctions
+            return self.num_auctions[-1]
         else:
             return 0
 
     def get_recent_min_buyout(self, ts_last_update_begin: int) -> int:
-        if self and self[-1].timestamp >= ts_last_update_begin and self[-1].min_buyout:
-            return self[-1].min_buyout
+        if (
+            self
+            and self.timestamp[-1] >= ts_last_update_begin
+            and self.min_buyout[-1]
+        ):
+            return self.min_buyout[-1]
         else:
             return 0
 
     def get_recent_market_value(self, ts_last_update_begin) -> int:
         if (
             self
-            and self[-1].timestamp >= ts_last_update_begin
-            and self[-1].market_value
+            and self.timestamp[-1] >= ts_last_update_begin
+            and self.market_value[-1]
         ):
-            return self[-1].market_value
+            return self.market_value[-1]
         else:
             return 0
 
@@ -384,111 +557,283 @@ class MarketValueRecords(_RootListMixin[MarketValueRecord]):
 
         """
 
-        """
-        1.  put records into buckets of 1 day, later averaging each bucket into 
-            one record or market value. iterating records in descending order. 
-            records that were already averaged (compressed) are skipped for the 
-            sake of performance.
-        """
+        _, days, averaged = cls.batch_average_by_day(
+            [records], ts_now, n_days_before, ts_compressed=ts_compressed
+        )
+        days_average = [None] * n_days_before
+        if return_mvr:
+            for day, record in zip(days.tolist(), averaged):
+                days_average[day] = record
+        else:
+            for day, market_value in zip(
+                days.tolist(), averaged.market_value.tolist()
+            ):
+                days_average[day] = market_value
 
-        buckets = defaultdict(list)
-        skipped = dict()
-        # last day with un-compressed records
-        last_i = -1
-        for record in reversed(records):
-            if record.market_value is None:
-                continue
-            # every `n * SECONDS_IN.DAY` is the start of a new day
-            i = (ts_now - record.timestamp - 1) // SECONDS_IN.DAY
-            if i < 0:
-                continue
+        return days_average
 
-            elif i < n_days_before:
-                # if a record is within the same day of an un-compressed record,
-                # regardless if it's already been compressed or not, we'd add it
-                # to the same bucket as the un-compressed record.
-                # because *average range* of a compressed record is snapped to
-                # UTC day, that means the range starts and ends exactly at
-                # `n * SECONDS_IN.DAY`, see `self.compress()`.
-                # if we're averaging again here with *average range* not snapped
-                # to UTC day, then the last compressed record might fall into
-                # the next bucket of un-compressed records, and needs to be
-                # averaged again.
-                # this could skew the true average of the first day after a
-                # compression period. because we're only giving the compressed
-                # record a weight of 1, instead of the total number of
-                # `MarketValueRecord` it came from.
-                # on the bright side, we have prevented too sudden of a market
-                # value jump in the first 12 hours after a compression period,
-                # due to the fact that it also sampled records from last day.
-                if record.timestamp >= ts_compressed or i == last_i:
-                    last_i = i
-                    buckets[i].append(record)
-                else:
-                    if i in skipped:
-                        raise CompressTsError(
-                            f"skipped record already exists, old: {skipped[i]} "
-                            f"new: {record}"
-                        )
-                    skipped[i] = record
+    @classmethod
+    def batch_average_by_day(
+        cls,
+        records_list: Iterable["MarketValueRecords"],
+        ts_now: int,
+        n_days_before: int,
+        ts_compressed: int = 0,
+    ) -> Tuple[np.ndarray, np.ndarray, "MarketValueRecords"]:
+        """vectorized `average_by_day` over many `MarketValueRecords` at once,
+        the result of each records is the same as calling `average_by_day` on it
+        with `return_mvr=True`.
+
+        returns `groups` - index of the records in `records_list`, `days` - day
+        index (`0` being the oldest day) and the averaged records, all sorted by
+        `(group, day)`.
+        """
+        records_list = list(records_list)
+        n_groups = len(records_list)
+        lengths = np.fromiter(
+            (len(records) for records in records_list), dtype=np.int64, count=n_groups
+        )
+        n_records = int(lengths.sum())
+        if n_records == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, cls()
 
-            else:
-                # because records are sorted, we can stop processing them when we
-                # reach the first record that is older than `n_days_before`
-                break
+        """
+        1.  put records into buckets of 1 day, later averaging each bucket into 
+            one record or market value. records are processed per group in
+            descending order. records that were already averaged (compressed) are
+            skipped for the sake of performance.
+        """
+        columns = {
+            name: np.concatenate([getattr(records, name) for records in records_list])
+            for name in cls.COLUMNS
+        }
+        positions = np.arange(n_records)
+        starts = np.cumsum(lengths) - lengths
+        groups = np.repeat(np.arange(n_groups), lengths)
+        timestamps = columns["timestamp"].astype(np.int64)
+        # every `n * SECONDS_IN.DAY` is the start of a new day
+        buckets = (ts_now - timestamps - 1) // SECONDS_IN.DAY
+        # because records are sorted, we can stop processing them when we
+        # reach the first record that is older than `n_days_before`
+        cutoffs = np.full(n_groups, -1, dtype=np.int64)
+        non_empty = lengths > 0
+        cutoffs[non_empty] = np.maximum.reduceat(
+            np.where(buckets >= n_days_before, positions, -1), starts[non_empty]
+        )
+        in_range = (positions > cutoffs[groups]) & (buckets >= 0)
+        # if a record is within the same day of an un-compressed record,
+        # regardless if it's already been compressed or not, we'd add it
+        # to the same bucket as the un-compressed record.
+        # because *average range* of a compressed record is snapped to
+        # UTC day, that means the range starts and ends exactly at
+        # `n * SECONDS_IN.DAY`, see `self.compress()`.
+        # if we're averaging again here with *average range* not snapped
+        # to UTC day, then the last compressed record might fall into
+        # the next bucket of un-compressed records, and needs to be
+        # averaged again.
+        # this could skew the true average of the first day after a
+        # compression period. because we're only giving the compressed
+        # record a weight of 1, instead of the total number of
+        # `MarketValueRecord` it came from.
+        # on the bright side, we have prevented too sudden of a market
+        # value jump in the first 12 hours after a compression period,
+        # due to the fact that it also sampled records from last day.
+        uncompressed = in_range & (timestamps >= ts_compressed)
+        # position of the closest un-compressed record after each record (that is,
+        # processed before it), which might belongs to another group.
+        closest = np.minimum.accumulate(
+            np.where(uncompressed, positions, n_records)[::-1]
+        )[::-1]
+        closest_next = np.append(closest[1:], n_records)
+        has_closest = closest_next < n_records
+        closest_next[~has_closest] = 0
+        last_buckets = np.where(
+            has_closest & (groups[closest_next] == groups),
+            buckets[closest_next],
+            -1,
+        )
+        accepted = uncompressed | (in_range & (buckets == last_buckets))
+        skipped = in_range & ~accepted
+        keys = groups * n_days_before + (n_days_before - 1 - buckets)
+        (i_skipped,) = np.nonzero(skipped)
+        k_skipped = keys[i_skipped]
+        k_unique, k_counts = np.unique(k_skipped, return_counts=True)
+        if len(k_unique) != len(k_skipped):
+            group = int(k_unique[k_counts > 1][0] // n_days_before)
+            cls._raise_compress_ts_error(
+                records_list[group], buckets[groups == group], skipped[groups == group]
+            )
 
         """
         2.  average each bucket so we get averaged market value for each day
-            note that some buckets may be empty, indicated by `None` instead
-            of an average.
+            note that some buckets may be empty.
         """
-        days_average = [None] * n_days_before
-        for i, records in buckets.items():
-            if not records:
-                continue
+        (i_accepted,) = np.nonzero(accepted)
+        k_accepted = keys[i_accepted]
+        if np.any(k_accepted[1:] < k_accepted[:-1]):
+            # records are not sorted
+            order = np.argsort(k_accepted, kind="stable")
+            i_accepted = i_accepted[order]
+            k_accepted = k_accepted[order]
+
+        is_run_start = np.ones(len(k_accepted), dtype=bool)
+        is_run_start[1:] = k_accepted[1:] != k_accepted[:-1]
+        (run_starts,) = np.nonzero(is_run_start)
+        k_averaged = k_accepted[run_starts]
+        counts = np.diff(np.append(run_starts, len(k_accepted)))
+
+        def bucket_average(column: np.ndarray) -> np.ndarray:
+            sums = np.add.reduceat(column[i_accepted].astype(np.int64), run_starts)
+            return np.floor(sums / counts + 0.5)
+
+        # XXX: TSM keeps the last min_buyout of the day, not average (?)
+        # https://github.com/WouterBink/TradeSkillMaster-1/blob/master/TradeSkillMaster_AuctionDB/Modules/data.lua#L175
+        # NOTE: we use 0 to indicate no buyout, instead of the min price
+        # being 0 (special meaning), we take the first non-zero value of the
+        # two smallest min_buyouts of the day.
+        min_buyouts = columns["min_buyout"][i_accepted]
+        no_buyout = min_buyouts == 0
+        n_no_buyout = np.add.reduceat(no_buyout.astype(np.int64), run_starts)
+        min_min_buyouts = np.minimum.reduceat(
+            np.where(no_buyout, np.iinfo(np.int64).max, min_buyouts), run_starts
+        )
+        min_min_buyouts[
+            (n_no_buyout >= 2) | (min_min_buyouts == np.iinfo(np.int64).max)
+        ] = 0
 
-            day = n_days_before - i - 1
-            n_records = len(records)
-            avg_market_value = sum(r.market_value for r in records) / n_records
-            avg_market_value = int(avg_market_value + 0.5)
-
-            if return_mvr:
-                avg_num_auctions = sum(r.num_auctions for r in records) / n_records
-                avg_num_auctions = int(avg_num_auctions + 0.5)
-                # XXX: TSM keeps the last min_buyout of the day, not average (?)
-                # https://github.com/WouterBink/TradeSkillMaster-1/blob/master/TradeSkillMaster_AuctionDB/Modules/data.lua#L175
-                # NOTE: we use 0 to indicate no buyout, instead of the min price
-                # being 0 (special meaning)
-                min2 = nsmallest(2, (r.min_buyout for r in records))
-                min_min_buyout = next((n for n in min2 if n), 0)
-
-                # mid-day timestamp
-                time_stamp = int(ts_now - (i + 0.5) * SECONDS_IN.DAY)
-                days_average[day] = MarketValueRecord(
-                    timestamp=time_stamp,
-                    market_value=avg_market_value,
-                    num_auctions=avg_num_auctions,
-                    min_buyout=min_min_buyout,
+        """
+        3.  add compressed records that are in range but were skipped in step 1,
+            they take precedence over averages of the same day.
+        """
+        k_all = np.union1d(k_averaged, k_skipped)
+        j_averaged = np.searchsorted(k_all, k_averaged)
+        j_skipped = np.searchsorted(k_all, k_skipped)
+        averaged = {}
+        for name, column in (
+            # mid-day timestamp
+            (
+                "timestamp",
+                ts_now
+                - (n_days_before - 1 - k_averaged % n_days_before) * SECONDS_IN.DAY
+                - SECONDS_IN.DAY // 2,
+            ),
+            ("market_value", bucket_average(columns["market_value"])),
+            ("num_auctions", bucket_average(columns["num_auctions"])),
+            ("min_buyout", min_min_buyouts),
+        ):
+            averaged[name] = np.zeros(len(k_all), dtype=np.int64)
+            averaged[name][j_averaged] = column
+            averaged[name][j_skipped] = columns[name][i_skipped]
+
+        return (
+            k_all // n_days_before,
+            k_all % n_days_before,
+            cls.from_columns(**averaged),
+        )
+
+    @classmethod
+    def _raise_compress_ts_error(
+        cls,
+        records: "MarketValueRecords",
+        buckets: np.ndarray,
+        skipped: np.ndarray,
+    ) -> None:
+        seen = {}
+        (i_skipped,) = np.nonzero(skipped)
+        for i in reversed(i_skipped.tolist()):
+            bucket = int(buckets[i])
+            if bucket in seen:
+                raise CompressTsError(
+                    f"skipped record already exists, old: {records[seen[bucket]]} "
+                    f"new: {records[i]}"
                 )
-            else:
-                days_average[day] = avg_market_value
+            seen[bucket] = i
 
+    @classmethod
+    def batch_market_value(
+        cls,
+        records_list: Iterable["MarketValueRecords"],
+        ts_now: int,
+        ts_compressed: int = 0,
+        historical: bool = True,
+        weighted: bool = True,
+    ) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """vectorized `get_historical_market_value` and `get_weighted_market_value`
+        over many `MarketValueRecords`, both computed from one pass of
+        `batch_average_by_day`. records must be sorted in ascending order by
+        timestamp.
+
+        returns arrays of historical and weighted market values aligned with
+        `records_list`, `None` for the ones not asked for.
         """
-        3.  add compressed records that are in range but were skipped in step 1
+        records_list = list(records_list)
+        n_days = cls.get_market_value_days(historical)
+        groups, days, averaged = cls.batch_average_by_day(
+            records_list, ts_now, n_days, ts_compressed=ts_compressed
+        )
+        return cls.market_value_from_days(
+            len(records_list),
+            groups,
+            days,
+            averaged.market_value,
+            n_days,
+            historical=historical,
+            weighted=weighted,
+        )
+
+    @classmethod
+    def get_market_value_days(cls, historical: bool = True) -> int:
+        """number of days `batch_market_value` averages over"""
+        return cls.HISTORICAL_DAYS if historical else len(cls.DAY_WEIGHTS)
+
+    @classmethod
+    def market_value_from_days(
+        cls,
+        n_groups: int,
+        groups: np.ndarray,
+        days: np.ndarray,
+        market_values: np.ndarray,
+        n_days: int,
+        historical: bool = True,
+        weighted: bool = True,
+    ) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """historical and weighted market values from daily averages, sorted by
+        `(group, day)`. see `batch_market_value`.
         """
-        for i, record in skipped.items():
-            day = n_days_before - i - 1
-            if return_mvr:
-                days_average[day] = MarketValueRecord(
-                    timestamp=record.timestamp,
-                    market_value=record.market_value,
-                    num_auctions=record.num_auctions,
-                    min_buyout=record.min_buyout,
-                )
-            else:
-                days_average[day] = record.market_value
+        n_weights = len(cls.DAY_WEIGHTS)
+
+        def group_average(
+            groups: np.ndarray, values: np.ndarray, weights: np.ndarray
+        ) -> np.ndarray:
+            result = np.zeros(n_groups, dtype=np.int64)
+            if not len(groups):
+                return result
+
+            present, starts = np.unique(groups, return_index=True)
+            sums = np.add.reduceat(values * weights, starts)
+            sum_weights = np.add.reduceat(weights, starts)
+            result[present] = np.floor(sums / sum_weights + 0.5)
+            return result
+
+        historical_market_values = None
+        if historical:
+            historical_market_values = group_average(
+                groups, market_values, np.ones(len(groups), dtype=np.int64)
+            )
 
-        return days_average
+        weighted_market_values = None
+        if weighted:
+            # only the last `n_weights` days are weighted
+            recent = days >= n_days - n_weights
+            day_weights = np.array(cls.DAY_WEIGHTS, dtype=np.int64)
+            weighted_market_values = group_average(
+                groups[recent],
+                market_values[recent],
+                day_weights[days[recent] - (n_days - n_weights)],
+            )
+
+        return historical_market_values, weighted_market_values
 
     def get_historical_market_value(self, ts_now: int, ts_compressed: int = 0) -> int:
         # TSM says it's a 60-day average of "weighted market value", I'm just
@@ -612,7 +957,7 @@ class ItemString:
     )
 
     KEEPED_MODIFIERS_TYPES: ClassVar[List[int]] = [9, 29, 30]
-    MAP_BONUSES: ClassVar[Dict] = map_bonuses
+    MAP_BONUSES: ClassVar[BonusTable] = map_bonuses
     SET_BONUS_ILVL_FIELDS: ClassVar[Set[str]] = {
         "level",
         "base_level",
@@ -621,6 +966,8 @@ class ItemString:
     }
     MOD_TYPE_PLAYER_LEVEL: ClassVar[int] = 9
     DEFAULT_PLAYER_LVL: ClassVar[int] = 1
+    # max number of distinct item shapes kept by the interning cache
+    INTERN_CACHE_SIZE: ClassVar[int] = 1024 * 64
 
     @classmethod
     def from_item(cls, item: GenericItemInterface) -> str:
@@ -633,28 +980,57 @@ class ItemString:
 
     @classmethod
     def from_auction_item(cls, item: AuctionItem) -> "ItemString":
+        """item string of `item`, interned: auctions of the same item shape get
+        the same `ItemString` instance, see `get_intern_stats`.
+
+        """
         if item.pet_species_id is not None:
+            return cls._intern(item.id, None, None, item.pet_species_id)
+
+        return cls._intern(
+            item.id,
+            tuple(item.bonus_lists) if item.bonus_lists else None,
+            (
+                tuple((mod["type"], mod["value"]) for mod in item.modifiers)
+                if item.modifiers
+                else None
+            ),
+            None,
+        )
+
+    @classmethod
+    @lru_cache(INTERN_CACHE_SIZE)
+    def _intern(
+        cls,
+        item_id: int,
+        bonus_lists: Optional[Tuple[int, ...]],
+        modifiers: Optional[Tuple[Tuple[int, int], ...]],
+        pet_species_id: Optional[int],
+    ) -> "ItemString":
+        """build item string from raw item fields, results are cached by
+        these fields. `modifiers` are (type, value) pairs.
+
+        """
+        if pet_species_id is not None:
             return cls(
                 type=ItemStringTypeEnum.PET,
-                id=item.pet_species_id,
+                id=pet_species_id,
                 bonuses=None,
                 mods=None,
             )
 
         else:
-            if item.bonus_lists:
+            if bonus_lists:
                 # we will not sort bonus ids as for now
-                bonuses = list(filter(cls.MAP_BONUSES.__contains__, item.bonus_lists))
+                bonuses = list(filter(cls.MAP_BONUSES.__contains__, bonus_lists))
 
             else:
                 bonuses = None
 
             plvl = None
             heap = []
-            if item.modifiers:
-                for mod in item.modifiers:
-                    mod_type = mod["type"]
-                    mod_value = mod["value"]
+            if modifiers:
+                for mod_type, mod_value in modifiers:
                     if mod_type not in cls.KEEPED_MODIFIERS_TYPES:
                         continue
                     if mod_type == cls.MOD_TYPE_PLAYER_LEVEL:
@@ -680,7 +1056,7 @@ class ItemString:
             if ilvl_info is None:
                 return cls(
                     type=ItemStringTypeEnum.ITEM,
-                    id=item.id,
+                    id=item_id,
                     bonuses=tuple(bonuses) if bonuses else None,
                     mods=tuple(mods) if mods else None,
                 )
@@ -694,7 +1070,7 @@ class ItemString:
                 if is_relative:
                     o = cls(
                         type=ItemStringTypeEnum.ITEM,
-                        id=item.id,
+                        id=item_id,
                         bonuses=None,
                         mods=(ILVL_MODIFIERS_TYPES.REL_ILVL, ilvl),
                     )
@@ -702,7 +1078,7 @@ class ItemString:
                 else:
                     o = cls(
                         type=ItemStringTypeEnum.ITEM,
-                        id=item.id,
+                        id=item_id,
                         bonuses=None,
                         mods=(ILVL_MODIFIERS_TYPES.ABS_ILVL, ilvl),
                     )
@@ -718,20 +1094,24 @@ class ItemString:
 
         if plvl is None:
             plvl = cls.DEFAULT_PLAYER_LVL
+        table = cls.MAP_BONUSES.load()
         ilvl_rel = None
         ilvl_base = None
-        # last_curve_info = None
         last_curve_bid = None
+        last_curve_id = None
         for bid in bonuses:
-            binfo = cls.MAP_BONUSES[bid]
-            if "level" in binfo:
-                delta = binfo["level"]
+            info = table.get_info(bid)
+            if info is None:
+                raise KeyError(bid)
+
+            _, flags, delta, base_level, curve_id = info
+            if flags & table.HAS_LEVEL:
                 ilvl_rel = delta if ilvl_rel is None else ilvl_rel + delta
 
-            elif "base_level" in binfo:
-                ilvl_base = ilvl_base or binfo["base_level"]
+            elif flags & table.HAS_BASE_LEVEL:
+                ilvl_base = ilvl_base or base_level
 
-            elif "curveId" in binfo:
+            elif flags & table.HAS_CURVE:
                 # there might be multiple curves and we need to
                 # sort them, TSM's sorting rule is:
                 # flat1, flat2 -> max(bonus1, bonus2)
@@ -748,17 +1128,9 @@ class ItemString:
                 # therefore it fallback to bonus id instead?
 
                 # TODO: read wowhead tooltip code
-                if last_curve_bid:
-                    # sort by curve id
-                    last_curve_bid = (
-                        last_curve_bid
-                        if cls.MAP_BONUSES[last_curve_bid]["curveId"]
-                        > cls.MAP_BONUSES[bid]["curveId"]
-                        else bid
-                    )
-
-                else:
-                    last_curve_bid = bid
+                # sort by curve id
+                if not last_curve_bid or curve_id >= last_curve_id:
+                    last_curve_bid, last_curve_id = bid, curve_id
 
         if not (ilvl_base or ilvl_rel or last_curve_bid):
             # no ilvl info
@@ -783,45 +1155,108 @@ class ItemString:
             else:
                 return ilvl, False
 
+    @classmethod
+    def get_ilvls(
+        cls, offsets: np.ndarray, bonus_ids: np.ndarray, plvls: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """`get_ilvl` of many bonus lists at once, results are the same.
+
+        bonus list `i` is `bonus_ids[offsets[i]:offsets[i + 1]]` with player
+        level `plvls[i]` (`DEFAULT_PLAYER_LVL` if unknown).
+
+        returns `ilvls`, `is_relative` and `has_ilvl` of every list, where
+        `has_ilvl` is false for lists `get_ilvl` returns `None` for.
+        """
+        table = cls.MAP_BONUSES.load()
+        offsets = np.asarray(offsets, dtype=np.int64)
+        plvls = np.asarray(plvls, dtype=np.int64)
+        n = len(offsets) - 1
+        rows = table.get_rows(bonus_ids)
+        # list of every bonus
+        lists = np.repeat(np.arange(n), np.diff(offsets))
+        flags = table.flags[rows]
+        # first field found in the order of `get_ilvl` counts
+        is_level = (flags & table.HAS_LEVEL) != 0
+        is_base = ~is_level & ((flags & table.HAS_BASE_LEVEL) != 0)
+        is_curve = ~is_level & ~is_base & ((flags & table.HAS_CURVE) != 0)
+
+        # sum of deltas
+        has_rel = np.bincount(lists[is_level], minlength=n) > 0
+        ilvl_rel = np.bincount(
+            lists[is_level], weights=table.levels[rows[is_level]], minlength=n
+        ).astype(np.int64)
+
+        # first non-zero base level, 0 if all are
+        has_base = np.bincount(lists[is_base], minlength=n) > 0
+        base_lists = lists[is_base]
+        base_levels = table.base_levels[rows[is_base]].astype(np.int64)
+        nonzero = base_levels != 0
+        ilvl_base = np.zeros(n, dtype=np.int64)
+        base_lists, first = np.unique(base_lists[nonzero], return_index=True)
+        ilvl_base[base_lists] = base_levels[nonzero][first]
+
+        # last of the highest curve id
+        curve_lists = lists[is_curve]
+        curve_rows = rows[is_curve]
+        # sorted by (list, curve id, position), the last one of a list is kept
+        order = np.lexsort((table.curve_ids[curve_rows], curve_lists))
+        curve_lists, curve_rows = curve_lists[order], curve_rows[order]
+        last = np.ones(len(curve_lists), dtype=bool)
+        last[:-1] = curve_lists[1:] != curve_lists[:-1]
+        curve_lists, curve_rows = curve_lists[last], curve_rows[last]
+        has_curve = np.zeros(n, dtype=bool)
+        has_curve[curve_lists] = True
+        ilvl_curve = np.zeros(n, dtype=np.int64)
+        ilvl_curve[curve_lists] = table.get_ilvls_from_curve(
+            curve_rows, plvls[curve_lists]
+        )
+
+        ilvls = np.where(
+            has_curve, ilvl_curve, np.where(has_base, ilvl_base + ilvl_rel, ilvl_rel)
+        )
+        is_relative = ~has_curve & ~has_base
+        has_ilvl = np.where(
+            has_curve | has_base,
+            ilvls >= 0,
+            has_rel & (ilvl_rel != 0),
+        )
+        # base level of 0 alone doesn't count
+        has_ilvl &= has_curve | (ilvl_base != 0) | (ilvl_rel != 0)
+        return ilvls, is_relative, has_ilvl
+
     @classmethod
     @lru_cache(1024 * 512)
-    # def get_ilvl_from_curve(cls, curve_points: List[Dict], plvl=DEFAULT_PLAYER_LVL):
     def get_ilvl_from_curve(cls, bonus_id: int, plvl: int) -> Optional[int]:
-        curve_points = cls.MAP_BONUSES[bonus_id]["points"]
-        # >>> curve_points = [
-        #     # [player_level, item_level]; sorted by player_level
-        #     [1, 10],
-        #     [2, 20],
-        #     ...
-        # ]
-        if not curve_points:
-            raise ValueError("Invalid curve points")
-
-        # assuming it's soreted by player level
-        plvl = max(plvl, curve_points[0][0])
-        plvl = min(plvl, curve_points[-1][0])
-        point1, point2 = None, None
-        for point in curve_points:
-            if point[0] == plvl:
-                return point[1]
-            elif point[0] > plvl:
-                point2 = point
-                break
-            else:
-                point1 = point
-
-        if not point1 or not point2:
-            # I don't think this could ever happen...
-            raise ValueError("Invalid curve points")
+        """item level of curve bonus `bonus_id` at player level `plvl`, see
+        `BonusTable.get_ilvl_from_curve`
+        """
+        table = cls.MAP_BONUSES
+        row = table.get_row(bonus_id)
+        if row < 0:
+            raise KeyError(bonus_id)
 
-        # linear interpolation
-        plvl1, ilvl1 = point1[0], point1[1]
-        plvl2, ilvl2 = point2[0], point2[1]
-        return int((plvl - plvl1) * (ilvl2 - ilvl1) / (plvl2 - plvl1) + ilvl1 + 0.5)
+        return table.get_ilvl_from_curve(row, plvl)
 
     @classmethod
     def from_commodity_item(cls, item: CommodityItem) -> "ItemString":
-        return cls(type=ItemStringTypeEnum.ITEM, id=item.id, bonuses=None, mods=None)
+        # same as an auction item without bonuses or modifiers
+        return cls._intern(item.id, None, None, None)
+
+    @classmethod
+    def get_intern_stats(cls) -> Dict[str, int]:
+        """hit / miss statistics of the interning cache of `from_item`"""
+        info = cls._intern.cache_info()
+        return {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "max_size": info.maxsize,
+        }
+
+    @classmethod
+    def clear_intern_cache(cls) -> None:
+        """needed when `MAP_BONUSES` or `KEEPED_MODIFIERS_TYPES` changes"""
+        cls._intern.cache_clear()
 
     @classmethod
     def from_protobuf(cls, proto: ItemStringPB) -> "ItemString":
@@ -918,6 +1353,9 @@ class MapItemStringMarketValueRecord(_RootDictMixin[ItemString, MarketValueRecor
     MAX_STD_MUL: ClassVar[float] = 1.5
     SAMPLE_LO: ClassVar[float] = 0.15
     SAMPLE_HI: ClassVar[float] = 0.3
+    # below this many auctions, `from_response` stays in process regardless of
+    # `workers`, shipping shards costs more than it saves
+    MIN_PARALLEL_AUCTIONS: ClassVar[int] = 50_000
 
     @classmethod
     def calc_market_value(
@@ -996,19 +1434,206 @@ class MapItemStringMarketValueRecord(_RootDictMixin[ItemString, MarketValueRecor
         return samples_s / samples_n
 
     @classmethod
-    def _heap_pop_all(cls, heap: list) -> Generator[Tuple[int, int], None, None]:
-        while heap:
-            yield heappop(heap)
+    def batch_calc_market_value(
+        cls,
+        prices: np.ndarray,
+        quantities: np.ndarray,
+        offsets: np.ndarray,
+    ) -> np.ndarray:
+        """vectorized `calc_market_value` over many items at once, price groups
+        of item `i` are `prices[offsets[i]:offsets[i + 1]]` and the same slice of
+        `quantities`, sorted by price. `item_n` of an item is the sum of its
+        quantities.
+
+        returns market value of every item, `nan` for items without auctions.
+        """
+        prices = np.asarray(prices)
+        quantities = np.asarray(quantities, dtype=np.int64)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        n_items = len(offsets) - 1
+        starts, ends = offsets[:-1], offsets[1:]
+        positions = np.arange(len(prices))
+        items = np.repeat(np.arange(n_items), ends - starts)
+        item_starts = starts[items]
+
+        def group_sum(values: np.ndarray) -> np.ndarray:
+            # sums of int64 may wrap around in between, differences of them are
+            # still exact as long as the sum of each group fits
+            cumsum = np.zeros(len(values) + 1, dtype=values.dtype)
+            np.cumsum(values, out=cumsum[1:])
+            return cumsum[ends] - cumsum[starts]
+
+        """
+        1.  find where `calc_market_value` stops sampling: before the first group
+            past `lo` that jumps in price or starts at `hi`, or at the first
+            group going over `hi` which is then cut to `hi`.
+        """
+        q_cumsum = np.zeros(len(quantities) + 1, dtype=np.int64)
+        np.cumsum(quantities, out=q_cumsum[1:])
+        item_n = q_cumsum[ends] - q_cumsum[starts]
+        lo = (item_n * cls.SAMPLE_LO).astype(np.int64)[items]
+        hi = (item_n * cls.SAMPLE_HI).astype(np.int64)[items]
+        # sampled quantity of the item before and after each group
+        n_before = q_cumsum[:-1] - q_cumsum[item_starts]
+        n_after = n_before + quantities
+        prev_prices = np.empty_like(prices)
+        prev_prices[:1] = prices[:1]
+        prev_prices[1:] = prices[:-1]
+        stop_before = (
+            (positions != item_starts)
+            & (n_before >= lo)
+            & ((n_before >= hi) | (prices >= cls.MAX_JUMP_MUL * prev_prices))
+        )
+        is_stop = stop_before | (n_after > hi)
+        (i_stops,) = np.nonzero(is_stop)
+        is_first = np.ones(len(i_stops), dtype=bool)
+        is_first[1:] = items[i_stops[1:]] != items[i_stops[:-1]]
+        i_stops = i_stops[is_first]
+        stops = ends.copy()
+        stops[items[i_stops]] = i_stops
+
+        # sampled quantity of each group
+        weights = np.where(positions < stops[items], quantities, 0)
+        i_cuts = i_stops[~stop_before[i_stops]]
+        cut = hi[i_cuts] - n_before[i_cuts]
+        # the first group is always sampled, at least once
+        cut[(cut == 0) & (i_cuts == item_starts[i_cuts])] = 1
+        weights[i_cuts] = cut
+
+        """
+        2.  remove samples further than `MAX_STD_MUL` standard deviations from
+            mean of the samples.
+        """
+        samples_n = group_sum(weights)
+        samples_s = group_sum(prices * weights)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            samples_mean = samples_s / samples_n
+            deviations = prices - samples_mean[items]
+            # accumulated in order, same as `calc_market_value`
+            samples_variance = np.bincount(
+                items, weights=deviations**2 * weights, minlength=n_items
+            )
+            ddof = (samples_n != item_n).astype(np.int64)
+            samples_std = np.where(
+                samples_n > 1, np.sqrt(samples_variance / (samples_n - ddof)), 0
+            )
+            samples_wstd = samples_std * cls.MAX_STD_MUL
+            is_outlier = (weights > 0) & (np.abs(deviations) > samples_wstd[items])
+            samples_s = samples_s - group_sum(np.where(is_outlier, prices * weights, 0))
+            samples_n = samples_n - group_sum(np.where(is_outlier, weights, 0))
+            return np.where(item_n > 0, samples_s / samples_n, np.nan)
+
+    @classmethod
+    def _calc_shard(
+        cls,
+        n_codes: int,
+        codes: np.ndarray,
+        prices: np.ndarray,
+        quantities: np.ndarray,
+        buyouts: np.ndarray,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """compute market values for auctions of a shard, auctions are given as
+        columns, `codes` tells which item (0 to `n_codes` - 1) an auction is for.
+
+        runs in worker processes, so takes and returns only plain data.
+        returns market value (`nan` if not available), total quantity and
+        min buyout (0 if there's no buyout) for every code.
+
+        """
+        # auctions of an item are contiguous and sorted by (price, quantity)
+        order = np.lexsort((quantities, prices, codes))
+        codes = codes[order]
+        prices = prices[order]
+        quantities = quantities[order]
+        buyouts = buyouts[order]
+        counts = np.bincount(codes, minlength=n_codes)
+        offsets = np.zeros(n_codes + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        starts = offsets[:-1][counts > 0]
+
+        num_auctions = np.zeros(n_codes, dtype=np.int64)
+        num_auctions[counts > 0] = np.add.reduceat(quantities, starts)
+        # if all auctions are bid-only, min_buyout = 0
+        no_buyout = np.iinfo(np.int64).max
+        min_buyouts = np.zeros(n_codes, dtype=np.int64)
+        min_buyouts[counts > 0] = np.minimum.reduceat(
+            np.where(buyouts > 0, buyouts, no_buyout), starts
+        )
+        min_buyouts[min_buyouts == no_buyout] = 0
+
+        # we're using bid as price for auctions without buyout
+        market_values = cls.batch_calc_market_value(prices, quantities, offsets)
+        return market_values, num_auctions, min_buyouts
 
     @classmethod
     def from_response(
         cls,
         response: GenericAuctionsResponseInterface,
         game_version: GameVersionEnum = GameVersionEnum.RETAIL,
+        workers: int = 1,
+        executor: Optional[Executor] = None,
     ) -> "MapItemStringMarketValueRecord":
+        """build increment from response.
+
+        with `workers` > 1, auctions are sharded by the hash of their item
+        string, shards are computed in `executor` (a temporary process pool if
+        not given) and merged, the result is identical to `workers` = 1.
+
+        """
         obj = cls()
-        # >>> [total_quantity, min_buyout, [(price, quantity), ...]]
-        temp = {}
+        if isinstance(response, DecodedAuctionsResponse):
+            map_item_string_code, columns = cls._columns_from_decoded(
+                response, game_version
+            )
+        else:
+            map_item_string_code, columns = cls._columns_from_auctions(
+                response, game_version
+            )
+
+        n_codes = len(map_item_string_code)
+        if workers > 1 and len(columns[0]) >= cls.MIN_PARALLEL_AUCTIONS:
+            market_values, num_auctions, min_buyouts = cls._calc_shards(
+                map_item_string_code, columns, workers, executor
+            )
+        else:
+            market_values, num_auctions, min_buyouts = cls._calc_shard(
+                n_codes, *columns
+            )
+
+        timestamp = response.get_timestamp()
+        for item_string, market_value, num_auction, min_buyout in zip(
+            map_item_string_code,
+            market_values.tolist(),
+            num_auctions.tolist(),
+            min_buyouts.tolist(),
+        ):
+            # nan for items without auctions
+            if market_value > 0:
+                obj[item_string] = MarketValueRecord(
+                    timestamp=timestamp,
+                    market_value=np.int64(market_value + 0.5),
+                    num_auctions=num_auction,
+                    min_buyout=min_buyout,
+                )
+
+        return obj
+
+    @classmethod
+    def _columns_from_auctions(
+        cls,
+        response: GenericAuctionsResponseInterface,
+        game_version: GameVersionEnum,
+    ) -> Tuple[Dict[ItemString, int], Tuple[np.ndarray, ...]]:
+        """flatten auctions into (code, price, quantity, buyout) columns,
+        codes of item strings are given in order of their first appearance.
+
+        """
+        map_item_string_code = {}
+        # 8 bytes per value, auctions themselves aren't kept (could be streamed)
+        codes = array("q")
+        prices = array("q")
+        quantities = array("q")
+        buyouts = array("q")
 
         for auction in response.get_auctions():
             item_string = ItemString.from_item(auction.get_item())
@@ -1031,34 +1656,108 @@ class MapItemStringMarketValueRecord(_RootDictMixin[ItemString, MarketValueRecor
                 # - we will normalize buyout=None to 0 (same as classic)
                 buyout = buyout or 0
 
-            if item_string not in temp:
-                temp[item_string] = [0, float("inf"), []]
-
-            temp[item_string][0] += quantity
-            if buyout and buyout < temp[item_string][1]:
-                temp[item_string][1] = buyout
+            code = map_item_string_code.setdefault(
+                item_string, len(map_item_string_code)
+            )
+            codes.append(code)
+            prices.append(price)
+            quantities.append(quantity)
+            buyouts.append(buyout)
+
+        columns = tuple(
+            np.frombuffer(column, dtype=np.int64)
+            for column in (codes, prices, quantities, buyouts)
+        )
+        return map_item_string_code, columns
 
-            # we're using bid as price for auctions without buyout
-            heappush(temp[item_string][2], (price, quantity))
+    @classmethod
+    def _columns_from_decoded(
+        cls,
+        response: DecodedAuctionsResponse,
+        game_version: GameVersionEnum,
+    ) -> Tuple[Dict[ItemString, int], Tuple[np.ndarray, ...]]:
+        """`_columns_from_auctions` for decoded responses, item strings are
+        resolved once per unique item, the rest is done on whole columns.
 
-        for item_string in temp:
-            market_value = cls.calc_market_value(
-                temp[item_string][0], cls._heap_pop_all(temp[item_string][2])
-            )
-            if market_value:
-                market_value = np.int64(market_value + 0.5)
-                # if all auctions are bid-only, min_buyout = 0
-                min_buyout = (
-                    0 if temp[item_string][1] == float("inf") else temp[item_string][1]
+        """
+        map_item_string_code = {}
+        # unique items are in order of first appearance, so are their item strings
+        item_codes = np.fromiter(
+            (
+                map_item_string_code.setdefault(
+                    ItemString.from_item(item), len(map_item_string_code)
                 )
-                obj[item_string] = MarketValueRecord(
-                    timestamp=response.get_timestamp(),
-                    market_value=market_value,
-                    num_auctions=temp[item_string][0],
-                    min_buyout=min_buyout,
+                for item in response.items
+            ),
+            dtype=np.int64,
+            count=len(response.items),
+        )
+        codes = item_codes[response.item_index]
+        prices = response.prices
+        quantities = response.quantities
+        # buyout=None is already 0
+        buyouts = response.buyouts
+        if game_version in (GameVersionEnum.CLASSIC, GameVersionEnum.CLASSIC_WLK):
+            # prices are per stack, see `_columns_from_auctions`
+            buyouts = buyouts // quantities
+            prices = prices // quantities
+
+        return map_item_string_code, (codes, prices, quantities, buyouts)
+
+    @classmethod
+    def _calc_shards(
+        cls,
+        map_item_string_code: Dict[ItemString, int],
+        columns: Tuple[np.ndarray, ...],
+        workers: int,
+        executor: Optional[Executor] = None,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """`_calc_shard` over shards split by item string hash, in parallel,
+        results are merged back in order of codes.
+
+        """
+        codes = columns[0]
+        n_codes = len(map_item_string_code)
+        code_shards = np.fromiter(
+            (hash(item_string) % workers for item_string in map_item_string_code),
+            dtype=np.int64,
+            count=n_codes,
+        )
+        # codes of each shard, and their positions in the shard
+        shard_codes = [np.flatnonzero(code_shards == i) for i in range(workers)]
+        local_codes = np.empty(n_codes, dtype=np.int64)
+        for shard_code in shard_codes:
+            local_codes[shard_code] = np.arange(len(shard_code))
+
+        auction_shards = code_shards[codes]
+        args = []
+        for i in range(workers):
+            mask = auction_shards == i
+            args.append(
+                (
+                    len(shard_codes[i]),
+                    local_codes[codes[mask]],
+                    *(column[mask] for column in columns[1:]),
                 )
+            )
 
-        return obj
+        if executor is None:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(cls._calc_shard, *zip(*args)))
+        else:
+            results = list(executor.map(cls._calc_shard, *zip(*args)))
+
+        market_values = np.full(n_codes, np.nan)
+        num_auctions = np.zeros(n_codes, dtype=np.int64)
+        min_buyouts = np.zeros(n_codes, dtype=np.int64)
+        for shard_code, (shard_values, shard_auctions, shard_buyouts) in zip(
+            shard_codes, results
+        ):
+            market_values[shard_code] = shard_values
+            num_auctions[shard_code] = shard_auctions
+            min_buyouts[shard_code] = shard_buyouts
+
+        return market_values, num_auctions, min_buyouts
 
 
 @define(kw_only=True)
@@ -1071,6 +1770,24 @@ class MapItemStringMarketValueRecords(_RootDictMixin[ItemString, MarketValueReco
     """
 
     _logger: ClassVar[Logger] = getLogger("MapItemStringMarketValueRecords")
+    # `.mmap` file layout, a sequence of segments, each one is:
+    #   header      `MMAP_HEADER`
+    #   int64       record bounds of every item, `[n_items + 1]`
+    #   int64       item string bounds in index, `[n_items + 1]`
+    #   columns     fixed width, `[n_records]` each, in order of `MMAP_COLUMNS`
+    #   index       serialized `ItemStringPB` of every item, `[index_size]`
+    #   padding     to 8 bytes
+    # all little endian, arrays are aligned to their item size.
+    MMAP_MAGIC: ClassVar[bytes] = b"AHDB"
+    MMAP_VERSION: ClassVar[int] = 1
+    # magic, version, n_items, n_records, index_size
+    MMAP_HEADER: ClassVar[struct.Struct] = struct.Struct("<4sH2xI4xQQ")
+    MMAP_COLUMNS: ClassVar[Dict[str, str]] = {
+        "market_value": "<i8",
+        "min_buyout": "<i8",
+        "timestamp": "<i4",
+        "num_auctions": "<i4",
+    }
     __root__: Dict[ItemString, MarketValueRecords] = field(
         default=Factory(partial(defaultdict, MarketValueRecords)),
         alias="__root__",
@@ -1125,13 +1842,12 @@ class MapItemStringMarketValueRecords(_RootDictMixin[ItemString, MarketValueReco
         n_added_records = 0
         n_added_entries = 0
         for item_string, market_value_records in other.items():
-            for market_value_record in market_value_records:
-                n_added_records_, n_added_entries_ = self.add_market_value_record(
-                    item_string, market_value_record, sort=False
-                )
-                n_added_records += n_added_records_
-                n_added_entries += n_added_entries_
+            if not market_value_records:
+                continue
 
+            if not self[item_string]:
+                n_added_entries += 1
+            n_added_records += self[item_string].extend(market_value_records)
             if sort:
                 self[item_string].sort()
 
@@ -1188,10 +1904,27 @@ class MapItemStringMarketValueRecords(_RootDictMixin[ItemString, MarketValueReco
         ts_expires_in: int,
         ts_compressed: int = 0,
     ) -> int:
+        # compress all entries in one go, see `MarketValueRecords.compress`
+        ts_end, n_days = MarketValueRecords.get_compress_range(ts_now, ts_expires_in)
+        records_list = list(self.values())
+        groups, _, compressed_records = MarketValueRecords.batch_average_by_day(
+            records_list,
+            ts_end,
+            n_days,
+            ts_compressed=ts_compressed,
+        )
+        bounds = np.searchsorted(groups, np.arange(len(records_list) + 1)).tolist()
         n_removed = 0
-        for market_value_records in self.values():
-            n_removed += market_value_records.compress(
-                ts_now, ts_expires_in, ts_compressed=ts_compressed
+        for i, market_value_records in enumerate(records_list):
+            lo, hi = bounds[i], bounds[i + 1]
+            n_removed += market_value_records.replace_compressed(
+                ts_end,
+                MarketValueRecords.from_columns(
+                    **{
+                        name: getattr(compressed_records, name)[lo:hi]
+                        for name in MarketValueRecords.COLUMNS
+                    }
+                ),
             )
 
         return n_removed
@@ -1206,25 +1939,57 @@ class MapItemStringMarketValueRecords(_RootDictMixin[ItemString, MarketValueReco
         return n_removed_entries
 
     @classmethod
-    def from_protobuf(cls, pb_item_db: ItemDB) -> "MapItemStringMarketValueRecords":
+    def _from_item_columns(
+        cls, item_columns: Iterable[Tuple[ItemString, Tuple[np.ndarray, ...]]]
+    ) -> "MapItemStringMarketValueRecords":
+        """build from `(item_string, columns)` pairs, columns are in the order of
+        `MarketValueRecords.COLUMNS`. an item may appear more than once if read
+        from appended segments (see `to_file`), records of every occurrence are
+        concatenated in order.
+        """
+        # item_string -> list of column tuples, one per segment
+        segments = {}
+        for item_string, columns in item_columns:
+            segments.setdefault(item_string, []).append(columns)
+
         o = cls()
-        for pb_item in pb_item_db.items:
-            market_value_records = MarketValueRecords()
-            for pb_item_mv_record in pb_item.market_value_records:
-                market_value_records.add(
-                    MarketValueRecord(
-                        timestamp=pb_item_mv_record.timestamp,
-                        market_value=pb_item_mv_record.market_value,
-                        num_auctions=pb_item_mv_record.num_auctions,
-                        min_buyout=pb_item_mv_record.min_buyout,
-                    ),
-                    sort=False,
-                )
-            item_string = ItemString.from_protobuf(pb_item.item_string)
-            o[item_string] = market_value_records
+        for item_string, item_segments in segments.items():
+            if len(item_segments) == 1:
+                columns = item_segments[0]
+            else:
+                columns = tuple(map(np.concatenate, zip(*item_segments)))
+
+            o[item_string] = MarketValueRecords.from_columns(
+                **dict(zip(MarketValueRecords.COLUMNS, columns))
+            )
 
         return o
 
+    @classmethod
+    def _iter_protobuf_columns(
+        cls, pb_item_db: ItemDB
+    ) -> Iterator[Tuple[ItemString, Tuple[np.ndarray, ...]]]:
+        for pb_item in pb_item_db.items:
+            pb_records = pb_item.market_value_records
+            n = len(pb_records)
+            columns = (
+                np.fromiter((r.timestamp for r in pb_records), dtype=np.int32, count=n),
+                np.fromiter(
+                    (r.market_value for r in pb_records), dtype=np.int64, count=n
+                ),
+                np.fromiter(
+                    (r.num_auctions for r in pb_records), dtype=np.int32, count=n
+                ),
+                np.fromiter(
+                    (r.min_buyout for r in pb_records), dtype=np.int64, count=n
+                ),
+            )
+            yield ItemString.from_protobuf(pb_item.item_string), columns
+
+    @classmethod
+    def from_protobuf(cls, pb_item_db: ItemDB) -> "MapItemStringMarketValueRecords":
+        return cls._from_item_columns(cls._iter_protobuf_columns(pb_item_db))
+
     def to_protobuf(self) -> ItemDB:
         pb_item_db = ItemDB()
         for item_string, market_value_records in self.items():
@@ -1233,12 +1998,17 @@ class MapItemStringMarketValueRecords(_RootDictMixin[ItemString, MarketValueReco
                 continue
             pb_item = pb_item_db.items.add()
             pb_item.item_string.CopyFrom(item_string.to_protobuf())
-            for mv_record in market_value_records:
+            for ts, mv, na, mb in zip(
+                market_value_records.timestamp.tolist(),
+                market_value_records.market_value.tolist(),
+                market_value_records.num_auctions.tolist(),
+                market_value_records.min_buyout.tolist(),
+            ):
                 pb_item_mv_record = pb_item.market_value_records.add()
-                pb_item_mv_record.timestamp = mv_record.timestamp
-                pb_item_mv_record.market_value = mv_record.market_value
-                pb_item_mv_record.num_auctions = mv_record.num_auctions
-                pb_item_mv_record.min_buyout = mv_record.min_buyout
+                pb_item_mv_record.timestamp = ts
+                pb_item_mv_record.market_value = mv
+                pb_item_mv_record.num_auctions = na
+                pb_item_mv_record.min_buyout = mb
 
         return pb_item_db
 
@@ -1254,6 +2024,100 @@ class MapItemStringMarketValueRecords(_RootDictMixin[ItemString, MarketValueReco
     def to_protobuf_bytes(self) -> bytes:
         return self.to_protobuf().SerializeToString()
 
+    @classmethod
+    def _iter_mmap_columns(
+        cls, buffer
+    ) -> Iterator[Tuple[ItemString, Tuple[np.ndarray, ...]]]:
+        offset = 0
+        while offset < len(buffer):
+            if len(buffer) - offset < cls.MMAP_HEADER.size:
+                raise DBFormatError(f"truncated segment header at {offset}")
+
+            magic, version, n_items, n_records, index_size = (
+                cls.MMAP_HEADER.unpack_from(buffer, offset)
+            )
+            if magic != cls.MMAP_MAGIC:
+                raise DBFormatError(f"bad segment magic {magic!r} at {offset}")
+
+            if version != cls.MMAP_VERSION:
+                raise DBFormatError(f"unsupported segment version {version!r}")
+
+            segment_size = cls.get_mmap_segment_size(n_items, n_records, index_size)
+            if len(buffer) - offset < segment_size:
+                raise DBFormatError(f"truncated segment at {offset}")
+
+            pos = offset + cls.MMAP_HEADER.size
+
+            def view(dtype: str, count: int) -> np.ndarray:
+                nonlocal pos
+                array_ = np.frombuffer(buffer, dtype=dtype, count=count, offset=pos)
+                pos += array_.nbytes
+                return array_
+
+            record_bounds = view("<i8", n_items + 1).tolist()
+            index_bounds = view("<i8", n_items + 1).tolist()
+            columns = {
+                name: view(dtype, n_records)
+                for name, dtype in cls.MMAP_COLUMNS.items()
+            }
+            index = memoryview(buffer)[pos : pos + index_size]
+            for i in range(n_items):
+                lo, hi = record_bounds[i], record_bounds[i + 1]
+                pb_item_string = ItemStringPB.FromString(
+                    index[index_bounds[i] : index_bounds[i + 1]]
+                )
+                yield ItemString.from_protobuf(pb_item_string), tuple(
+                    columns[name][lo:hi] for name in MarketValueRecords.COLUMNS
+                )
+
+            offset += segment_size
+
+    @classmethod
+    def get_mmap_segment_size(cls, n_items: int, n_records: int, index_size: int):
+        size = (
+            cls.MMAP_HEADER.size
+            + 2 * 8 * (n_items + 1)
+            + sum(np.dtype(t).itemsize for t in cls.MMAP_COLUMNS.values()) * n_records
+            + index_size
+        )
+        # keep next segment aligned
+        return size + -size % 8
+
+    @classmethod
+    def from_mmap_buffer(cls, buffer) -> "MapItemStringMarketValueRecords":
+        """records are read-only views into `buffer`, nothing gets copied unless
+        an item is spread over multiple segments.
+        """
+        return cls._from_item_columns(cls._iter_mmap_columns(buffer))
+
+    def to_mmap_bytes(self) -> bytes:
+        entries = [(k, v) for k, v in self.items() if v]
+        n_items = len(entries)
+        record_bounds = np.zeros(n_items + 1, dtype="<i8")
+        np.cumsum([len(v) for _, v in entries], out=record_bounds[1:])
+        index_entries = [k.to_protobuf().SerializeToString() for k, _ in entries]
+        index_bounds = np.zeros(n_items + 1, dtype="<i8")
+        np.cumsum([len(b) for b in index_entries], out=index_bounds[1:])
+        n_records = int(record_bounds[-1])
+        index_size = int(index_bounds[-1])
+        parts = [
+            self.MMAP_HEADER.pack(
+                self.MMAP_MAGIC, self.MMAP_VERSION, n_items, n_records, index_size
+            ),
+            record_bounds.tobytes(),
+            index_bounds.tobytes(),
+        ]
+        for name, dtype in self.MMAP_COLUMNS.items():
+            column = np.concatenate(
+                [np.empty(0, dtype=dtype), *(getattr(v, name) for _, v in entries)]
+            )
+            parts.append(column.astype(dtype, copy=False).tobytes())
+
+        parts.extend(index_entries)
+        size = self.get_mmap_segment_size(n_items, n_records, index_size)
+        parts.append(bytes(size - sum(map(len, parts))))
+        return b"".join(parts)
+
     @classmethod
     def from_file(
         cls, file: BinaryFile, forker: GithubFileForker = None
@@ -1267,21 +2131,416 @@ class MapItemStringMarketValueRecords(_RootDictMixin[ItemString, MarketValueReco
             )
             return cls()
 
+        if isinstance(file, MappedFile):
+            obj = cls.from_mmap_buffer(file.open_mmap())
+            cls._logger.info(f"{file} mapped.")
+            return obj
+
         with file.open("rb") as f:
             obj = cls.from_protobuf_bytes(f.read())
             cls._logger.info(f"{file} loaded.")
             return obj
 
-    def to_file(self, file: BinaryFile) -> None:
-        with file.open("wb") as f:
-            f.write(self.to_protobuf_bytes())
-            self._logger.info(f"{file} saved.")
+    def to_file(self, file: BinaryFile, append: bool = False) -> None:
+        """write to `file`, or append to it as a new segment if `append`.
 
+        serialized `ItemDB`s concatenate into one `ItemDB` with all of their
+        items, and gzip reads concatenated members as one stream, so appended
+        segments are merged by `from_file` without changing the file format.
+        """
+        if isinstance(file, MappedFile):
+            data = self.to_mmap_bytes()
+        else:
+            data = self.to_protobuf_bytes()
 
-class RealmCategoryEnum(StrEnum_):
-    DEFAULT = "default"
-    HARDCORE = "hardcore"
-    SEASONAL = "seasonal"
+        with file.open("ab" if append else "wb") as f:
+            f.write(data)
+            self._logger.info(f"{file} {'appended' if append else 'saved'}.")
+
+
+class MapItemStringMarketValueRecordsView:
+    """read-only view of several `MapItemStringMarketValueRecords` chained
+    together, behaves as if they were `extend`ed into one, without copying.
+
+    records of an item that appears in more than one map are concatenated
+    (and sorted if `sort`) on access, others are returned as is.
+
+    >>> view = MapItemStringMarketValueRecordsView(commodities, auctions)
+    >>> for item_string, market_value_records in view.items():
+    ...     ...
+
+    """
+
+    def __init__(self, *maps: MapItemStringMarketValueRecords, sort: bool = False):
+        self.maps = maps
+        self.sort = sort
+        # item_string -> maps that have records of it, in the order of
+        # first appearance, same as `MapItemStringMarketValueRecords.extend`
+        self._index: Optional[Dict[ItemString, Tuple[int, ...]]] = None
+
+    def _get_index(self) -> Dict[ItemString, Tuple[int, ...]]:
+        if self._index is None:
+            index = {}
+            for i, map_ in enumerate(self.maps):
+                for item_string, market_value_records in map_.items():
+                    if market_value_records:
+                        index[item_string] = index.get(item_string, ()) + (i,)
+
+            self._index = index
+
+        return self._index
+
+    def __len__(self) -> int:
+        return len(self._get_index())
+
+    def __contains__(self, item_string: ItemString) -> bool:
+        return item_string in self._get_index()
+
+    def __iter__(self) -> Iterator[ItemString]:
+        return iter(self._get_index())
+
+    def __getitem__(self, item_string: ItemString) -> MarketValueRecords:
+        return self._get(item_string, self._get_index()[item_string])
+
+    def _get(
+        self, item_string: ItemString, i_maps: Tuple[int, ...]
+    ) -> MarketValueRecords:
+        if len(i_maps) == 1:
+            return self.maps[i_maps[0]][item_string]
+
+        market_value_records = MarketValueRecords.from_columns(
+            **{
+                name: np.concatenate(
+                    [getattr(self.maps[i][item_string], name) for i in i_maps]
+                )
+                for name in MarketValueRecords.COLUMNS
+            }
+        )
+        if self.sort:
+            market_value_records.sort()
+
+        return market_value_records
+
+    def keys(self) -> Iterator[ItemString]:
+        return self._get_index().keys()
+
+    def values(self) -> Iterator[MarketValueRecords]:
+        for item_string, i_maps in self._get_index().items():
+            yield self._get(item_string, i_maps)
+
+    def items(self) -> Iterator[Tuple[ItemString, MarketValueRecords]]:
+        for item_string, i_maps in self._get_index().items():
+            yield item_string, self._get(item_string, i_maps)
+
+
+class DailyMarketValueSums:
+    """sums and counts of market values of every item, bucketed into `n_days`
+    days before `ts_now`. records of any number of maps are added up without
+    keeping them, market values computed from it are the same as from the
+    records `extend`ed into one, see `MarketValueRecords.batch_market_value`
+    (`ts_compressed=0`).
+
+    >>> sums = DailyMarketValueSums(ts_now)
+    >>> for map_records in maps:
+    ...     sums.add(map_records)
+    >>> historicals, weighteds = sums.batch_market_value()
+
+    with `ts_now` at the end of a UTC day, buckets are UTC days, and sums can
+    be kept across updates as a region aggregate, `shift`ed forward as days
+    pass. `ts_updated` is the start ts of the last update added.
+
+    db files have one record per item a day for finished days, so a day added
+    up from increments has to be `clear`ed and `add`ed again from compacted db
+    files once it's finished, or realms updated more often weigh more.
+
+    file layout, integers are little endian:
+        header      `FILE_HEADER`
+        index bounds int64 `[n_items + 1]`, item `i` is `index[b[i]:b[i+1]]`
+        sums        int64 `[n_items, n_days]`
+        counts      int64 `[n_items, n_days]`
+        index       serialized `ItemStringPB` of every item, back to back
+
+    """
+
+    _logger: ClassVar[Logger] = getLogger("DailyMarketValueSums")
+    FILE_MAGIC: ClassVar[bytes] = b"AHRS"
+    FILE_VERSION: ClassVar[int] = 1
+    # magic, version, n_days, n_items, index_size, ts_now, ts_updated
+    FILE_HEADER: ClassVar[struct.Struct] = struct.Struct("<4sHHIIqq")
+
+    def __init__(
+        self,
+        ts_now: int,
+        n_days: int = MarketValueRecords.HISTORICAL_DAYS,
+        ts_updated: int = 0,
+    ):
+        self.ts_now = ts_now
+        self.n_days = n_days
+        self.ts_updated = ts_updated
+        # item_string -> row, in the order of first appearance
+        self._rows: Dict[ItemString, int] = {}
+        # [row, day], day `0` is the oldest
+        self._sums = np.zeros((0, n_days), dtype=np.int64)
+        self._counts = np.zeros((0, n_days), dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, item_string: ItemString) -> bool:
+        return item_string in self._rows
+
+    def __iter__(self) -> Iterator[ItemString]:
+        return iter(self._rows)
+
+    def keys(self) -> Iterator[ItemString]:
+        return self._rows.keys()
+
+    @classmethod
+    def get_day_end_ts(cls, ts: int) -> int:
+        """end of the UTC day `ts` is in, `ts_now` that buckets by UTC day"""
+        return (ts // SECONDS_IN.DAY + 1) * SECONDS_IN.DAY
+
+    def _grow(self, n_rows: int) -> None:
+        capacity = len(self._sums)
+        if n_rows <= capacity:
+            return
+
+        capacity = max(n_rows, capacity * 2)
+        for name in ("_sums", "_counts"):
+            old = getattr(self, name)
+            new = np.zeros((capacity, self.n_days), dtype=np.int64)
+            new[: len(old)] = old
+            setattr(self, name, new)
+
+    def _get_buckets(self, timestamps: np.ndarray) -> np.ndarray:
+        return (self.ts_now - timestamps.astype(np.int64) - 1) // SECONDS_IN.DAY
+
+    def _add(
+        self,
+        item_strings: List[ItemString],
+        lengths: np.ndarray,
+        timestamps: np.ndarray,
+        market_values: np.ndarray,
+        ts_begin: int = 0,
+        ts_end: Optional[int] = None,
+    ) -> None:
+        rows = np.empty(len(item_strings), dtype=np.int64)
+        for i, item_string in enumerate(item_strings):
+            rows[i] = self._rows.setdefault(item_string, len(self._rows))
+
+        self._grow(len(self._rows))
+        if not item_strings:
+            return
+
+        buckets = self._get_buckets(timestamps)
+        in_range = (buckets >= 0) & (buckets < self.n_days) & (timestamps >= ts_begin)
+        if ts_end is not None:
+            in_range &= timestamps < ts_end
+
+        row_of_records = np.repeat(rows, lengths)[in_range]
+        days = self.n_days - 1 - buckets[in_range]
+        np.add.at(
+            self._sums,
+            (row_of_records, days),
+            market_values[in_range].astype(np.int64),
+        )
+        np.add.at(self._counts, (row_of_records, days), 1)
+
+    def add(
+        self,
+        map_records: MapItemStringMarketValueRecords,
+        ts_begin: int = 0,
+        ts_end: Optional[int] = None,
+    ) -> None:
+        """add records of `map_records`, only those in `[ts_begin, ts_end)`
+        if given.
+        """
+        entries = [(k, v) for k, v in map_records.items() if v]
+        self._add(
+            [k for k, _ in entries],
+            np.fromiter(
+                (len(v) for _, v in entries), dtype=np.int64, count=len(entries)
+            ),
+            np.concatenate(
+                [np.empty(0, dtype=np.int32)] + [v.timestamp for _, v in entries]
+            ),
+            np.concatenate(
+                [np.empty(0, dtype=np.int64)] + [v.market_value for _, v in entries]
+            ),
+            ts_begin=ts_begin,
+            ts_end=ts_end,
+        )
+
+    def add_increment(self, increment: MapItemStringMarketValueRecord) -> None:
+        n = len(increment)
+        self._add(
+            list(increment.keys()),
+            np.ones(n, dtype=np.int64),
+            np.fromiter((v.timestamp for v in increment.values()), np.int64, n),
+            np.fromiter((v.market_value for v in increment.values()), np.int64, n),
+        )
+
+    def clear(self, ts_begin: int, ts_end: int) -> None:
+        """empty buckets of days in `[ts_begin, ts_end)`, both at day
+        boundaries.
+        """
+        if ts_begin % SECONDS_IN.DAY or ts_end % SECONDS_IN.DAY:
+            raise ValueError(f"not at day boundaries: {ts_begin}, {ts_end}")
+
+        if ts_begin >= ts_end:
+            return
+
+        bucket_first, bucket_last = self._get_buckets(np.array([ts_end - 1, ts_begin]))
+        days_begin = max(self.n_days - 1 - int(bucket_last), 0)
+        days_end = min(self.n_days - int(bucket_first), self.n_days)
+        if days_begin < days_end:
+            self._sums[:, days_begin:days_end] = 0
+            self._counts[:, days_begin:days_end] = 0
+
+    def shift(self, ts_now: int) -> None:
+        """move buckets to end at `ts_now`, a whole number of days away from
+        current `ts_now`. days falling out are dropped, so are items left
+        without any record.
+        """
+        n_shift, remainder = divmod(ts_now - self.ts_now, SECONDS_IN.DAY)
+        if remainder:
+            raise ValueError(
+                f"can't shift by less than a day: {self.ts_now} -> {ts_now}"
+            )
+
+        if n_shift == 0:
+            return
+
+        n_rows = len(self._rows)
+        sums = np.zeros((n_rows, self.n_days), dtype=np.int64)
+        counts = np.zeros((n_rows, self.n_days), dtype=np.int64)
+        if 0 < n_shift < self.n_days:
+            sums[:, :-n_shift] = self._sums[:n_rows, n_shift:]
+            counts[:, :-n_shift] = self._counts[:n_rows, n_shift:]
+        elif 0 < -n_shift < self.n_days:
+            sums[:, -n_shift:] = self._sums[:n_rows, :n_shift]
+            counts[:, -n_shift:] = self._counts[:n_rows, :n_shift]
+
+        is_kept = counts.any(axis=1)
+        self._rows = {
+            item_string: row
+            for row, item_string in enumerate(
+                item_string
+                for item_string, is_kept_ in zip(self._rows, is_kept)
+                if is_kept_
+            )
+        }
+        self._sums = sums[is_kept]
+        self._counts = counts[is_kept]
+        self.ts_now = ts_now
+
+    def batch_market_value(
+        self, historical: bool = True, weighted: bool = True
+    ) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """historical and weighted market values aligned with `keys()`"""
+        n_days = MarketValueRecords.get_market_value_days(historical)
+        if n_days > self.n_days:
+            raise ValueError(f"need {n_days} days of sums, only have {self.n_days}")
+
+        n_rows = len(self._rows)
+        sums = self._sums[:n_rows, self.n_days - n_days :]
+        counts = self._counts[:n_rows, self.n_days - n_days :]
+        groups, days = np.nonzero(counts)
+        # see `MarketValueRecords.batch_average_by_day`
+        averages = np.zeros(len(groups), dtype=np.int64)
+        averages[:] = np.floor(sums[groups, days] / counts[groups, days] + 0.5)
+        return MarketValueRecords.market_value_from_days(
+            n_rows,
+            groups,
+            days,
+            averages,
+            n_days,
+            historical=historical,
+            weighted=weighted,
+        )
+
+    def to_bytes(self) -> bytes:
+        n_rows = len(self._rows)
+        index_entries = [k.to_protobuf().SerializeToString() for k in self._rows]
+        index_bounds = np.zeros(n_rows + 1, dtype="<i8")
+        np.cumsum([len(b) for b in index_entries], out=index_bounds[1:])
+        parts = [
+            self.FILE_HEADER.pack(
+                self.FILE_MAGIC,
+                self.FILE_VERSION,
+                self.n_days,
+                n_rows,
+                int(index_bounds[-1]),
+                self.ts_now,
+                self.ts_updated,
+            ),
+            index_bounds.tobytes(),
+            self._sums[:n_rows].astype("<i8").tobytes(),
+            self._counts[:n_rows].astype("<i8").tobytes(),
+        ]
+        parts.extend(index_entries)
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "DailyMarketValueSums":
+        if len(data) < cls.FILE_HEADER.size:
+            raise DBFormatError("truncated header")
+
+        magic, version, n_days, n_rows, index_size, ts_now, ts_updated = (
+            cls.FILE_HEADER.unpack_from(data)
+        )
+        if magic != cls.FILE_MAGIC:
+            raise DBFormatError(f"bad magic {magic!r}")
+
+        if version != cls.FILE_VERSION:
+            raise DBFormatError(f"unsupported version {version!r}")
+
+        size = cls.FILE_HEADER.size + 8 * (n_rows + 1 + 2 * n_rows * n_days)
+        if len(data) != size + index_size:
+            raise DBFormatError(f"size mismatch, expecting {size + index_size}")
+
+        obj = cls(ts_now, n_days=n_days, ts_updated=ts_updated)
+        pos = cls.FILE_HEADER.size
+
+        def read(count: int) -> np.ndarray:
+            nonlocal pos
+            array_ = np.frombuffer(data, dtype="<i8", count=count, offset=pos)
+            pos += array_.nbytes
+            return array_.astype(np.int64)
+
+        index_bounds = read(n_rows + 1).tolist()
+        obj._sums = read(n_rows * n_days).reshape(n_rows, n_days)
+        obj._counts = read(n_rows * n_days).reshape(n_rows, n_days)
+        index = memoryview(data)[pos:]
+        for row in range(n_rows):
+            pb_item_string = ItemStringPB.FromString(
+                index[index_bounds[row] : index_bounds[row + 1]]
+            )
+            obj._rows[ItemString.from_protobuf(pb_item_string)] = row
+
+        return obj
+
+    @classmethod
+    def from_file(
+        cls, file: BinaryFile, forker: GithubFileForker = None
+    ) -> Optional["DailyMarketValueSums"]:
+        """`None` if `file` doesn't exist"""
+        if forker:
+            forker.ensure_file(file)
+
+        if not file.exists():
+            cls._logger.info(f"{file!r} not found.")
+            return None
+
+        with file.open("rb") as f:
+            obj = cls.from_bytes(f.read())
+            cls._logger.info(f"{file} loaded.")
+            return obj
+
+    def to_file(self, file: BinaryFile) -> None:
+        data = self.to_bytes()
+        with file.open("wb") as f:
+            f.write(data)
 
 
 class Meta:
@@ -1316,6 +2575,9 @@ class Meta:
                     "start_ts": 0,
                     "end_ts": 0,
                     "duration": 0,
+                    # snapshots not modified since last update, `null` crid for
+                    # commodities, `null` faction for retail
+                    "unchanged": [[$connected_realm_id, $faction], ...],
                 },
                 "connected_realms": {
                     $connected_realm_id: [
@@ -1376,6 +2638,21 @@ class Meta:
         self._data["update"]["end_ts"] = end_ts
         self._data["update"]["duration"] = end_ts - start_ts
 
+    def set_update_unchanged(
+        self, unchanged: Iterable[Tuple[Optional[int], Optional[FactionEnum]]]
+    ) -> None:
+        self._data["update"]["unchanged"] = [
+            [crid, faction] for crid, faction in unchanged
+        ]
+
+    def get_update_unchanged(
+        self,
+    ) -> List[Tuple[Optional[int], Optional[FactionEnum]]]:
+        return [
+            (crid, faction and FactionEnum(faction))
+            for crid, faction in self._data["update"].get("unchanged", [])
+        ]
+
     def set_system(self, system: Dict) -> None:
         self._data["system"] = system
 
@@ -1445,8 +2722,20 @@ class Meta:
         self._logger.info(f"{file} saved.")
 
     @classmethod
-    def from_api(cls, bn_api: BNAPI, namespace: Namespace) -> "Meta":
-        """get latest connected realm info for this region"""
+    def from_api(
+        cls,
+        bn_api: BNAPI,
+        namespace: Namespace,
+        workers: int = 1,
+        fetch_async: bool = False,
+    ) -> "Meta":
+        """get latest connected realm info for this region
+
+        with more than one `workers`, connected realms are requested `workers` at
+        a time, from a thread pool, or over `BNAPI`'s asyncio client with
+        `fetch_async`. they're added in the order of the index regardless.
+
+        """
         meta = cls()
         crids = []
         try:
@@ -1459,21 +2748,67 @@ class Meta:
             crid = match.group(1)
             crids.append(int(crid))
 
-        for crid in crids:
-            try:
-                connected_realm = ConnectedRealm.from_api(bn_api, namespace, crid)
-            except HTTPError as e:
-                """
-                NOTE: some of the connected realms fails with a 404 status code.
-
-                """
-                cls._logger.warning(
-                    "Failed to request connected realm data for: "
-                    f"{namespace!r} {crid}. "
-                    f"Error message: {e!s}"
-                )
-                cls._logger.debug("traceback:", exc_info=True)
-            else:
+        get_connected_realm = partial(cls._get_connected_realm, bn_api, namespace)
+        if fetch_async:
+            connected_realms = asyncio.run(
+                cls._async_get_connected_realms(bn_api, namespace, crids, workers)
+            )
+        elif workers > 1:
+            with ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="meta"
+            ) as executor:
+                connected_realms = list(executor.map(get_connected_realm, crids))
+        else:
+            connected_realms = map(get_connected_realm, crids)
+
+        for crid, connected_realm in zip(crids, connected_realms):
+            if connected_realm is not None:
                 meta.add_connected_realm(crid, connected_realm)
 
         return meta
+
+    @classmethod
+    def _log_connected_realm_error(
+        cls, namespace: Namespace, crid: int, e: HTTPError
+    ) -> None:
+        """
+        NOTE: some of the connected realms fails with a 404 status code.
+
+        """
+        cls._logger.warning(
+            "Failed to request connected realm data for: "
+            f"{namespace!r} {crid}. "
+            f"Error message: {e!s}"
+        )
+        cls._logger.debug("traceback:", exc_info=True)
+
+    @classmethod
+    def _get_connected_realm(
+        cls, bn_api: BNAPI, namespace: Namespace, crid: int
+    ) -> Optional[ConnectedRealm]:
+        try:
+            return ConnectedRealm.from_api(bn_api, namespace, crid)
+        except HTTPError as e:
+            cls._log_connected_realm_error(namespace, crid, e)
+            return None
+
+    @classmethod
+    async def _async_get_connected_realms(
+        cls, bn_api: BNAPI, namespace: Namespace, crids: List[int], workers: int
+    ) -> List[Optional[ConnectedRealm]]:
+        semaphore = asyncio.Semaphore(workers)
+
+        async def get_connected_realm(crid: int) -> Optional[ConnectedRealm]:
+            async with semaphore:
+                try:
+                    return await ConnectedRealm.async_from_api(
+                        bn_api, namespace, crid
+                    )
+                except HTTPError as e:
+                    cls._log_connected_realm_error(namespace, crid, e)
+                    return None
+
+        try:
+            return await asyncio.gather(*map(get_connected_realm, crids))
+        finally:
+            await bn_api.async_close()
@@ -1,4 +1,5 @@
 import os
+import mmap
 from gzip import GzipFile
 import pathlib
 
@@ -40,18 +41,132 @@ class TextFile(BaseFile):
         return open(self.file_path, mode, **kwargs)
 
 
+class Codec:
+    """compression used by `BinaryFile`, `open` returns a file object that
+    (de)compresses transparently.
+
+    appending (`"ab"`) starts a new frame / member, reading decodes all of
+    them as one stream.
+    """
+
+    def open(self, file_path: str, mode: str = "rb"):
+        raise NotImplementedError
+
+
+class GzipCodec(Codec):
+    def __init__(self, level: int = 9) -> None:
+        self.level = level
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(level={self.level!r})"
+
+    def open(self, file_path: str, mode: str = "rb"):
+        return GzipFile(file_path, mode, compresslevel=self.level)
+
+
+class ZstdCodec(Codec):
+    """zstd, needs the `zstandard` package, imported on first use.
+
+    `threads`: number of compression threads, 0 for single threaded,
+    -1 for one per cpu core.
+    `dict_data`: raw content of a dictionary trained with
+    `zstandard.train_dictionary`, files written with it can only be read
+    with the same dictionary.
+    """
+
+    def __init__(
+        self, level: int = 3, threads: int = 0, dict_data: bytes = None
+    ) -> None:
+        self.level = level
+        self.threads = threads
+        self.dict_data = dict_data
+        self._dict = None
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(level={self.level!r}, "
+            f"threads={self.threads!r}, dict={self.dict_data is not None!r})"
+        )
+
+    @classmethod
+    def from_dict_file(
+        cls, dict_path: str, level: int = 3, threads: int = 0
+    ) -> "ZstdCodec":
+        with open(dict_path, "rb") as f:
+            return cls(level=level, threads=threads, dict_data=f.read())
+
+    def _get_dict(self):
+        if self.dict_data and self._dict is None:
+            import zstandard
+
+            self._dict = zstandard.ZstdCompressionDict(self.dict_data)
+
+        return self._dict
+
+    def compressor(self):
+        import zstandard
+
+        return zstandard.ZstdCompressor(
+            level=self.level, threads=self.threads, dict_data=self._get_dict()
+        )
+
+    def decompressor(self):
+        import zstandard
+
+        return zstandard.ZstdDecompressor(dict_data=self._get_dict())
+
+    def open(self, file_path: str, mode: str = "rb"):
+        fh = open(file_path, mode)
+        try:
+            if "r" in mode:
+                return self.decompressor().stream_reader(
+                    fh, read_across_frames=True, closefd=True
+                )
+
+            return self.compressor().stream_writer(fh, closefd=True)
+
+        except BaseException:
+            fh.close()
+            raise
+
+
 class BinaryFile(BaseFile):
-    def __init__(self, file_path: str, use_compression=False) -> None:
+    def __init__(
+        self, file_path: str, use_compression=False, codec: Codec = None
+    ) -> None:
+        """`codec` defaults to `GzipCodec` if `use_compression`, setting
+        `use_compression` to `False` reads / writes the file as is.
+        """
         super().__init__(file_path)
-        self.use_compression = use_compression
+        if codec is None and use_compression:
+            codec = GzipCodec()
 
-    # def _get_path(self, name, use_compression: bool = False):
-    #     file_name = f"{name}.bin.gz" if use_compression else f"{name}.bin"
-    #     return os.path.join(self.base_path, file_name)
+        self.codec = codec
+        self.use_compression = codec is not None
 
     def open(self, mode="rb"):
         if self.use_compression:
-            return GzipFile(self.file_path, mode)
+            return self.codec.open(self.file_path, mode)
 
         else:
             return open(self.file_path, mode)
+
+
+class MappedFile(BinaryFile):
+    """uncompressed binary file, read through `mmap` so that content can be
+    viewed without copying.
+    """
+
+    def __init__(self, file_path: str) -> None:
+        super().__init__(file_path, use_compression=False)
+
+    def open_mmap(self):
+        """map the whole file read-only, returns `b""` for an empty file since
+        those can't be mapped.
+        """
+        with open(self.file_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+
+            # mapping stays valid after the file is closed
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
@@ -0,0 +1,104 @@
+"""thread-safe rate limiting for outgoing api requests."""
+
+import time
+import asyncio
+import threading
+from logging import getLogger
+from typing import ClassVar
+
+__all__ = ("TokenBucket",)
+
+
+class TokenBucket:
+    """token bucket rate limiter, shared by every thread issuing requests.
+
+    tokens refill continuously at `rate` per second, up to `capacity`, each
+    request takes one token, blocks when the bucket is empty.
+
+    >>> bucket = TokenBucket(100, capacity=100)
+    >>> bucket.acquire()  # returns seconds spent waiting
+    >>> await bucket.acquire_async()  # same, from a coroutine
+
+    """
+
+    _logger: ClassVar = getLogger("TokenBucket")
+
+    def __init__(self, rate: float, capacity: float = None) -> None:
+        if rate <= 0:
+            raise ValueError(f"rate must be positive, not {rate!r}")
+
+        self.rate = rate
+        self.capacity = rate if capacity is None else capacity
+        if self.capacity < 1:
+            raise ValueError(f"capacity must be at least 1, not {self.capacity!r}")
+
+        self._tokens = self.capacity
+        self._ts_last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        ts_now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (ts_now - self._ts_last) * self.rate
+        )
+        self._ts_last = ts_now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """take `tokens` if available, never blocks"""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+
+            return False
+
+    def _take_or_wait(self, tokens: float, waited: float) -> float:
+        """take `tokens` and return 0 if available, otherwise return seconds to
+        wait before trying again.
+
+        """
+        if tokens > self.capacity:
+            raise ValueError(
+                f"can't acquire {tokens!r} tokens from a bucket of {self.capacity!r}"
+            )
+
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                if waited:
+                    self._logger.debug(f"throttled for {waited:.3f}s")
+
+                return 0.0
+
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1) -> float:
+        """take `tokens`, block until they're available.
+        returns seconds spent waiting.
+
+        """
+        waited = 0.0
+        while True:
+            wait = self._take_or_wait(tokens, waited)
+            if not wait:
+                return waited
+
+            # sleep outside the lock, so other threads can refill / check
+            time.sleep(wait)
+            waited += wait
+
+    async def acquire_async(self, tokens: float = 1) -> float:
+        """`acquire` without blocking the event loop, the bucket can be shared
+        by threads and coroutines.
+
+        """
+        waited = 0.0
+        while True:
+            wait = self._take_or_wait(tokens, waited)
+            if not wait:
+                return waited
+
+            await asyncio.sleep(wait)
+            waited += wait
@@ -1,30 +1,201 @@
-from typing import List, Set, Optional
+from typing import Dict, Iterable, List, Set, Optional, Tuple, Union
 import argparse
 import logging
 import sys
 import os
+from itertools import chain
 
 import numpy as np
 
 from ah.models import (
     MapItemStringMarketValueRecords,
+    MapItemStringMarketValueRecordsView,
+    DailyMarketValueSums,
     RegionEnum,
     Namespace,
     NameSpaceCategoriesEnum,
     GameVersionEnum,
     DBTypeEnum,
+    DBExtEnum,
     FactionEnum,
     Meta,
     MarketValueRecords,
     RealmCategoryEnum,
 )
-from ah.storage import TextFile
+from ah.storage import TextFile, ZstdCodec
 from ah.db import DBHelper, GithubFileForker
 from ah.api import GHAPI
 from ah.cache import Cache
+from ah.errors import DBFormatError
 from ah import config
 
 
+NUMERALS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+class ExportFields:
+    """values of every field of every item in a record set, computed in one
+    pass for all data types exported from it and encoded once.
+
+    >>> export_fields = ExportFields(map_records, ts_update_begin, ts_update_end)
+    >>> export_fields.compute(["itemString", "minBuyout", "historical"])
+    >>> export_fields.get_data(["itemString", "historical"])
+    '{1,"A"},{"i:2::i1",3}'
+
+    `map_records` can also be a `DailyMarketValueSums` bucketed before
+    `ts_update_end`, for historical and weighted fields with `ts_compressed`
+    reset, or a `MapItemStringMarketValueRecordsView`.
+
+    """
+
+    NUMERIC_SET = set("0123456789")
+    # field -> `MarketValueRecords` column of the latest record
+    RECENT_FIELDS = {
+        "minBuyout": "min_buyout",
+        "numAuctions": "num_auctions",
+        "marketValueRecent": "market_value",
+    }
+    HISTORICAL_FIELDS = {"historical", "regionHistorical"}
+    WEIGHTED_FIELDS = {"marketValue", "regionMarketValue"}
+    ITEM_STRING_FIELD = "itemString"
+
+    def __init__(
+        self,
+        map_records: Union[
+            MapItemStringMarketValueRecords,
+            MapItemStringMarketValueRecordsView,
+            DailyMarketValueSums,
+        ],
+        ts_update_begin: int,
+        ts_update_end: int,
+        should_reset_tsc: bool = False,
+    ) -> None:
+        self.map_records = map_records
+        self.ts_update_begin = ts_update_begin
+        self.ts_update_end = ts_update_end
+        if should_reset_tsc:
+            self.ts_compressed = 0
+        else:
+            self.ts_compressed = MarketValueRecords.get_compress_end_ts(
+                ts_update_begin
+            )
+
+        # field -> value of every item
+        self._values: Dict[str, np.ndarray] = {}
+        # field -> encoded value of every item
+        self._encoded: Dict[str, List[str]] = {}
+        # fields -> data of a LoadData row
+        self._data: Dict[Tuple[str, ...], str] = {}
+
+    def compute(self, fields: Iterable[str]) -> None:
+        """compute all `fields` not yet computed in one go"""
+        fields = set(fields) - self._values.keys() - {self.ITEM_STRING_FIELD}
+        unknown = fields - self.RECENT_FIELDS.keys()
+        unknown -= self.HISTORICAL_FIELDS | self.WEIGHTED_FIELDS
+        if unknown:
+            raise ValueError(f"unsupported field {unknown.pop()}.")
+
+        if not fields:
+            return
+
+        is_sums = isinstance(self.map_records, DailyMarketValueSums)
+        recent_fields = [f for f in fields if f in self.RECENT_FIELDS]
+        if is_sums and recent_fields:
+            raise ValueError(f"unsupported field {recent_fields[0]} of sums.")
+
+        if not is_sums:
+            records_list = list(self.map_records.values())
+
+        if recent_fields:
+            # latest record of every item, `0` if it's not from last update
+            # see `MarketValueRecords.get_recent_*`
+            def last(column: str) -> np.ndarray:
+                return np.concatenate(
+                    [np.empty(0, dtype=np.int64)]
+                    + [getattr(records, column)[-1:] for records in records_list]
+                )
+
+            has_records = np.fromiter(
+                map(len, records_list), dtype=np.int64, count=len(records_list)
+            ).astype(bool)
+            is_recent = np.zeros(len(records_list), dtype=bool)
+            is_recent[has_records] = last("timestamp") >= self.ts_update_begin
+            for field in recent_fields:
+                values = np.zeros(len(records_list), dtype=np.int64)
+                values[has_records] = last(self.RECENT_FIELDS[field])
+                self._values[field] = np.where(is_recent, values, 0)
+
+        # historical and weighted market values of all items are computed in
+        # one go, see `MarketValueRecords.batch_market_value`
+        is_historical = bool(fields & self.HISTORICAL_FIELDS)
+        is_weighted = bool(fields & self.WEIGHTED_FIELDS)
+        if is_sums and (is_historical or is_weighted):
+            historicals, weighteds = self.map_records.batch_market_value(
+                historical=is_historical, weighted=is_weighted
+            )
+        elif is_historical or is_weighted:
+            historicals, weighteds = MarketValueRecords.batch_market_value(
+                records_list,
+                self.ts_update_end,
+                ts_compressed=self.ts_compressed,
+                historical=is_historical,
+                weighted=is_weighted,
+            )
+
+        if is_historical or is_weighted:
+            for field in fields & self.HISTORICAL_FIELDS:
+                self._values[field] = historicals
+
+            for field in fields & self.WEIGHTED_FIELDS:
+                self._values[field] = weighteds
+
+    def get_encoded(self, field: str) -> List[str]:
+        if field not in self._encoded:
+            if field == self.ITEM_STRING_FIELD:
+                # tsm can handle:
+                # 1. numeral itemstring being string
+                # 2. 10-based numbers
+                encoded = []
+                for item_string in self.map_records.keys():
+                    value = item_string.to_str()
+                    if not set(value) < self.NUMERIC_SET:
+                        value = '"' + value + '"'
+
+                    encoded.append(value)
+
+            else:
+                self.compute([field])
+                encoded = TSMExporter.baseN_array(self._values[field], 32)
+
+            self._encoded[field] = encoded
+
+        return self._encoded[field]
+
+    def get_data(self, fields: List[str]) -> str:
+        """items of a LoadData row, items with all numbers being 0 are skipped"""
+        key = tuple(fields)
+        if key not in self._data:
+            self.compute(fields)
+            n_items = len(self.map_records)
+            is_item_exported = np.zeros(n_items, dtype=bool)
+            for field in fields:
+                if field != self.ITEM_STRING_FIELD:
+                    is_item_exported |= self._values[field] != 0
+
+            # XXX: items are skipped very often for 15-day and last scan data
+            # types, because records outside the time range are still there,
+            # therefore the item entry (item string) too.
+            columns = [self.get_encoded(field) for field in fields]
+            items_data = [
+                "{" + ",".join(item_data) + "}"
+                for item_data, is_exported in zip(zip(*columns), is_item_exported)
+                if is_exported
+            ]
+            self._data[key] = ",".join(items_data)
+
+        return self._data[key]
+
+
 class TSMExporter:
     REALM_AUCTIONS_EXPORT = {
         "type": "AUCTIONDB_REALM_DATA",
@@ -100,7 +271,9 @@ class TSMExporter:
         "{{version={version},lastSync={last_sync},"
         'message={{id=0,msg=""}},news={{}}}}]])'
     )
-    NUMERIC_SET = set("0123456789")
+    NUMERIC_SET = ExportFields.NUMERIC_SET
+    HISTORICAL_FIELDS = ExportFields.HISTORICAL_FIELDS
+    WEIGHTED_FIELDS = ExportFields.WEIGHTED_FIELDS
     TSM_VERSION = 41200
     MOCK_WARCRAFT_BASE = "fake_warcraft_base"
     TSM_HC_LABEL = "HC"
@@ -165,10 +338,42 @@ class TSMExporter:
         return True
 
     @classmethod
-    def baseN(cls, num, b, numerals="0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"):
-        return ((num == 0) and numerals[0]) or (
-            cls.baseN(num // b, b, numerals).lstrip(numerals[0]) + numerals[num % b]
-        )
+    def baseN(cls, num, b, numerals=NUMERALS):
+        if num < 0:
+            raise ValueError(f"negative number {num!r}")
+
+        digits = []
+        while True:
+            num, digit = divmod(num, b)
+            digits.append(numerals[digit])
+            if not num:
+                break
+
+        return "".join(reversed(digits))
+
+    @classmethod
+    def baseN_array(cls, nums: np.ndarray, b, numerals=NUMERALS) -> List[str]:
+        """vectorized `baseN`"""
+        nums = np.asarray(nums, dtype=np.int64)
+        if not len(nums):
+            return []
+
+        if nums.min() < 0:
+            raise ValueError(f"negative number {nums.min()!r}")
+
+        n_digits = 1
+        max_num = int(nums.max())
+        while max_num >= b:
+            max_num //= b
+            n_digits += 1
+
+        digits = np.empty((len(nums), n_digits), dtype=np.int64)
+        for i in range(n_digits - 1, -1, -1):
+            nums, digits[:, i] = np.divmod(nums, b)
+
+        chars = np.array(list(numerals[:b]), dtype="U1")[digits]
+        strs = chars.view(f"U{n_digits}").ravel().tolist()
+        return [s.lstrip(numerals[0]) or numerals[0] for s in strs]
 
     @classmethod
     def export_append_data(
@@ -181,75 +386,19 @@ class TSMExporter:
         ts_update_begin: int,
         ts_update_end: int,
         should_reset_tsc: bool = False,
+        export_fields: "ExportFields" = None,
     ) -> None:
+        """`export_fields`: field values of `map_records` computed beforehand,
+        shared by every data type exported from the same records.
+        """
         cls._logger.info(f"Exporting {type_} for {region_or_realm}...")
-        if should_reset_tsc:
-            ts_compressed = 0
-        else:
-            ts_compressed = MarketValueRecords.get_compress_end_ts(ts_update_begin)
-        items_data = []
-        for item_string, records in map_records.items():
-            # tsm can handle:
-            # 1. numeral itemstring being string
-            # 2. 10-based numbers
-            item_data = []
-            # skip item if all numbers are 0 or None
-            is_skip_item = True
-            for field in fields:
-                if field == "minBuyout":
-                    value = records.get_recent_min_buyout(ts_update_begin)
-                    if value:
-                        is_skip_item = False
-                elif field == "numAuctions":
-                    value = records.get_recent_num_auctions(ts_update_begin)
-                    if value:
-                        is_skip_item = False
-                elif field == "marketValueRecent":
-                    value = records.get_recent_market_value(ts_update_begin)
-                    if value:
-                        is_skip_item = False
-                elif field in ["historical", "regionHistorical"]:
-                    value = records.get_historical_market_value(
-                        ts_update_end, ts_compressed=ts_compressed
-                    )
-                    if value:
-                        is_skip_item = False
-                elif field in ["marketValue", "regionMarketValue"]:
-                    value = records.get_weighted_market_value(
-                        ts_update_end, ts_compressed=ts_compressed
-                    )
-                    if value:
-                        is_skip_item = False
-                elif field == "itemString":
-                    value = item_string.to_str()
-                    if not set(value) < cls.NUMERIC_SET:
-                        value = '"' + value + '"'
-                else:
-                    raise ValueError(f"unsupported field {field}.")
-
-                if isinstance(value, (int, np.int32, np.int64)):
-                    value = cls.baseN(value, 32)
-                elif isinstance(value, float):
-                    value = str(value)
-                elif isinstance(value, str):
-                    pass
-                else:
-                    raise ValueError(f"unsupported type {type(value)}")
-
-                item_data.append(value)
-
-            if is_skip_item:
-                # XXX: this occurs very often for 15-day and last scan data types,
-                # because records outside the time range are still there, therefore
-                # the item entry (item string) too.
-                # cls._logger.debug(
-                #     f"During {type_}, {item_string} skipped, "
-                #     f"due to all fields are empty."
-                # )
-                continue
-
-            item_text = "{" + ",".join(item_data) + "}"
-            items_data.append(item_text)
+        if export_fields is None:
+            export_fields = ExportFields(
+                map_records,
+                ts_update_begin,
+                ts_update_end,
+                should_reset_tsc=should_reset_tsc,
+            )
 
         fields_str = ",".join('"' + field + '"' for field in fields)
         text_out = cls.TEMPLATE_ROW.format(
@@ -257,11 +406,32 @@ class TSMExporter:
             region_or_realm=region_or_realm,
             ts=ts_update_begin,
             fields=fields_str,
-            data=",".join(items_data),
+            data=export_fields.get_data(fields),
         )
         with file.open("a", encoding="utf-8") as f:
             f.write(text_out + "\n")
 
+    @classmethod
+    def plan_export_fields(
+        cls,
+        map_records: MapItemStringMarketValueRecords,
+        exports: List[Dict],
+        ts_update_begin: int,
+        ts_update_end: int,
+        should_reset_tsc: bool = False,
+    ) -> ExportFields:
+        """compute fields needed by all `exports` of `map_records` in one pass"""
+        export_fields = ExportFields(
+            map_records,
+            ts_update_begin,
+            ts_update_end,
+            should_reset_tsc=should_reset_tsc,
+        )
+        export_fields.compute(
+            chain.from_iterable(export["fields"] for export in exports)
+        )
+        return export_fields
+
     def export_region(
         self,
         namespace: Namespace,
@@ -285,10 +455,24 @@ class TSMExporter:
         for cate in RealmCategoryEnum:
             cate_should_export[cate] = False
 
-        # auctions + commodities (if applicable) for all realms under this category
+        # auctions + commodities (if applicable) for all realms under this category,
+        # kept by the updater if it's up to date, otherwise summed up by day as we
+        # go instead of keeping records of every realm
         cate_data = dict()
+        cate_is_precomputed = dict()
+        categories = {category for _, _, category in meta.iter_connected_realms()}
+        if namespace.game_version == GameVersionEnum.RETAIL:
+            categories.add(RealmCategoryEnum.DEFAULT)
+
         for cate in RealmCategoryEnum:
-            cate_data[cate] = MapItemStringMarketValueRecords()
+            sums = None
+            if cate in categories:
+                sums = self.load_region_sums(
+                    namespace, cate, ts_update_start, ts_update_end
+                )
+
+            cate_is_precomputed[cate] = sums is not None
+            cate_data[cate] = sums or DailyMarketValueSums(ts_update_end)
 
         if namespace.game_version == GameVersionEnum.RETAIL:
             commodity_file = self.db_helper.get_file(namespace, DBTypeEnum.COMMODITIES)
@@ -302,7 +486,9 @@ class TSMExporter:
             commodity_data = None
 
         if commodity_data:
-            cate_data[RealmCategoryEnum.DEFAULT].extend(commodity_data)
+            if not cate_is_precomputed[RealmCategoryEnum.DEFAULT]:
+                cate_data[RealmCategoryEnum.DEFAULT].add(commodity_data)
+
             self.export_append_data(
                 self.export_file,
                 commodity_data,
@@ -339,19 +525,46 @@ class TSMExporter:
                     self._logger.warning(f"no data in {db_file}.")
                     continue
 
-                cate_data[category].extend(auction_data)
+                if not cate_is_precomputed[category]:
+                    cate_data[category].add(auction_data)
 
                 if not sub_export_realms:
                     continue
                 else:
                     cate_should_export[category] = True
 
+                # every realm under this connected realm exports the same data,
+                # compute fields of all data types once, see `ExportFields`
                 if commodity_data:
-                    realm_auctions_commodities_data = MapItemStringMarketValueRecords()
-                    realm_auctions_commodities_data.extend(commodity_data)
-                    realm_auctions_commodities_data.extend(auction_data)
+                    realm_auctions_commodities_data = (
+                        MapItemStringMarketValueRecordsView(
+                            commodity_data, auction_data
+                        )
+                    )
+                    auction_fields = self.plan_export_fields(
+                        auction_data,
+                        [self.REALM_AUCTIONS_EXPORT],
+                        ts_update_start,
+                        ts_update_end,
+                    )
+                    realm_auctions_commodities_fields = self.plan_export_fields(
+                        realm_auctions_commodities_data,
+                        self.REALM_AUCTIONS_COMMODITIES_EXPORTS,
+                        ts_update_start,
+                        ts_update_end,
+                    )
                 else:
                     realm_auctions_commodities_data = auction_data
+                    auction_fields = self.plan_export_fields(
+                        auction_data,
+                        [
+                            self.REALM_AUCTIONS_EXPORT,
+                            *self.REALM_AUCTIONS_COMMODITIES_EXPORTS,
+                        ],
+                        ts_update_start,
+                        ts_update_end,
+                    )
+                    realm_auctions_commodities_fields = auction_fields
 
                 for realm in sub_export_realms:
                     if faction is None:
@@ -367,6 +580,7 @@ class TSMExporter:
                         tsm_realm,
                         ts_update_start,
                         ts_update_end,
+                        export_fields=auction_fields,
                     )
                     for export_realm in self.REALM_AUCTIONS_COMMODITIES_EXPORTS:
                         self.export_append_data(
@@ -377,10 +591,11 @@ class TSMExporter:
                             tsm_realm,
                             ts_update_start,
                             ts_update_end,
+                            export_fields=realm_auctions_commodities_fields,
                         )
 
         for cate, data in cate_data.items():
-            if not data:
+            if not len(data):
                 continue
 
             if not cate_should_export[cate]:
@@ -400,12 +615,15 @@ class TSMExporter:
                 # retail = None
                 tsm_region = region
 
-            # need to sort because it's records are from multiple realms
-            # note that we skipped `realm_auctions_commodities_data`, due to
-            # no overlapping item strings between auctions and commodities
-            data.sort()
+            # reset `ts_compressed` because the result
+            region_fields = self.plan_export_fields(
+                data,
+                self.REGION_AUCTIONS_COMMODITIES_EXPORTS,
+                ts_update_start,
+                ts_update_end,
+                should_reset_tsc=True,
+            )
             for region_export in self.REGION_AUCTIONS_COMMODITIES_EXPORTS:
-                # reset `ts_compressed` because the result
                 self.export_append_data(
                     self.export_file,
                     data,
@@ -415,10 +633,43 @@ class TSMExporter:
                     ts_update_start,
                     ts_update_end,
                     should_reset_tsc=True,
+                    export_fields=region_fields,
                 )
 
         self.export_append_app_info(self.export_file, self.TSM_VERSION, ts_update_end)
 
+    def load_region_sums(
+        self,
+        namespace: Namespace,
+        category: RealmCategoryEnum,
+        ts_update_start: int,
+        ts_update_end: int,
+    ) -> Optional[DailyMarketValueSums]:
+        """region aggregate kept by the updater, `None` if it's missing or not
+        from the update being exported.
+        """
+        file = self.db_helper.get_file(namespace, DBTypeEnum.REGION, category=category)
+        if self.forker:
+            file.remove()
+        try:
+            sums = DailyMarketValueSums.from_file(file, forker=self.forker)
+        except DBFormatError as e:
+            self._logger.warning(
+                f"Failed to read region aggregate {file!r}. Error message: {e!s}"
+            )
+            self._logger.debug("traceback:", exc_info=True)
+            return None
+
+        if sums is None or sums.ts_updated != ts_update_start:
+            self._logger.info(
+                f"Region aggregate {file!r} unavailable, using realm db files."
+            )
+            return None
+
+        # buckets are UTC days, see `Updater.load_region_sums`
+        sums.shift(DailyMarketValueSums.get_day_end_ts(ts_update_end))
+        return sums
+
     @classmethod
     def export_append_app_info(cls, file: TextFile, version: int, ts_last_sync: int):
         with file.open("a", encoding="utf-8") as f:
@@ -437,6 +688,8 @@ def main(
     warcraft_base: str = None,
     export_region: RegionEnum = None,
     export_realms: Set[str] = None,
+    db_ext: DBExtEnum = None,
+    zstd_dict: str = config.DEFAULT_DB_ZSTD_DICT,
     # below are for testability
     cache: Cache = None,
     gh_api: GHAPI = None,
@@ -449,7 +702,12 @@ def main(
     else:
         forker = None
 
-    db_helper = DBHelper(db_path)
+    if zstd_dict:
+        zstd_codec = ZstdCodec.from_dict_file(zstd_dict)
+    else:
+        zstd_codec = None
+
+    db_helper = DBHelper(db_path, db_ext=db_ext, zstd_codec=zstd_codec)
     export_path = TSMExporter.get_tsm_appdata_path(warcraft_base, game_version)
     namespace = Namespace(
         category=NameSpaceCategoriesEnum.DYNAMIC,
@@ -507,6 +765,20 @@ def parse_args(raw_args):
         "should be something like 'C:\\path_to\\World of Warcraft'. "
         f"Auto detect: {default_warcraft_base!r}",
     )
+    parser.add_argument(
+        "--db_ext",
+        choices={e.value for e in DBExtEnum if e != DBExtEnum.JSON},
+        default=None,
+        help="Format of auctions and commodities db files, 'mmap' files are "
+        "uncompressed and read without decoding. "
+        "default: 'gz' if compression is enabled, otherwise 'bin'",
+    )
+    parser.add_argument(
+        "--zstd_dict",
+        type=str,
+        default=config.DEFAULT_DB_ZSTD_DICT,
+        help="Path to the zstd dictionary 'zst' db files were written with.",
+    )
     parser.add_argument(
         "export_region",
         choices={e.value for e in RegionEnum},
@@ -539,6 +811,8 @@ def parse_args(raw_args):
     args.game_version = GameVersionEnum[args.game_version.upper()]
     args.export_region = RegionEnum(args.export_region)
     args.export_realms = set(args.export_realms)
+    if args.db_ext:
+        args.db_ext = DBExtEnum(args.db_ext)
 
     return args
 
@@ -709,6 +709,12 @@ class Window(QMainWindow, Ui_MainWindow):
 
         remove_path(path)
 
+    def remove_cache(self) -> None:
+        cache = self.get_cache()
+        # release the cache file so it can be removed, reopened on next use
+        cache.close()
+        self.remove_path(cache.cache_path)
+
     def browse(self, path: str) -> None:
         """Open up directory."""
 
@@ -893,9 +899,7 @@ class Window(QMainWindow, Ui_MainWindow):
         )
 
         # clear cache
-        self.pushButton_tools_cache_clear.clicked.connect(
-            lambda: self.remove_path(self.get_cache().cache_path)
-        )
+        self.pushButton_tools_cache_clear.clicked.connect(lambda: self.remove_cache())
 
         # browse db
         self.pushButton_tools_db_browse.clicked.connect(
@@ -1,89 +1,168 @@
 import sys
+import json
 import time
+import asyncio
 import logging
 import argparse
+import threading
 from logging import getLogger
-from typing import Tuple
+from functools import partial
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Any, Dict, Tuple, List, Iterator, Optional
 
-from requests.exceptions import HTTPError, RetryError
+from requests.exceptions import (
+    HTTPError,
+    RetryError,
+    ConnectionError,
+    RequestException,
+)
 
 from ah.api import BNAPI, GHAPI
 from ah.models import (
     AuctionsResponse,
     CommoditiesResponse,
+    AuctionsStreamResponse,
+    CommoditiesStreamResponse,
+    DecodedAuctionsResponse,
+    GenericAuctionsResponseInterface,
     MapItemStringMarketValueRecord,
     RegionEnum,
     Namespace,
     DBTypeEnum,
+    DBExtEnum,
     NameSpaceCategoriesEnum,
     GameVersionEnum,
     FactionEnum,
     MapItemStringMarketValueRecords,
     Meta,
+    MarketValueRecord,
     MarketValueRecords,
+    DailyMarketValueSums,
+    RealmCategoryEnum,
 )
-from ah.storage import BinaryFile
+from ah.storage import BinaryFile, ZstdCodec
 from ah.db import DBHelper, GithubFileForker
 from ah import config
 from ah.cache import Cache
 from ah.sysinfo import SysInfo
-from ah.errors import CompressTsError, GetConnectedRealmsIndexError
+from ah.defs import SECONDS_IN
+from ah.errors import (
+    CompressTsError,
+    DBFormatError,
+    GetConnectedRealmsIndexError,
+    JSONStreamError,
+    NotModifiedError,
+)
 
 
 class Updater:
     RECORDS_EXPIRES_IN = config.MIN_RECORD_EXPIRES
+    # region aggregates keep a day ahead, records may come in after midnight
+    REGION_SUMS_DAYS = MarketValueRecords.HISTORICAL_DAYS + 1
+    # returned by `fetch_response` if the snapshot is the same as last update's,
+    # see `BNAPI.conditional`
+    NOT_MODIFIED = object()
 
     def __init__(
         self,
         bn_api: BNAPI,
         db_helper: DBHelper,
         forker: GithubFileForker = None,
+        fetch_workers: int = config.DEFAULT_FETCH_WORKERS,
+        parse_workers: int = config.DEFAULT_PARSE_WORKERS,
+        stream: bool = False,
+        trusted_decode: bool = False,
+        fetch_async: bool = False,
+        append_segments: bool = False,
+        conditional: bool = False,
     ) -> None:
+        """`fetch_async`: fetch over `BNAPI`'s asyncio client instead of a thread
+        pool, `fetch_workers` is the number of requests in flight then. not
+        available in `stream` mode.
+
+        `append_segments`: append increments to db files as new segments between
+        compactions instead of rewriting them, see `save_increment`. readers
+        before segments were introduced only see the last segment of such files,
+        don't publish them without compacting first.
+
+        `conditional`: `bn_api` requests snapshots conditionally, see `BNAPI`.
+        validators of a response are committed once its increment is saved,
+        together with the increment, which is repeated while not modified.
+        """
+        if stream and fetch_async:
+            raise ValueError("`stream` and `fetch_async` can't be used together")
+
         self._logger = getLogger(self.__class__.__name__)
         self.bn_api = bn_api
         self.db_helper = db_helper
         self.forker = forker
+        self.fetch_workers = fetch_workers
+        self.parse_workers = parse_workers
+        self.stream = stream
+        self.trusted_decode = trusted_decode
+        self.fetch_async = fetch_async
+        self.append_segments = append_segments
+        self.conditional = conditional
 
-    def pull_increment(
+    def fetch_response(
         self,
         namespace: Namespace,
         connected_realm_id: int = None,
         faction: FactionEnum = None,
-    ) -> MapItemStringMarketValueRecord:
-        """pull lastest auction increment from api, if `connected_realm_id`
-        not given, then pull commodities (retail commodities are region-wide).
+    ) -> Optional[GenericAuctionsResponseInterface]:
+        """request auctions from api, if `connected_realm_id` not given, then
+        request commodities (retail commodities are region-wide).
 
-        NOTE: failed to fetch auctions for some connected realms,
-              due to `auctions` field being `None` or a 404 status code.
+        returns `None` if request failed, together with warning log message.
+        returns `NOT_MODIFIED` if the snapshot didn't change since last request.
+        safe to call from multiple threads, requests are throttled by `bn_api`.
 
-              we will return a falsy increment in case of `auctions` field being `None`,
-              or returning `None` when 404. together with warning log message.
+        in `stream` mode, only the response headers are received here, the body
+        is downloaded and parsed incrementally by `parse_response`. unless in
+        `trusted_decode` mode, where auctions are decoded here as they arrive.
 
         """
+        if self.trusted_decode:
+            auctions_from_api = partial(
+                DecodedAuctionsResponse.from_api, stream=self.stream
+            )
+            commodities_from_api = auctions_from_api
+        elif self.stream:
+            auctions_from_api = AuctionsStreamResponse.from_api
+            commodities_from_api = CommoditiesStreamResponse.from_api
+        else:
+            auctions_from_api = AuctionsResponse.from_api
+            commodities_from_api = CommoditiesResponse.from_api
+
         if connected_realm_id:
             try:
-                resp = AuctionsResponse.from_api(
+                return auctions_from_api(
                     self.bn_api, namespace, connected_realm_id, faction=faction
                 )
-            except HTTPError as e:
+            except NotModifiedError:
+                self._logger.info(
+                    "Auctions not modified: "
+                    f"{namespace!r} {connected_realm_id} {faction!s}"
+                )
+                return self.NOT_MODIFIED
+            except (HTTPError, JSONStreamError) as e:
                 self._logger.warning(
                     "Failed to request auctions for: "
                     f"{namespace!r} {connected_realm_id} {faction!s}. "
                     f"Error message: {e!s}"
                 )
                 self._logger.debug("traceback:", exc_info=True)
-                return MapItemStringMarketValueRecord()
-
-            if not resp.get_auctions():
-                self._logger.warning(
-                    "Requested auction was empty: "
-                    f"{namespace!r} {connected_realm_id} {faction!s}",
-                )
+                return None
 
         else:
             try:
-                resp = CommoditiesResponse.from_api(self.bn_api, namespace)
-            except (HTTPError, RetryError) as e:
+                return commodities_from_api(self.bn_api, namespace)
+            except NotModifiedError:
+                self._logger.info(f"Commodities not modified: {namespace!r}")
+                return self.NOT_MODIFIED
+            except (HTTPError, RetryError, JSONStreamError) as e:
                 """NOTE:
                 Dec 5, 2023: 
                 High chance of hitting 429. added throttling, but commodities 
@@ -95,19 +174,314 @@ class Updater:
                     f"Error message: {e!s}"
                 )
                 self._logger.debug("traceback:", exc_info=True)
-                return MapItemStringMarketValueRecord()
+                return None
+
+    async def async_fetch_body(
+        self,
+        namespace: Namespace,
+        connected_realm_id: int = None,
+        faction: FactionEnum = None,
+    ) -> Any:
+        """`fetch_response` over `BNAPI`'s asyncio client, returns the response
+        body to be decoded by `decode_response`, `None` or `NOT_MODIFIED`.
+
+        """
+        if connected_realm_id:
+            try:
+                return await self.bn_api.async_get_auctions_body(
+                    namespace,
+                    connected_realm_id,
+                    auction_house_id=AuctionsResponse.MAP_FACTION_AH_ID[faction],
+                )
+            except NotModifiedError:
+                self._logger.info(
+                    "Auctions not modified: "
+                    f"{namespace!r} {connected_realm_id} {faction!s}"
+                )
+                return self.NOT_MODIFIED
+            except (HTTPError, RetryError, ConnectionError) as e:
+                self._logger.warning(
+                    "Failed to request auctions for: "
+                    f"{namespace!r} {connected_realm_id} {faction!s}. "
+                    f"Error message: {e!s}"
+                )
+                self._logger.debug("traceback:", exc_info=True)
+                return None
+
+        else:
+            try:
+                return await self.bn_api.async_get_commodities_body(namespace)
+            except NotModifiedError:
+                self._logger.info(f"Commodities not modified: {namespace!r}")
+                return self.NOT_MODIFIED
+            except (HTTPError, RetryError, ConnectionError) as e:
+                self._logger.warning(
+                    f"Failed to request commodities for: {namespace=!r}. "
+                    f"Error message: {e!s}"
+                )
+                self._logger.debug("traceback:", exc_info=True)
+                return None
+
+    def decode_response(
+        self, body: Any, connected_realm_id: int = None
+    ) -> Optional[GenericAuctionsResponseInterface]:
+        """response of `body` from `async_fetch_body`, as `fetch_response`
+        would have returned it.
+
+        """
+        if body is None or body is self.NOT_MODIFIED:
+            return body
+
+        try:
+            resp = json.loads(body)
+        except ValueError as e:
+            self._logger.warning(
+                f"Failed to decode response body for: {connected_realm_id=}. "
+                f"Error message: {e!s}"
+            )
+            self._logger.debug("traceback:", exc_info=True)
+            return None
+
+        if self.trusted_decode:
+            auctions = resp.get("auctions") or []
+            if connected_realm_id:
+                return DecodedAuctionsResponse.decode_auctions(auctions)
 
-            if not resp.get_auctions():
+            return DecodedAuctionsResponse.decode_commodities(auctions)
+
+        if connected_realm_id:
+            return AuctionsResponse.model_validate(resp)
+
+        return CommoditiesResponse.model_validate(resp)
+
+    def parse_response(
+        self,
+        namespace: Namespace,
+        resp: Optional[GenericAuctionsResponseInterface],
+        connected_realm_id: int = None,
+        faction: FactionEnum = None,
+        executor: Optional[Executor] = None,
+    ) -> MapItemStringMarketValueRecord:
+        """turn response from `fetch_response` into an increment,
+        failed request (`None`) or `NOT_MODIFIED` results in a falsy increment.
+
+        with more than one `parse_workers`, market values are computed in
+        `executor` (or a temporary process pool).
+
+        """
+        if resp is None or resp is self.NOT_MODIFIED:
+            return MapItemStringMarketValueRecord()
+
+        try:
+            increment = MapItemStringMarketValueRecord.from_response(
+                resp,
+                namespace.game_version,
+                workers=self.parse_workers,
+                executor=executor,
+            )
+        except (RequestException, JSONStreamError) as e:
+            # streamed body got cut off or malformed half way
+            self._logger.warning(
+                "Failed to read response for: "
+                f"{namespace!r} {connected_realm_id} {faction!s}. "
+                f"Error message: {e!s}"
+            )
+            self._logger.debug("traceback:", exc_info=True)
+            return MapItemStringMarketValueRecord()
+
+        # streamed auctions can't be checked before being parsed
+        if not increment:
+            if connected_realm_id:
+                self._logger.warning(
+                    "Requested auction was empty: "
+                    f"{namespace!r} {connected_realm_id} {faction!s}",
+                )
+            else:
                 self._logger.warning(
                     f"Requested commodities was empty: {namespace!r}",
                 )
 
-        increment = MapItemStringMarketValueRecord.from_response(
-            resp, namespace.game_version
+        return increment
+
+    def commit_increment(
+        self,
+        namespace: Namespace,
+        increment: MapItemStringMarketValueRecord,
+        connected_realm_id: int = None,
+        faction: FactionEnum = None,
+    ) -> None:
+        """commit validators of the response `increment` was parsed from, once
+        it's saved, so it can be repeated by `get_unchanged_increment`.
+
+        """
+        records = MapItemStringMarketValueRecords()
+        records.update_increment(increment)
+        self.bn_api.commit_validators(
+            namespace,
+            connected_realm_id=connected_realm_id,
+            auction_house_id=AuctionsResponse.MAP_FACTION_AH_ID[faction],
+            state=records.to_protobuf_bytes(),
         )
 
+    def get_unchanged_increment(
+        self,
+        namespace: Namespace,
+        timestamp: int,
+        connected_realm_id: int = None,
+        faction: FactionEnum = None,
+    ) -> MapItemStringMarketValueRecord:
+        """increment of a snapshot not modified since it was last fetched: the
+        increment committed with its validators again at `timestamp`, same as
+        parsing the snapshot again would give, without reading the db file.
+
+        falsy if there's none, validators are dropped then so that the snapshot
+        is fetched again next time.
+
+        """
+        auction_house_id = AuctionsResponse.MAP_FACTION_AH_ID[faction]
+        state = self.bn_api.get_validators_state(
+            namespace,
+            connected_realm_id=connected_realm_id,
+            auction_house_id=auction_house_id,
+        )
+        increment = MapItemStringMarketValueRecord()
+        if state is None:
+            self._logger.warning(
+                "No increment to repeat for snapshot not modified: "
+                f"{namespace!r} {connected_realm_id} {faction!s}"
+            )
+            self.bn_api.drop_validators(
+                namespace,
+                connected_realm_id=connected_realm_id,
+                auction_house_id=auction_house_id,
+            )
+            return increment
+
+        records = MapItemStringMarketValueRecords.from_protobuf_bytes(state)
+        for item_string, item_records in records.items():
+            last = item_records[-1]
+            increment[item_string] = MarketValueRecord(
+                timestamp=timestamp,
+                market_value=last.market_value,
+                num_auctions=last.num_auctions,
+                min_buyout=last.min_buyout,
+            )
+
         return increment
 
+    def iter_responses(
+        self,
+        namespace: Namespace,
+        tasks: List[Tuple[Optional[int], Optional[FactionEnum]]],
+    ) -> Iterator[Optional[GenericAuctionsResponseInterface]]:
+        """fetch responses for `(connected_realm_id, faction)` in `tasks`,
+        yields them in the same order as `tasks`.
+
+        with more than one `fetch_workers`, requests are made in a thread pool,
+        at most `2 * fetch_workers` responses are held in memory waiting to
+        be consumed, so parsing / saving in the caller overlaps with fetching.
+        in `stream` mode only request latency overlaps, bodies are downloaded
+        by the caller while parsing.
+
+        in `fetch_async` mode, requests are made by an event loop in a
+        background thread instead, responses are decoded by the caller.
+
+        """
+        if self.fetch_async:
+            yield from self._iter_responses_async(namespace, tasks)
+            return
+
+        if self.fetch_workers <= 1:
+            for crid, faction in tasks:
+                yield self.fetch_response(
+                    namespace, connected_realm_id=crid, faction=faction
+                )
+
+            return
+
+        max_pending = 2 * self.fetch_workers
+        with ThreadPoolExecutor(
+            max_workers=self.fetch_workers,
+            thread_name_prefix="fetch",
+        ) as executor:
+            pending = deque()
+            for crid, faction in tasks:
+                pending.append(
+                    executor.submit(
+                        self.fetch_response,
+                        namespace,
+                        connected_realm_id=crid,
+                        faction=faction,
+                    )
+                )
+                if len(pending) >= max_pending:
+                    yield pending.popleft().result()
+
+            while pending:
+                yield pending.popleft().result()
+
+    def _iter_responses_async(
+        self,
+        namespace: Namespace,
+        tasks: List[Tuple[Optional[int], Optional[FactionEnum]]],
+    ) -> Iterator[Optional[GenericAuctionsResponseInterface]]:
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, name="fetch", daemon=True)
+        thread.start()
+        semaphore = asyncio.Semaphore(self.fetch_workers)
+
+        async def fetch(crid: Optional[int], faction: Optional[FactionEnum]) -> Any:
+            async with semaphore:
+                return await self.async_fetch_body(
+                    namespace, connected_realm_id=crid, faction=faction
+                )
+
+        max_pending = 2 * self.fetch_workers
+        pending = deque()
+        try:
+            for crid, faction in tasks:
+                future = asyncio.run_coroutine_threadsafe(fetch(crid, faction), loop)
+                pending.append((crid, future))
+                if len(pending) >= max_pending:
+                    crid_, future = pending.popleft()
+                    yield self.decode_response(future.result(), crid_)
+
+            while pending:
+                crid_, future = pending.popleft()
+                yield self.decode_response(future.result(), crid_)
+
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+            asyncio.run_coroutine_threadsafe(self.bn_api.async_close(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+
+    def pull_increment(
+        self,
+        namespace: Namespace,
+        connected_realm_id: int = None,
+        faction: FactionEnum = None,
+    ) -> MapItemStringMarketValueRecord:
+        """pull lastest auction increment from api, if `connected_realm_id`
+        not given, then pull commodities (retail commodities are region-wide).
+
+        NOTE: failed to fetch auctions for some connected realms,
+              due to `auctions` field being `None` or a 404 status code.
+
+              we will return a falsy increment in case of `auctions` field being `None`,
+              or returning `None` when 404. together with warning log message.
+
+        """
+        resp = self.fetch_response(
+            namespace, connected_realm_id=connected_realm_id, faction=faction
+        )
+        return self.parse_response(
+            namespace, resp, connected_realm_id=connected_realm_id, faction=faction
+        )
+
     def save_increment(
         self,
         file: BinaryFile,
@@ -116,6 +490,16 @@ class Updater:
         ts_compressed: int = 0,
         is_tsc_local: bool = False,
     ) -> MapItemStringMarketValueRecords:
+        """save `increment` into `file`.
+
+        all segments are merged, expired records removed, finished days
+        compressed, the file rewritten and the merged records returned.
+
+        in `append_segments` mode db files are append-only between compactions:
+        if every record before the current UTC day is already compressed
+        (`ts_compressed`), the increment is appended as a new segment and
+        returned, nothing is written for an empty increment.
+        """
         if file.exists() != is_tsc_local:
             # db file and db compress ts locality does not match
             # note in case of local mode + meta miss + data miss, the locality of
@@ -128,7 +512,30 @@ class Updater:
             )
             ts_compressed = 0
 
-        records = MapItemStringMarketValueRecords.from_file(file, forker=self.forker)
+        if self.forker:
+            self.forker.ensure_file(file)
+
+        if (
+            self.append_segments
+            and file.exists()
+            and ts_compressed >= MarketValueRecords.get_compress_end_ts(start_ts)
+        ):
+            # no day finished since last compaction, nothing to compress or
+            # expire, append increment as a new segment instead of rewriting
+            records = MapItemStringMarketValueRecords()
+            if not increment:
+                self._logger.debug(f"DB unchanged: {file!r}, empty increment")
+                return records
+
+            n_added_records, n_added_entries = records.update_increment(increment)
+            records.to_file(file, append=True)
+            self._logger.info(
+                f"DB append: {file!r}, {n_added_records=} {n_added_entries=}"
+            )
+            return records
+
+        # compaction: merge all segments, compress and rewrite
+        records = MapItemStringMarketValueRecords.from_file(file)
         n_added_records, n_added_entries = records.update_increment(increment)
         n_removed_records = records.remove_expired(start_ts - self.RECORDS_EXPIRES_IN)
         try:
@@ -150,24 +557,80 @@ class Updater:
                 ts_compressed=0,
             )
 
-        records.to_file(file)
+        # file could be in another format than configured, convert it
+        db_ext_file = self.db_helper.get_db_ext_file(file)
+        records.to_file(db_ext_file)
+        if db_ext_file.file_path != file.file_path:
+            self._logger.info(f"DB converted: {file!r} -> {db_ext_file!r}")
+            file.remove()
+            file = db_ext_file
+
         self._logger.info(
             f"DB update: {file!r}, {n_added_records=} "
             f"{n_added_entries=} {n_removed_records=}"
         )
         return records
 
+    def load_region_sums(
+        self,
+        namespace: Namespace,
+        category: RealmCategoryEnum,
+        start_ts: int,
+        last_start_ts: int = 0,
+    ) -> Tuple[DailyMarketValueSums, bool]:
+        """region aggregate of `category` shifted to the day of `start_ts`, and
+        whether it needs to be rebuilt from every db file of the category.
+
+        it does if it's missing, unreadable, or didn't include the last update
+        (`last_start_ts`) - an increment went missing, only db files have it.
+        """
+        file = self.db_helper.get_file(
+            namespace, DBTypeEnum.REGION, category=category
+        )
+        ts_now = DailyMarketValueSums.get_day_end_ts(start_ts) + SECONDS_IN.DAY
+        try:
+            sums = DailyMarketValueSums.from_file(file, forker=self.forker)
+        except DBFormatError as e:
+            self._logger.warning(
+                f"Failed to read region aggregate {file!r}, rebuilding it. "
+                f"Error message: {e!s}"
+            )
+            self._logger.debug("traceback:", exc_info=True)
+            sums = None
+
+        if sums is None or sums.ts_updated != last_start_ts or not last_start_ts:
+            if sums is not None:
+                self._logger.info(
+                    f"Region aggregate {file!r} outdated: "
+                    f"{sums.ts_updated=!r} {last_start_ts=!r}, rebuilding it."
+                )
+
+            return DailyMarketValueSums(ts_now, n_days=self.REGION_SUMS_DAYS), True
+
+        sums.shift(ts_now)
+        return sums, False
+
     def update_region_records(
         self,
         namespace: Namespace,
         connected_realm_ids: Tuple[int],
         ts_compressed: int = 0,
         is_tsc_local: bool = False,
-    ) -> Tuple[int, int]:
+        realm_categories: Optional[Dict[int, RealmCategoryEnum]] = None,
+        last_start_ts: int = 0,
+    ) -> Tuple[int, int, List[Tuple[Optional[int], Optional[FactionEnum]]]]:
         """update auction / commodities records for every connected realm under
         this region
 
-        returns update start_ts and end_ts
+        with `realm_categories` (connected realm id -> category), region
+        aggregates of each category are updated too, see `DailyMarketValueSums`.
+        `last_start_ts`: start ts of last update, to tell if they're up to date.
+
+        snapshots not modified since last update aren't parsed, their latest
+        records are repeated instead, see `get_unchanged_increment`.
+
+        returns update start_ts, end_ts and `(connected_realm_id, faction)` of
+        snapshots not modified.
         """
         start_ts = int(time.time())
         if namespace.game_version == GameVersionEnum.RETAIL:
@@ -175,43 +638,145 @@ class Updater:
         else:
             factions = [FactionEnum.ALLIANCE, FactionEnum.HORDE]
 
-        for crid in connected_realm_ids:
-            for faction in factions:
-                increment = self.pull_increment(
+        # (connected_realm_id, faction), `None` crid for commodities
+        tasks = [
+            (crid, faction) for crid in connected_realm_ids for faction in factions
+        ]
+        if namespace.game_version == GameVersionEnum.RETAIL:
+            tasks.append((None, None))
+
+        # days finished since last update were added up from increments, they're
+        # added again from compacted db files, see `DailyMarketValueSums`
+        ts_refold_begin = MarketValueRecords.get_compress_end_ts(last_start_ts or 0)
+        ts_refold_end = MarketValueRecords.get_compress_end_ts(start_ts)
+        # category -> (aggregate, is it being rebuilt)
+        region_sums = {}
+        if realm_categories is not None:
+            categories = set(realm_categories.values())
+            if namespace.game_version == GameVersionEnum.RETAIL:
+                # commodities are region wide, counted as default
+                categories.add(RealmCategoryEnum.DEFAULT)
+
+            for category in sorted(categories):
+                sums, is_rebuilding = self.load_region_sums(
+                    namespace, category, start_ts, last_start_ts=last_start_ts
+                )
+                if not is_rebuilding:
+                    sums.clear(ts_refold_begin, ts_refold_end)
+
+                region_sums[category] = sums, is_rebuilding
+
+        if self.conditional:
+            for crid, faction in tasks:
+                file = self.db_helper.get_file(
                     namespace,
-                    connected_realm_id=crid,
+                    DBTypeEnum.AUCTIONS if crid else DBTypeEnum.COMMODITIES,
+                    crid=crid,
                     faction=faction,
                 )
+                if self.forker:
+                    self.forker.ensure_file(file)
+
+                # validators live in cache, which may have outlived the db file,
+                # a new one starts from the whole snapshot
+                if not file.exists():
+                    self.bn_api.drop_validators(
+                        namespace,
+                        connected_realm_id=crid,
+                        auction_house_id=AuctionsResponse.MAP_FACTION_AH_ID[faction],
+                    )
+
+        # one process pool for the whole region, spawning one per response is slow
+        if self.parse_workers > 1:
+            parse_executor = ProcessPoolExecutor(max_workers=self.parse_workers)
+        else:
+            parse_executor = nullcontext()
+
+        unchanged = []
+        responses = self.iter_responses(namespace, tasks)
+        with parse_executor as executor:
+            for (crid, faction), resp in zip(tasks, responses):
                 file = self.db_helper.get_file(
                     namespace,
-                    DBTypeEnum.AUCTIONS,
+                    DBTypeEnum.AUCTIONS if crid else DBTypeEnum.COMMODITIES,
                     crid=crid,
                     faction=faction,
                 )
-                self.save_increment(
+                is_unchanged = resp is self.NOT_MODIFIED
+                if is_unchanged:
+                    unchanged.append((crid, faction))
+                    # exports need records of the last update
+                    increment = self.get_unchanged_increment(
+                        namespace,
+                        int(time.time()),
+                        connected_realm_id=crid,
+                        faction=faction,
+                    )
+                else:
+                    increment = self.parse_response(
+                        namespace,
+                        resp,
+                        connected_realm_id=crid,
+                        faction=faction,
+                        executor=executor,
+                    )
+
+                # release the response before saving, it's usually the larger one
+                del resp
+                # compacted if any day finished since last update
+                records = self.save_increment(
                     file,
                     increment,
                     start_ts,
                     ts_compressed=ts_compressed,
                     is_tsc_local=is_tsc_local,
                 )
+                if self.conditional and increment and not is_unchanged:
+                    self.commit_increment(
+                        namespace, increment, connected_realm_id=crid, faction=faction
+                    )
 
-        if namespace.game_version == GameVersionEnum.RETAIL:
-            increment = self.pull_increment(namespace)
-            file = self.db_helper.get_file(namespace, DBTypeEnum.COMMODITIES)
-            self.save_increment(
-                file,
-                increment,
-                start_ts,
-                ts_compressed=ts_compressed,
-                is_tsc_local=is_tsc_local,
+                if crid:
+                    category = (realm_categories or {}).get(crid)
+                else:
+                    category = RealmCategoryEnum.DEFAULT
+
+                if category in region_sums:
+                    sums, is_rebuilding = region_sums[category]
+                    if is_rebuilding:
+                        # file could have been converted during compaction
+                        file = self.db_helper.get_file(
+                            namespace,
+                            DBTypeEnum.AUCTIONS if crid else DBTypeEnum.COMMODITIES,
+                            crid=crid,
+                            faction=faction,
+                        )
+                        sums.add(MapItemStringMarketValueRecords.from_file(file))
+                    else:
+                        sums.add(
+                            records, ts_begin=ts_refold_begin, ts_end=ts_refold_end
+                        )
+                        sums.add_increment(increment)
+
+                # don't hold records of a whole realm while fetching the next one
+                del records
+
+        for category, (sums, _) in region_sums.items():
+            sums.ts_updated = start_ts
+            file = self.db_helper.get_file(
+                namespace, DBTypeEnum.REGION, category=category
             )
+            sums.to_file(file)
+            self._logger.info(f"Region aggregate update: {file!r}, {len(sums)=}")
+
+        if unchanged:
+            self._logger.info(f"{len(unchanged)} of {len(tasks)} snapshots unchanged")
 
         # just in case we're in the same ts as the increment, which cause
         # `MarketValueRecords.average_by_day` to ignore the increment record
         # because the ts passed in is the same as the increment's ts
         end_ts = int(time.time()) + 1
-        return start_ts, end_ts
+        return start_ts, end_ts, unchanged
 
     def update_region(self, namespace: Namespace, compress_all=False) -> None:
         sys_info = SysInfo()
@@ -235,7 +800,12 @@ class Updater:
 
         # try update connected realm info, if failed, use existing info
         try:
-            meta = Meta.from_api(self.bn_api, namespace)
+            meta = Meta.from_api(
+                self.bn_api,
+                namespace,
+                workers=self.fetch_workers,
+                fetch_async=self.fetch_async,
+            )
         except GetConnectedRealmsIndexError as e:
             self._logger.warning(
                 f"Failed to request connected realms index for: {namespace!r}, "
@@ -244,13 +814,18 @@ class Updater:
             )
             self._logger.debug("traceback:", exc_info=True)
 
-        start_ts, end_ts = self.update_region_records(
+        start_ts, end_ts, unchanged = self.update_region_records(
             namespace,
             meta.get_connected_realm_ids(),
             ts_compressed=ts_compressed,
             is_tsc_local=is_tsc_local,
+            realm_categories={
+                crid: category for crid, _, category in meta.iter_connected_realms()
+            },
+            last_start_ts=last_start_ts,
         )
         meta.set_update_ts(start_ts, end_ts)
+        meta.set_update_unchanged(unchanged)
         sys_info.stop_monitor()
         meta.set_system(sys_info.get_sysinfo())
         meta.to_file(meta_file)
@@ -263,6 +838,17 @@ def main(
     game_version: GameVersionEnum = None,
     region: RegionEnum = None,
     compress_all: bool = False,
+    fetch_workers: int = config.DEFAULT_FETCH_WORKERS,
+    parse_workers: int = config.DEFAULT_PARSE_WORKERS,
+    stream: bool = False,
+    trusted_decode: bool = False,
+    fetch_async: bool = False,
+    db_ext: DBExtEnum = None,
+    zstd_level: int = config.DEFAULT_DB_ZSTD_LEVEL,
+    zstd_threads: int = config.DEFAULT_DB_ZSTD_THREADS,
+    zstd_dict: str = config.DEFAULT_DB_ZSTD_DICT,
+    conditional: bool = False,
+    append_segments: bool = False,
     # below are for testability
     cache: Cache = None,
     gh_api: GHAPI = None,
@@ -281,16 +867,38 @@ def main(
         config.BN_CLIENT_ID,
         config.BN_CLIENT_SECRET,
         cache,
+        conditional=conditional,
+        async_limit=fetch_workers,
     )
     namespace = Namespace(
         category=NameSpaceCategoriesEnum.DYNAMIC,
         game_version=game_version,
         region=region,
     )
-    db_helper = DBHelper(db_path)
-    updater = Updater(bn_api, db_helper, forker=forker)
+    if zstd_dict:
+        zstd_codec = ZstdCodec.from_dict_file(
+            zstd_dict, level=zstd_level, threads=zstd_threads
+        )
+    else:
+        zstd_codec = ZstdCodec(level=zstd_level, threads=zstd_threads)
+
+    db_helper = DBHelper(db_path, db_ext=db_ext, zstd_codec=zstd_codec)
+    updater = Updater(
+        bn_api,
+        db_helper,
+        forker=forker,
+        fetch_workers=fetch_workers,
+        parse_workers=parse_workers,
+        stream=stream,
+        trusted_decode=trusted_decode,
+        fetch_async=fetch_async,
+        append_segments=append_segments,
+        conditional=conditional,
+    )
     updater.update_region(namespace, compress_all=compress_all)
     updater._logger.info(f"Updated {namespace!r}")
+    for fname, stats in cache.get_stats().items():
+        updater._logger.debug(f"Cache {fname}: {stats!r}")
 
 
 def parse_args(raw_args):
@@ -334,6 +942,90 @@ def parse_args(raw_args):
         "been compressed. In case of errors caused by `ts_compress` being "
         "incorrect, use this option to fix it.",
     )
+    parser.add_argument(
+        "--fetch_workers",
+        type=int,
+        default=config.DEFAULT_FETCH_WORKERS,
+        help="Number of threads fetching auctions and connected realms "
+        "concurrently, requests are "
+        "throttled to stay under Blizzard API's rate limit regardless. "
+        f"default: {config.DEFAULT_FETCH_WORKERS!r}",
+    )
+    parser.add_argument(
+        "--parse_workers",
+        type=int,
+        default=config.DEFAULT_PARSE_WORKERS,
+        help="Number of processes computing market values from large responses "
+        "(commodities), results are identical to single process. "
+        f"default: {config.DEFAULT_PARSE_WORKERS!r}",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Parse auctions while downloading them instead of loading the whole "
+        "response first, keeps memory usage low on large responses. "
+        "Cached responses are streamed the same way.",
+    )
+    parser.add_argument(
+        "--trusted_decode",
+        action="store_true",
+        help="Decode auctions straight into a compact form, skipping per auction "
+        "model validation (checks are still done in bulk). Much faster on large "
+        "responses.",
+    )
+    parser.add_argument(
+        "--fetch_async",
+        action="store_true",
+        help="Fetch auctions over an asyncio client from a single thread, "
+        "'--fetch_workers' is the number of requests in flight then, can be "
+        "in the hundreds. Can't be used with '--stream'.",
+    )
+    parser.add_argument(
+        "--conditional",
+        action="store_true",
+        help="Request auctions with validators (ETag / Last-Modified) of the last "
+        "response kept in cache, snapshots that haven't changed since are not "
+        "downloaded again nor parsed, their latest records are repeated instead. "
+        "Responses are not cached then.",
+    )
+    parser.add_argument(
+        "--append_segments",
+        action="store_true",
+        help="Append new records to db files as segments until a day finishes, "
+        "instead of rewriting the whole file every update. Such files can't be "
+        "read by older versions, don't publish them before a compaction.",
+    )
+    parser.add_argument(
+        "--db_ext",
+        choices={e.value for e in DBExtEnum if e != DBExtEnum.JSON},
+        default=None,
+        help="Format of auctions and commodities db files, 'mmap' files are "
+        "uncompressed and read without decoding. "
+        "default: 'gz' if compression is enabled, otherwise 'bin'",
+    )
+    parser.add_argument(
+        "--zstd_level",
+        type=int,
+        default=config.DEFAULT_DB_ZSTD_LEVEL,
+        help="Compression level of 'zst' db files, "
+        f"default: {config.DEFAULT_DB_ZSTD_LEVEL!r}",
+    )
+    parser.add_argument(
+        "--zstd_threads",
+        type=int,
+        default=config.DEFAULT_DB_ZSTD_THREADS,
+        help="Number of threads compressing 'zst' db files, 0 for single "
+        "threaded, -1 for one per CPU core. "
+        f"default: {config.DEFAULT_DB_ZSTD_THREADS!r}",
+    )
+    parser.add_argument(
+        "--zstd_dict",
+        type=str,
+        default=config.DEFAULT_DB_ZSTD_DICT,
+        help="Path to a zstd dictionary for 'zst' db files, see "
+        "'bin/bench_codecs.py'. Files written with a dictionary can only be read "
+        "with the same one.",
+    )
     parser.add_argument(
         "region",
         choices={e.value for e in RegionEnum},
@@ -351,8 +1043,21 @@ def parse_args(raw_args):
             f"Invalid Github proxy server given by '--gh_proxy' option, "
             f"it should be a valid URL, not {args.gh_proxy!r}."
         )
+    for option in ("fetch_workers", "parse_workers"):
+        if getattr(args, option) < 1:
+            raise ValueError(
+                f"Invalid number of workers given by '--{option}' option, "
+                f"it should be at least 1, not {getattr(args, option)!r}."
+            )
+
+    if args.stream and args.fetch_async:
+        raise ValueError("'--stream' and '--fetch_async' can't be used together.")
+
     args.game_version = GameVersionEnum[args.game_version.upper()]
     args.region = RegionEnum(args.region)
+    if args.db_ext:
+        args.db_ext = DBExtEnum(args.db_ext)
+
     return args
 
 
@@ -2,3 +2,4 @@
 from requests.exceptions import *  # noqa
 
 from .blizzard_api import BlizzardApi  # noqa
+from .wow.aio_wow_game_data_api import AsyncWowGameDataApi  # noqa
@@ -0,0 +1,259 @@
+"""aio_api.py file."""
+import json
+import base64
+import asyncio
+from logging import getLogger
+
+from requests.exceptions import HTTPError, RetryError, ConnectionError
+
+from ah import config
+
+
+class AsyncApi:
+    """Base API class over asyncio, counterpart of `Api`.
+
+    aiohttp is imported on first use. A session (connection pool with
+    keep-alive) is created lazily for the running event loop, and needs to be
+    closed with `close` before the loop ends. Access tokens are kept per region
+    and shared by every coroutine, they outlive sessions.
+
+    Errors are raised as their `requests` counterparts, so callers handle both
+    clients the same way: `HTTPError` for error statuses, `RetryError` when
+    retries are exhausted, `ConnectionError` for connection failures.
+
+    Attributes:
+        _client_id: A string client id supplied by Blizzard.
+        _client_secret: A string client secret supplied by Blizzard.
+        _access_tokens: Access tokens by region.
+        _session: An open aiohttp.ClientSession, bound to `_session_loop`.
+        _token_locks: Locks by region, so a token is fetched once per region.
+    """
+
+    RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+    # response header -> request header to validate it
+    CONDITIONAL_HEADERS = {
+        "ETag": "If-None-Match",
+        "Last-Modified": "If-Modified-Since",
+    }
+
+    _logger = getLogger("AsyncApi")
+
+    def __init__(
+        self,
+        client_id,
+        client_secret,
+        limit=100,
+        max_retries=5,
+        backoff_factor=1,
+        timeout=300,
+    ):
+        """Init AsyncApi.
+
+        `limit`: max number of open connections of a session.
+        `max_retries`, `backoff_factor`: retry on `RETRY_STATUSES` and
+        connection errors, sleeps `backoff_factor * 2 ** n` before the nth
+        retry, or as long as `Retry-After` says.
+        """
+        self._client_id = client_id
+        self._client_secret = client_secret
+        self._access_tokens = {}
+        self.limit = limit
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.timeout = timeout
+
+        self._api_url = "https://{0}.api.blizzard.com{1}"
+        self._api_url_cn = "https://gateway.battlenet.com.cn{0}"
+        self._oauth_url = (
+            config.BN_OAUTH_URL or "https://oauth.battle.net"
+        ) + "{0}"
+        self._oauth_url_cn = (
+            config.BN_OAUTH_URL_CN or "https://oauth.battlenet.com.cn"
+        ) + "{0}"
+
+        self._session = None
+        self._session_loop = None
+        self._token_locks = {}
+
+    def _get_session(self):
+        """Session of the running loop, created on first use."""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session_loop is not loop:
+            import aiohttp
+
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.limit, ssl=None if config.VERIFY_SSL else False
+                ),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            self._session_loop = loop
+            # locks are bound to a loop too
+            self._token_locks = {}
+
+        return self._session
+
+    async def close(self):
+        """Close the session of the running loop."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+            self._session_loop = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    def _get_backoff(self, n_retry, headers):
+        retry_after = headers.get("Retry-After") if headers else None
+        if retry_after and retry_after.isdigit():
+            return int(retry_after)
+
+        return self.backoff_factor * 2**n_retry
+
+    async def _request(self, method, url, **kwargs):
+        """Send a request, retry on `RETRY_STATUSES` and connection errors.
+
+        Returns `(status, headers, body)` of the first response with any other
+        status, error statuses are left to the caller.
+        """
+        import aiohttp
+
+        session = self._get_session()
+        for n_retry in range(self.max_retries + 1):
+            try:
+                async with session.request(method, url, **kwargs) as response:
+                    status = response.status
+                    headers = response.headers
+                    body = await response.read()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if n_retry >= self.max_retries:
+                    raise ConnectionError(f"{e!r}: {url}") from e
+
+                backoff = self._get_backoff(n_retry, None)
+                self._logger.debug(f"{e!r}, retry in {backoff}s: {url}")
+
+            else:
+                if status not in self.RETRY_STATUSES:
+                    break
+
+                if n_retry >= self.max_retries:
+                    raise RetryError(f"Max retries exceeded, {status}: {url}")
+
+                backoff = self._get_backoff(n_retry, headers)
+                self._logger.debug(f"{status}, retry in {backoff}s: {url}")
+
+            await asyncio.sleep(backoff)
+
+        return status, headers, body
+
+    def _raise_for_status(self, status, url):
+        if status >= 400:
+            raise HTTPError(f"{status} Error: {url}")
+
+    async def _get_client_token(self, region):
+        """Fetch an access token based on client id and client secret credentials.
+
+        Args:
+            region:
+                A string containing a region.
+        """
+        url = self._format_oauth_url("/token", region)
+        query_params = {"grant_type": "client_credentials"}
+        credentials = f"{self._client_id}:{self._client_secret}".encode()
+        headers = {"Authorization": "Basic " + base64.b64encode(credentials).decode()}
+        status, _, body = await self._request(
+            "POST", url, params=query_params, headers=headers
+        )
+        self._raise_for_status(status, url)
+        return json.loads(body)
+
+    async def _get_access_token(self, region, expired=None):
+        """Token of `region`, fetched once by whoever asks first. Pass the token
+        got rejected as `expired` to fetch a new one.
+        """
+        token = self._access_tokens.get(region)
+        if token is not None and token != expired:
+            return token
+
+        self._get_session()
+        lock = self._token_locks.setdefault(region, asyncio.Lock())
+        async with lock:
+            token = self._access_tokens.get(region)
+            if token is None or token == expired:
+                resp = await self._get_client_token(region)
+                token = self._access_tokens[region] = resp["access_token"]
+
+        return token
+
+    async def _request_handler(
+        self, url, region, query_params, validators=None, raw=False
+    ):
+        """Handle the request, returns the parsed json, or the body as is if
+        `raw`.
+
+        `validators` work the same as in `Api._request_handler`, returns `None`
+        if the resource was not modified (304).
+        """
+        headers = {}
+        if validators is not None:
+            for validator, header in self.CONDITIONAL_HEADERS.items():
+                if validators.get(validator):
+                    headers[header] = validators[validator]
+
+        token = await self._get_access_token(region)
+        params = {**query_params, "access_token": token}
+        status, resp_headers, body = await self._request(
+            "GET", url, params=params, headers=headers
+        )
+        if status == 401:
+            # token expired, once more with a new one
+            token = await self._get_access_token(region, expired=token)
+            params["access_token"] = token
+            status, resp_headers, body = await self._request(
+                "GET", url, params=params, headers=headers
+            )
+
+        self._raise_for_status(status, url)
+
+        if validators is not None:
+            if status == 304:
+                return None
+
+            for validator in self.CONDITIONAL_HEADERS:
+                if resp_headers.get(validator):
+                    validators[validator] = resp_headers[validator]
+
+        if raw:
+            return body
+
+        return json.loads(body)
+
+    def _format_api_url(self, resource, region):
+        """Format the API url into a usable url."""
+        if region == "cn":
+            url = self._api_url_cn.format(resource)
+        else:
+            url = self._api_url.format(region, resource)
+
+        return url
+
+    def _format_oauth_url(self, resource, region):
+        """Format the oauth url into a usable url."""
+        if region == "cn":
+            url = self._oauth_url_cn.format(resource)
+        else:
+            url = self._oauth_url.format(resource)
+
+        return url
+
+    async def get_resource(
+        self, resource, region, query_params={}, validators=None, raw=False
+    ):
+        """Direction handler for when fetching resources."""
+        url = self._format_api_url(resource, region)
+        return await self._request_handler(
+            url, region, query_params, validators=validators, raw=raw
+        )
@@ -1,4 +1,6 @@
 """api.py file."""
+import threading
+
 import requests
 from requests.adapters import HTTPAdapter, Retry
 
@@ -17,13 +19,22 @@ class Api:
         _oauth_url: A string url used to call the OAuth API endpoints.
         _oauth_url_cn: A string url used to call the china OAuth API endpoints.
         _session: An open requests.Session instance.
+        _token_lock: A lock so concurrent requests fetch the access token once.
     """
 
+    STREAM_CHUNK_SIZE = 64 * 1024
+    # response header -> request header to validate it
+    CONDITIONAL_HEADERS = {
+        "ETag": "If-None-Match",
+        "Last-Modified": "If-Modified-Since",
+    }
+
     def __init__(self, client_id, client_secret):
         """Init Api."""
         self._client_id = client_id
         self._client_secret = client_secret
         self._access_token = None
+        self._token_lock = threading.Lock()
 
         self._api_url = "https://{0}.api.blizzard.com{1}"
         self._api_url_cn = "https://gateway.battlenet.com.cn{0}"
@@ -67,16 +78,67 @@ class Api:
         resp = response.json()
         return resp
 
-    def _request_handler(self, url, region, query_params):
-        """Handle the request."""
+    def _stream_handler(self, response, chunk_size):
+        """Handle the response, yield body in chunks as it arrives."""
+        try:
+            response.raise_for_status()
+        except Exception:
+            response.close()
+            raise
+
+        def iter_chunks():
+            with response:
+                yield from response.iter_content(chunk_size=chunk_size)
+
+        return iter_chunks()
+
+    def _request_handler(
+        self, url, region, query_params, stream=False, validators=None
+    ):
+        """Handle the request.
+
+        When `stream` is true, returns an iterator of (decompressed) body
+        chunks instead of the parsed json, the connection is held until the
+        iterator is exhausted or closed.
+
+        When `validators` is given, it's a dict of `Last-Modified` / `ETag` of
+        the last response of the same resource, they're sent as
+        `If-Modified-Since` / `If-None-Match`, and the dict is updated from
+        this response. Returns `None` if the resource was not modified (304).
+        """
         if self._access_token is None:
-            json = self._get_client_token(region)
-            self._access_token = json["access_token"]
+            with self._token_lock:
+                if self._access_token is None:
+                    json = self._get_client_token(region)
+                    self._access_token = json["access_token"]
 
         if query_params.get("access_token") is None:
             query_params["access_token"] = self._access_token
 
-        response = self._session.get(url, params=query_params, verify=config.VERIFY_SSL)
+        headers = {}
+        if validators is not None:
+            for validator, header in self.CONDITIONAL_HEADERS.items():
+                if validators.get(validator):
+                    headers[header] = validators[validator]
+
+        response = self._session.get(
+            url,
+            params=query_params,
+            headers=headers,
+            verify=config.VERIFY_SSL,
+            stream=bool(stream),
+        )
+        if validators is not None:
+            if response.status_code == 304:
+                response.close()
+                return None
+
+            for validator in self.CONDITIONAL_HEADERS:
+                if response.headers.get(validator):
+                    validators[validator] = response.headers[validator]
+
+        if stream:
+            return self._stream_handler(response, self.STREAM_CHUNK_SIZE)
 
         return self._response_handler(response)
 
@@ -89,10 +151,14 @@ class Api:
 
         return url
 
-    def get_resource(self, resource, region, query_params={}):
+    def get_resource(
+        self, resource, region, query_params={}, stream=False, validators=None
+    ):
         """Direction handler for when fetching resources."""
         url = self._format_api_url(resource, region)
-        return self._request_handler(url, region, query_params)
+        return self._request_handler(
+            url, region, query_params, stream=stream, validators=validators
+        )
 
     def _format_oauth_url(self, resource, region):
         """Format the oauth url into a usable url."""
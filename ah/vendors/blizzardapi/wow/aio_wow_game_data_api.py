@@ -0,0 +1,64 @@
+"""aio_wow_game_data_api.py file."""
+from ..aio_api import AsyncApi
+
+
+class AsyncWowGameDataApi(AsyncApi):
+    """Wow Game Data API methods used for auction snapshots, over asyncio.
+
+    Same signatures as their `WowGameDataApi` counterparts, without `stream`,
+    auctions and commodities can be returned as `raw` body instead.
+
+    Attributes:
+        client_id: A string client id supplied by Blizzard.
+        client_secret: A string client secret supplied by Blizzard.
+    """
+
+    def __init__(self, client_id, client_secret, **kwargs):
+        """Init AsyncWowGameDataApi."""
+        super().__init__(client_id, client_secret, **kwargs)
+
+    # Auction House API
+
+    async def get_commodities(
+        self, region, locale, namespace, validators=None, raw=False
+    ):
+        """Returns all commodities for region."""
+        resource = "/data/wow/auctions/commodities"
+        query_params = {"namespace": namespace, "locale": locale}
+        return await super().get_resource(
+            resource, region, query_params, validators=validators, raw=raw
+        )
+
+    async def get_auctions(
+        self,
+        region,
+        locale,
+        namespace,
+        connected_realm_id,
+        auction_house_id=None,
+        validators=None,
+        raw=False,
+    ):
+        """Return all active auctions for a connected realm."""
+        resource = f"/data/wow/connected-realm/{connected_realm_id}/auctions"
+        if auction_house_id is not None:
+            resource += f"/{auction_house_id}"
+
+        query_params = {"namespace": namespace, "locale": locale}
+        return await super().get_resource(
+            resource, region, query_params, validators=validators, raw=raw
+        )
+
+    # Connected Realm API
+
+    async def get_connected_realms_index(self, region, locale, namespace):
+        """Return an index of connected realms."""
+        resource = "/data/wow/connected-realm/index"
+        query_params = {"namespace": namespace, "locale": locale}
+        return await super().get_resource(resource, region, query_params)
+
+    async def get_connected_realm(self, region, locale, namespace, connected_realm_id):
+        """Return a connected realm by ID."""
+        resource = f"/data/wow/connected-realm/{connected_realm_id}"
+        query_params = {"namespace": namespace, "locale": locale}
+        return await super().get_resource(resource, region, query_params)
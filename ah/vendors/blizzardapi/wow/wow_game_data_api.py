@@ -66,14 +66,25 @@ class WowGameDataApi(Api):
         query_params = {"namespace": f"dynamic-classic-{region}", "locale": locale}
         return super().get_resource(resource, region, query_params)
 
-    def get_commodities(self, region, locale, namespace):
+    def get_commodities(
+        self, region, locale, namespace, stream=False, validators=None
+    ):
         """Returns all commodities for region."""
         resource = "/data/wow/auctions/commodities"
         query_params = {"namespace": namespace, "locale": locale}
-        return super().get_resource(resource, region, query_params)
+        return super().get_resource(
+            resource, region, query_params, stream=stream, validators=validators
+        )
 
     def get_auctions(
-        self, region, locale, namespace, connected_realm_id, auction_house_id=None
+        self,
+        region,
+        locale,
+        namespace,
+        connected_realm_id,
+        auction_house_id=None,
+        stream=False,
+        validators=None,
     ):
         """Return all active auctions for a connected realm."""
         resource = f"/data/wow/connected-realm/{connected_realm_id}/auctions"
@@ -81,7 +92,9 @@ class WowGameDataApi(Api):
             resource += f"/{auction_house_id}"
 
         query_params = {"namespace": namespace, "locale": locale}
-        return super().get_resource(resource, region, query_params)
+        return super().get_resource(
+            resource, region, query_params, stream=stream, validators=validators
+        )
 
     # Azerite Essence API
 
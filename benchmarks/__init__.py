@@ -0,0 +1,5 @@
+"""benchmarks of the update and export pipeline on synthetic data, see `run`.
+
+PYTHONPATH=. python -m benchmarks.run --output before.json
+PYTHONPATH=. python -m benchmarks.compare before.json after.json
+"""
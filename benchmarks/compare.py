@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""compare two reports of `benchmarks.run`, exits with 1 if any case got slower
+than `--threshold` (relative) allows.
+
+PYTHONPATH=. python -m benchmarks.compare before.json after.json --threshold 0.1
+"""
+import sys
+import json
+import argparse
+from typing import Any, Dict
+
+from benchmarks.run import REPORT_VERSION
+
+
+def load_report(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        report = json.load(f)
+
+    if report.get("version") != REPORT_VERSION:
+        raise ValueError(f"unsupported report version: {report.get('version')!r}")
+
+    return report
+
+
+def main(base, head, threshold):
+    base, head = load_report(base), load_report(head)
+    if base["params"] != head["params"]:
+        print(
+            f"warning: params differ: {base['params']} vs {head['params']}",
+            file=sys.stderr,
+        )
+    if base["system"] != head["system"]:
+        print("warning: reports are from different systems", file=sys.stderr)
+
+    print(f"base: {base['commit']}{' (dirty)' if base['dirty'] else ''}")
+    print(f"head: {head['commit']}{' (dirty)' if head['dirty'] else ''}")
+    print(
+        f"{'case':28}{'time (s)':>20}{'ratio':>8}"
+        f"{'rss delta (MB)':>20}{'ratio':>8}"
+    )
+    regressions = []
+    for name, result in head["results"].items():
+        base_result = base["results"].get(name)
+        if base_result is None:
+            print(f"{name:28}{'':>8} -> {result['time']:8.3f}")
+            continue
+
+        time_ratio = result["time"] / base_result["time"]
+        rss_ratio = (result["rss_delta"] + 1) / (base_result["rss_delta"] + 1)
+        print(
+            f"{name:28}{base_result['time']:8.3f} -> {result['time']:8.3f}"
+            f"{time_ratio:8.2f}"
+            f"{base_result['rss_delta'] / 1024**2:8.1f} -> "
+            f"{result['rss_delta'] / 1024**2:8.1f}{rss_ratio:8.2f}"
+        )
+        if time_ratio > 1 + threshold:
+            regressions.append(name)
+
+    if regressions:
+        print(f"slower by more than {threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("base", type=str, help="report of the base commit")
+    parser.add_argument("head", type=str, help="report to compare against base")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+    main(**vars(args))
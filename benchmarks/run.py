@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""time the update and export pipeline on synthetic data (see `synthetic`),
+report time and peak RSS of every case as json. compare reports of two commits
+with `benchmarks.compare`.
+
+every case runs in a fresh process. its input is prepared before each run and
+not timed, `time` is the best of `--repeat` runs. `peak_rss` is the high water
+mark of the process during a run, `rss_delta` is how far it went above the RSS
+before the run. the high water mark can only be reset on linux, elsewhere it
+includes preparing the input.
+
+PYTHONPATH=. python -m benchmarks.run --output before.json
+PYTHONPATH=. python -m benchmarks.run --cases compress from_file --repeat 5
+"""
+import gc
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+import psutil
+
+from ah.db import DBHelper
+from ah.models import (
+    AuctionsResponse,
+    CommoditiesResponse,
+    DBExtEnum,
+    DBTypeEnum,
+    DecodedAuctionsResponse,
+    ItemString,
+    MapItemStringMarketValueRecord,
+    MapItemStringMarketValueRecords,
+    MarketValueRecords,
+    Namespace,
+)
+from ah.storage import TextFile
+from ah.tsm_exporter import TSMExporter
+from ah.updater import Updater
+from benchmarks import synthetic
+from benchmarks.synthetic import TS_NOW
+
+# bump if fields of the report change
+REPORT_VERSION = 1
+NAMESPACE = Namespace.from_str("dynamic-us")
+
+# >>> CASES[name](temp, **params) -> (setup, run)
+# `setup()` prepares the input of a run, `run(input)` is timed
+CASES: Dict[str, Callable[..., Tuple[Callable[[], Any], Callable[[Any], Any]]]] = {}
+
+
+def case(*names: str):
+    def decorator(func):
+        for name in names:
+            CASES[name] = func
+
+        return func
+
+    return decorator
+
+
+@case("decode.pydantic", "decode.trusted")
+def bench_decode(temp, name, n_auctions, n_items, seed, **_):
+    payload = synthetic.auctions_response(n_auctions, n_items, seed)
+
+    def run(payload):
+        if name == "decode.trusted":
+            DecodedAuctionsResponse.decode_auctions(payload["auctions"])
+        else:
+            AuctionsResponse.model_validate(payload)
+
+    return lambda: payload, run
+
+
+@case("from_response.auctions", "from_response.commodities", "from_response.decoded")
+def bench_from_response(temp, name, n_auctions, n_commodities, n_items, seed, **_):
+    if name == "from_response.commodities":
+        payload = synthetic.commodities_response(n_commodities, n_items, seed)
+    else:
+        payload = synthetic.auctions_response(n_auctions, n_items, seed)
+
+    def setup():
+        # item strings are interned, start cold
+        ItemString._intern.cache_clear()
+        if name == "from_response.commodities":
+            return CommoditiesResponse.model_validate({**payload, "timestamp": TS_NOW})
+        elif name == "from_response.decoded":
+            return DecodedAuctionsResponse.decode_auctions(
+                payload["auctions"], timestamp=TS_NOW
+            )
+        else:
+            return AuctionsResponse.model_validate({**payload, "timestamp": TS_NOW})
+
+    return setup, MapItemStringMarketValueRecord.from_response
+
+
+@case("calc_market_value", "batch_calc_market_value")
+def bench_calc_market_value(temp, name, n_commodities, n_items, seed, **_):
+    # (price, quantity) groups of every item, sorted by price
+    map_id_groups = {}
+    payload = synthetic.commodities_response(n_commodities, n_items, seed)
+    for commodity in payload["auctions"]:
+        groups = map_id_groups.setdefault(commodity["item"]["id"], {})
+        price = commodity["unit_price"]
+        groups[price] = groups.get(price, 0) + commodity["quantity"]
+
+    items = [
+        (sum(groups.values()), sorted(groups.items()))
+        for groups in map_id_groups.values()
+    ]
+
+    if name == "batch_calc_market_value":
+        prices = np.array([p for _, groups in items for p, _ in groups])
+        quantities = np.array([q for _, groups in items for _, q in groups])
+        offsets = np.cumsum([0] + [len(groups) for _, groups in items])
+        return (
+            lambda: (prices, quantities, offsets),
+            lambda data: MapItemStringMarketValueRecord.batch_calc_market_value(*data),
+        )
+
+    def run(items):
+        for item_n, price_groups in items:
+            MapItemStringMarketValueRecord.calc_market_value(item_n, price_groups)
+
+    return lambda: items, run
+
+
+@case("get_ilvl", "get_ilvls")
+def bench_get_ilvl(temp, name, n_auctions, n_items, seed, **_):
+    # bonus lists and player levels of unique items, as `ItemString` sees them
+    items = {}
+    for auction in synthetic.auctions_response(n_auctions, n_items, seed)["auctions"]:
+        item = auction["item"]
+        if item.get("bonus_lists"):
+            items[item["id"]] = item
+
+    bonus_lists, plvls = [], []
+    for item in items.values():
+        bonus_lists.append(
+            [bid for bid in item["bonus_lists"] if bid in ItemString.MAP_BONUSES]
+        )
+        plvl = ItemString.DEFAULT_PLAYER_LVL
+        for modifier in item.get("modifiers") or ():
+            if modifier["type"] == ItemString.MOD_TYPE_PLAYER_LEVEL:
+                plvl = modifier["value"]
+
+        plvls.append(plvl)
+
+    def setup():
+        ItemString.get_ilvl_from_curve.cache_clear()
+        if name == "get_ilvl":
+            return list(zip(bonus_lists, plvls))
+
+        offsets = np.cumsum([0] + [len(bonus_list) for bonus_list in bonus_lists])
+        bonus_ids = np.array([bid for bonus_list in bonus_lists for bid in bonus_list])
+        return offsets, bonus_ids, np.array(plvls)
+
+    def run(data):
+        if name == "get_ilvl":
+            for bonus_list, plvl in data:
+                ItemString.get_ilvl(bonus_list, plvl)
+        else:
+            ItemString.get_ilvls(*data)
+
+    return setup, run
+
+
+@case("compress")
+def bench_compress(temp, name, n_items, n_days, seed, **_):
+    def setup():
+        return synthetic.market_value_records(n_items, n_days, seed=seed)
+
+    def run(records):
+        records.compress(TS_NOW, Updater.RECORDS_EXPIRES_IN)
+
+    return setup, run
+
+
+@case("save_increment.append", "save_increment.compact")
+def bench_save_increment(temp, name, n_auctions, n_items, n_days, seed, **_):
+    payload = synthetic.auctions_response(n_auctions, n_items, seed)
+    increment = MapItemStringMarketValueRecord.from_response(
+        AuctionsResponse.model_validate({**payload, "timestamp": TS_NOW})
+    )
+    records = synthetic.market_value_records(n_items, n_days, seed=seed)
+    updater = Updater(None, DBHelper(temp))
+    file = updater.db_helper.get_file(NAMESPACE, DBTypeEnum.AUCTIONS, crid=1)
+    ts_today = MarketValueRecords.get_compress_end_ts(TS_NOW)
+    if name == "save_increment.append":
+        ts_compressed = ts_today
+    else:
+        # yesterday's records are yet to be compressed
+        ts_compressed = ts_today - 24 * 60 * 60
+
+    def setup():
+        records.to_file(file)
+        return file
+
+    def run(file):
+        updater.save_increment(
+            file, increment, TS_NOW, ts_compressed=ts_compressed, is_tsc_local=True
+        )
+
+    return setup, run
+
+
+@case(
+    *(
+        f"{op}.{ext.value}"
+        for op in ("to_file", "from_file")
+        for ext in (DBExtEnum.GZ, DBExtEnum.ZST, DBExtEnum.BIN, DBExtEnum.MMAP)
+    )
+)
+def bench_file(temp, name, n_items, n_days, seed, **_):
+    op, ext = name.split(".")
+    records = synthetic.market_value_records(n_items, n_days, seed=seed)
+    db_helper = DBHelper(temp, db_ext=DBExtEnum(ext))
+    file = db_helper.get_file(NAMESPACE, DBTypeEnum.AUCTIONS, crid=1)
+    if op == "to_file":
+        return lambda: file, records.to_file
+
+    records.to_file(file)
+    del records
+    return lambda: file, MapItemStringMarketValueRecords.from_file
+
+
+@case("export_region")
+def bench_export_region(temp, name, n_items, n_days, n_realms, seed, **_):
+    db_path = os.path.join(temp, "db")
+    realms = synthetic.write_region(db_path, NAMESPACE, n_realms, n_items, n_days)
+    exporter = TSMExporter(DBHelper(db_path), TextFile(os.path.join(temp, "out")))
+
+    def setup():
+        exporter.export_file.remove()
+
+    def run(_):
+        exporter.export_region(NAMESPACE, realms)
+
+    return setup, run
+
+
+def reset_peak_rss() -> None:
+    # linux only, resets `VmHWM` in /proc/self/status to the current RSS
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def get_peak_rss() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    info = psutil.Process().memory_info()
+    if hasattr(info, "peak_wset"):
+        # windows
+        return info.peak_wset
+
+    import resource
+
+    # bytes on macos
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_case(name: str, repeat: int, params: Dict[str, Any]) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as temp:
+        setup, run = CASES[name](temp, name, **params)
+        times = []
+        peak_rss = rss_delta = 0
+        for _ in range(repeat):
+            data = setup()
+            gc.collect()
+            reset_peak_rss()
+            rss = psutil.Process().memory_info().rss
+            start = time.perf_counter()
+            run(data)
+            times.append(time.perf_counter() - start)
+            peak = get_peak_rss()
+            peak_rss = max(peak_rss, peak)
+            rss_delta = max(rss_delta, peak - rss)
+            del data
+
+    return {
+        "time": min(times),
+        "times": times,
+        "peak_rss": peak_rss,
+        "rss_delta": rss_delta,
+    }
+
+
+def get_commit() -> Dict[str, Any]:
+    def git(*args):
+        return subprocess.run(
+            ["git", *args], capture_output=True, text=True, check=True
+        ).stdout.strip()
+
+    try:
+        return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "-s"))}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def select_cases(patterns: List[str]) -> List[str]:
+    """cases named by `patterns`, or prefixed by one of them plus a dot"""
+    if not patterns:
+        return list(CASES)
+
+    names = [
+        name
+        for name in CASES
+        if any(name == p or name.startswith(p + ".") for p in patterns)
+    ]
+    unknown = [
+        p for p in patterns if not any(n == p or n.startswith(p + ".") for n in names)
+    ]
+    if unknown:
+        raise ValueError(f"unknown cases: {unknown}, see --list")
+
+    return names
+
+
+def main(cases, repeat, output, list_cases, **params):
+    if list_cases:
+        print("\n".join(CASES))
+        return
+
+    names = select_cases(cases)
+    report = {
+        "version": REPORT_VERSION,
+        **get_commit(),
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "system": {
+            "platform": platform.platform(),
+            "python_version": platform.python_version(),
+            "numpy_version": np.__version__,
+            "cpu_count": psutil.cpu_count(),
+            "memory_total": psutil.virtual_memory().total,
+        },
+        "params": {"repeat": repeat, **params},
+        "results": {},
+    }
+    print(
+        f"{'case':28}{'time (s)':>12}{'peak rss (MB)':>16}{'rss delta (MB)':>16}",
+        file=sys.stderr,
+    )
+    spawn = multiprocessing.get_context("spawn")
+    for name in names:
+        with ProcessPoolExecutor(1, mp_context=spawn) as executor:
+            result = executor.submit(run_case, name, repeat, params).result()
+
+        report["results"][name] = result
+        print(
+            f"{name:28}{result['time']:12.3f}{result['peak_rss'] / 1024**2:16.1f}"
+            f"{result['rss_delta'] / 1024**2:16.1f}",
+            file=sys.stderr,
+        )
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--cases",
+        nargs="*",
+        default=None,
+        help="cases to run, `from_file` for all `from_file.*`, default: all",
+    )
+    parser.add_argument("--list", dest="list_cases", action="store_true")
+    parser.add_argument("--output", type=str, default=None, help="default: stdout")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--n_auctions", type=int, default=200_000)
+    parser.add_argument("--n_commodities", type=int, default=200_000)
+    parser.add_argument("--n_items", type=int, default=20_000)
+    parser.add_argument("--n_days", type=int, default=60, help="days of history")
+    parser.add_argument("--n_realms", type=int, default=4, help="for export_region")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    main(**vars(args))
@@ -0,0 +1,281 @@
+"""synthetic api responses and db files for benchmarks, shaped after real ones:
+a few items make up most of the auctions, prices of an item spread above its
+own base price, a share of items are gear with bonuses and modifiers, or pets.
+
+everything is deterministic given the seed.
+"""
+import random
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+
+from ah.data import map_bonuses
+from ah.db import DBHelper
+from ah.defs import SECONDS_IN
+from ah.models import (
+    ConnectedRealm,
+    DBExtEnum,
+    DBTypeEnum,
+    FactionEnum,
+    GameVersionEnum,
+    ItemString,
+    ItemStringTypeEnum,
+    MapItemStringMarketValueRecords,
+    MarketValueRecords,
+    Meta,
+    Namespace,
+    TimeLeft,
+)
+
+# 13:00 UTC, so today already has some updates
+TS_NOW = 1_700_006_400 + 13 * SECONDS_IN.HOUR
+# bonus ids that `ItemString` knows of, spread over the whole table
+BONUS_IDS = sorted(map_bonuses)[:: max(1, len(map_bonuses) // 500)] or [
+    6652,
+    7756,
+    1472,
+    8851,
+    4795,
+]
+PLAYER_LEVELS = [60, 70, 80]
+TIME_LEFTS = [e.value for e in TimeLeft]
+# share of gear and pets among items, the rest are plain items
+P_GEAR = 0.3
+P_PET = 0.05
+
+
+def _popularity(np_rng: np.random.Generator, n_items: int, n: int) -> np.ndarray:
+    """`n` item indices in `range(n_items)`, first items are the most popular"""
+    weights = 1 / np.arange(1, n_items + 1) ** 0.8
+    return np_rng.choice(n_items, n, p=weights / weights.sum())
+
+
+def _base_prices(np_rng: np.random.Generator, n_items: int) -> np.ndarray:
+    return np.clip(np_rng.lognormal(10, 2, n_items), 100, 10**9).astype(np.int64)
+
+
+def _auction_items(rng: random.Random, n_items: int) -> List[Dict[str, Any]]:
+    items = []
+    for i in range(n_items):
+        roll = rng.random()
+        if roll < P_GEAR:
+            item = {
+                "id": 190_000 + i,
+                "context": rng.randint(1, 60),
+                "bonus_lists": rng.sample(BONUS_IDS, rng.randint(1, 4)),
+                "modifiers": [{"type": 9, "value": rng.choice(PLAYER_LEVELS)}],
+            }
+        elif roll < P_GEAR + P_PET:
+            item = {
+                "id": 82800,
+                "pet_breed_id": rng.randint(3, 12),
+                "pet_level": rng.choice([1, 25]),
+                "pet_quality_id": rng.randint(1, 3),
+                "pet_species_id": 100 + i,
+            }
+        else:
+            item = {"id": 10_000 + i, "context": 0}
+
+        items.append(item)
+
+    return items
+
+
+def auctions_response(n_auctions: int, n_items: int, seed: int = 0) -> Dict:
+    """payload of an auctions response, as returned by `BNAPI.get_auctions`"""
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+    items = _auction_items(rng, n_items)
+    base_prices = _base_prices(np_rng, n_items)
+    indices = _popularity(np_rng, n_items, n_auctions)
+    markups = 1 + np.abs(np_rng.normal(0, 0.3, n_auctions))
+    prices = (base_prices[indices] * markups).astype(np.int64) // 100 * 100 + 100
+    quantities = np_rng.choice([1, 1, 1, 1, 1, 5, 10, 20], n_auctions)
+    rolls = np_rng.random((n_auctions, 2))
+    auctions = []
+    for i, (index, price, quantity, (roll_buyout, roll_bid)) in enumerate(
+        zip(indices.tolist(), prices.tolist(), quantities.tolist(), rolls.tolist())
+    ):
+        auction = {
+            "id": i,
+            "item": dict(items[index]),
+            "quantity": quantity,
+            "time_left": rng.choice(TIME_LEFTS),
+        }
+        if roll_buyout < 0.9:
+            auction["buyout"] = price
+        if roll_bid < 0.2 or "buyout" not in auction:
+            auction["bid"] = price * 4 // 5
+
+        auctions.append(auction)
+
+    return {
+        "_links": {},
+        "connected_realm": {},
+        "commodities": {},
+        "auctions": auctions,
+    }
+
+
+def commodities_response(n_auctions: int, n_items: int, seed: int = 0) -> Dict:
+    """payload of a commodities response, as returned by
+    `BNAPI.get_commodities`
+    """
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+    base_prices = _base_prices(np_rng, n_items)
+    indices = _popularity(np_rng, n_items, n_auctions)
+    markups = 1 + np.abs(np_rng.normal(0, 0.2, n_auctions))
+    prices = (base_prices[indices] * markups).astype(np.int64) // 100 * 100 + 100
+    quantities = np.minimum(np_rng.geometric(0.02, n_auctions), 10_000)
+    auctions = [
+        {
+            "id": i,
+            "item": {"id": 200_000 + index},
+            "quantity": quantity,
+            "unit_price": price,
+            "time_left": rng.choice(TIME_LEFTS),
+        }
+        for i, (index, price, quantity) in enumerate(
+            zip(indices.tolist(), prices.tolist(), quantities.tolist())
+        )
+    ]
+    return {"_links": {}, "auctions": auctions}
+
+
+def connected_realm(region: str, crid: int, n_realms: int = 2) -> Dict:
+    """payload of a connected realm response"""
+    return {
+        "id": crid,
+        "realms": [
+            {
+                "id": crid * 10 + k,
+                "name": f"realm{crid * 10 + k}",
+                "slug": f"realm{crid * 10 + k}",
+                "timezone": "America/New_York",
+                "locale": "en_US",
+                "region": region,
+                "connected_realm": {},
+                "category": "",
+                "type": "",
+                "is_tournament": False,
+            }
+            for k in range(1, n_realms + 1)
+        ],
+    }
+
+
+def _item_string(rng: random.Random, i: int, commodity: bool) -> ItemString:
+    if commodity:
+        return ItemString(
+            type=ItemStringTypeEnum.ITEM, id=200_000 + i, bonuses=None, mods=None
+        )
+
+    roll = rng.random()
+    if roll < P_GEAR:
+        return ItemString(
+            type=ItemStringTypeEnum.ITEM,
+            id=190_000 + i,
+            bonuses=tuple(sorted(rng.sample(BONUS_IDS, rng.randint(1, 4)))),
+            mods=(9, rng.choice(PLAYER_LEVELS)),
+        )
+    elif roll < P_GEAR + P_PET:
+        return ItemString(
+            type=ItemStringTypeEnum.PET, id=100 + i, bonuses=None, mods=None
+        )
+    else:
+        return ItemString(
+            type=ItemStringTypeEnum.ITEM, id=10_000 + i, bonuses=None, mods=None
+        )
+
+
+def market_value_records(
+    n_items: int,
+    n_days: int,
+    ts_now: int = TS_NOW,
+    updates_per_day: int = 24,
+    n_recent_days: int = 2,
+    seed: int = 0,
+    commodity: bool = False,
+) -> MapItemStringMarketValueRecords:
+    """db of `n_days` of history up to `ts_now`, as kept by the updater.
+
+    the last `n_recent_days` days (today included) have a record per update,
+    days before them are compressed to one record per day. items are listed in
+    a random share of updates each.
+    """
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+    today = ts_now - ts_now % SECONDS_IN.DAY
+    interval = SECONDS_IN.DAY // updates_per_day
+    ts_daily = today - SECONDS_IN.DAY * np.arange(n_days - 1, n_recent_days - 1, -1)
+    ts_daily += SECONDS_IN.DAY // 2
+    ts_updates = today - SECONDS_IN.DAY * (n_recent_days - 1)
+    ts_updates += np.arange(0, ts_now - ts_updates, interval) + 60
+    timestamps = np.concatenate([ts_daily, ts_updates])
+    base_prices = _base_prices(np_rng, n_items)
+    records = MapItemStringMarketValueRecords()
+    for i in range(n_items):
+        mask = np_rng.random(len(timestamps)) < np_rng.uniform(0.2, 1)
+        n = int(mask.sum())
+        if not n:
+            continue
+
+        market_value = base_prices[i] * (1 + np_rng.normal(0, 0.1, n))
+        market_value = np.maximum(market_value, 1).astype(np.int64)
+        records[_item_string(rng, i, commodity)] = MarketValueRecords.from_columns(
+            timestamp=timestamps[mask],
+            market_value=market_value,
+            num_auctions=np_rng.integers(1, 200, n),
+            min_buyout=market_value - market_value * np_rng.integers(0, 20, n) // 100,
+        )
+
+    return records
+
+
+def write_region(
+    data_path: str,
+    namespace: Namespace,
+    n_realms: int,
+    n_items: int,
+    n_days: int,
+    ts_now: int = TS_NOW,
+    seed: int = 0,
+    db_ext: Optional[DBExtEnum] = None,
+) -> Set[str]:
+    """write meta and db files of `n_realms` connected realms (and commodities
+    for retail) under `data_path` as left by an update at `ts_now`: compressed
+    up to today. returns names of all realms.
+    """
+    db_helper = DBHelper(data_path, db_ext=db_ext)
+    meta = Meta()
+    meta.set_update_ts(ts_now - 600, ts_now)
+    if namespace.game_version == GameVersionEnum.RETAIL:
+        factions = [None]
+    else:
+        factions = [FactionEnum.ALLIANCE, FactionEnum.HORDE]
+
+    for crid in range(1, n_realms + 1):
+        resp = connected_realm(namespace.region, crid)
+        meta.add_connected_realm(crid, ConnectedRealm.model_validate(resp))
+        for i, faction in enumerate(factions):
+            records = market_value_records(
+                n_items,
+                n_days,
+                ts_now=ts_now,
+                n_recent_days=1,
+                seed=seed + crid * 2 + i,
+            )
+            file = db_helper.get_file(
+                namespace, DBTypeEnum.AUCTIONS, crid=crid, faction=faction
+            )
+            records.to_file(file)
+
+    if namespace.game_version == GameVersionEnum.RETAIL:
+        records = market_value_records(
+            n_items, n_days, ts_now=ts_now, n_recent_days=1, seed=seed, commodity=True
+        )
+        records.to_file(db_helper.get_file(namespace, DBTypeEnum.COMMODITIES))
+
+    meta.to_file(db_helper.get_file(namespace, DBTypeEnum.META))
+    return set(meta.get_connected_realm_names())
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""compare size and throughput of db file codecs on synthetic dbs (see
+`benchmarks.synthetic`), or on existing db files. optionally trains a zstd
+dictionary on the files and saves it for `--zstd_dict`.
+
+PYTHONPATH=. python bin/bench_codecs.py --n_items 20000 --n_days 60
+PYTHONPATH=. python bin/bench_codecs.py --files db/dynamic-us_auctions_*.gz \
+    --save_dict zstd.dict
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import zstandard
+
+from ah.models import MapItemStringMarketValueRecords
+from ah.storage import BinaryFile, GzipCodec, ZstdCodec
+from benchmarks import synthetic
+
+
+def load_db(file_path: str) -> bytes:
+    file = BinaryFile(file_path, use_compression=file_path.endswith(".gz"))
+    with file.open("rb") as f:
+        return f.read()
+
+
+def timeit(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def bench(codec, samples, temp: str, repeat: int):
+    paths = [os.path.join(temp, str(i)) for i in range(len(samples))]
+
+    def compress():
+        for path, data in zip(paths, samples):
+            with BinaryFile(path, codec=codec).open("wb") as f:
+                f.write(data)
+
+    def decompress():
+        for path in paths:
+            with BinaryFile(path, codec=codec).open("rb") as f:
+                f.read()
+
+    t_compress = timeit(compress, repeat)
+    t_decompress = timeit(decompress, repeat)
+    size = sum(os.path.getsize(path) for path in paths)
+    return size, t_compress, t_decompress
+
+
+def main(files, n_items, n_days, n_dbs, repeat, dict_size, save_dict):
+    if files:
+        samples = [load_db(path) for path in files]
+    else:
+        print(f"generating {n_dbs} dbs of {n_items} items...", file=sys.stderr)
+        samples = []
+        for seed in range(n_dbs):
+            db = synthetic.market_value_records(n_items, n_days, seed=seed)
+            samples.append(db.to_protobuf_bytes())
+
+    # dictionary is trained on item entries, db files themselves are too few
+    entries = []
+    for data in samples:
+        db = MapItemStringMarketValueRecords.from_protobuf_bytes(data)
+        entries.extend(item.SerializeToString() for item in db.to_protobuf().items)
+
+    dict_data = zstandard.train_dictionary(dict_size, entries).as_bytes()
+    if save_dict:
+        with open(save_dict, "wb") as f:
+            f.write(dict_data)
+
+    codecs = {
+        "raw": None,
+        "gzip-1": GzipCodec(level=1),
+        "gzip-6": GzipCodec(level=6),
+        "gzip-9": GzipCodec(level=9),
+        "zstd-1": ZstdCodec(level=1),
+        "zstd-3": ZstdCodec(level=3),
+        "zstd-3-mt": ZstdCodec(level=3, threads=-1),
+        "zstd-3-dict": ZstdCodec(level=3, dict_data=dict_data),
+        "zstd-9": ZstdCodec(level=9),
+        "zstd-9-mt": ZstdCodec(level=9, threads=-1),
+        "zstd-19-mt": ZstdCodec(level=19, threads=-1),
+    }
+    raw_size = sum(map(len, samples))
+    print(
+        f"{'codec':14}{'size (MB)':>12}{'ratio':>8}"
+        f"{'compress (MB/s)':>18}{'decompress (MB/s)':>20}"
+    )
+    for name, codec in codecs.items():
+        with tempfile.TemporaryDirectory() as temp:
+            size, t_compress, t_decompress = bench(codec, samples, temp, repeat)
+
+        mb = raw_size / 1024**2
+        print(
+            f"{name:14}{size / 1024**2:12.2f}{raw_size / size:8.2f}"
+            f"{mb / t_compress:18.1f}{mb / t_decompress:20.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", nargs="*", help="db files, synthetic if omitted")
+    parser.add_argument("--n_items", type=int, default=20_000)
+    parser.add_argument("--n_days", type=int, default=60, help="days of history")
+    parser.add_argument("--n_dbs", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--dict_size", type=int, default=112 * 1024)
+    parser.add_argument("--save_dict", type=str, default=None)
+    args = parser.parse_args()
+    main(**vars(args))
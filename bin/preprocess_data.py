@@ -5,6 +5,8 @@ import json
 import argparse
 from typing import Dict
 
+from ah.data import BonusTable
+
 
 class DataPreprocessor:
     FIELDS_TO_KEEP_BONUSES = {"level", "base_level", "curveId"}
@@ -49,15 +51,20 @@ class DataPreprocessor:
         return new_bonuses
 
     @classmethod
-    def run(cls, data_path: str, output_path: str):
+    def run(cls, data_path: str, output_path: str, binary_output_path: str = None):
         data_bonuses = cls.load_json(os.path.join(data_path, "bonuses.json"))
         data_curves = cls.load_json(os.path.join(data_path, "item-curves.json"))
         bonuses = cls.join_bonuses_and_curves(data_bonuses, data_curves)
         cls.dump_json(output_path, bonuses)
+        if binary_output_path:
+            # same table, memory-mapped by `ah.data` instead of parsing the json
+            BonusTable.from_dict(bonuses).to_binary(binary_output_path)
 
 
-def main(data_path: str = None, output_path: str = None):
-    DataPreprocessor.run(data_path, output_path)
+def main(
+    data_path: str = None, output_path: str = None, binary_output_path: str = None
+):
+    DataPreprocessor.run(data_path, output_path, binary_output_path)
 
 
 def parse_args(raw_args):
@@ -69,6 +76,12 @@ def parse_args(raw_args):
         default="./ah/data/bonuses_curves.json",
         type=str,
     )
+    parser.add_argument(
+        "--binary_output_path",
+        help="Path to binary output, empty to skip",
+        default="./ah/data/bonuses_curves.bin",
+        type=str,
+    )
     args = parser.parse_args(raw_args)
     return args
 
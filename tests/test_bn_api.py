@@ -0,0 +1,288 @@
+from unittest import TestCase
+from unittest.mock import Mock
+from tempfile import TemporaryDirectory
+import asyncio
+import json
+
+import requests
+from aiohttp import web
+
+from ah.cache import Cache
+from ah.api import BNAPI
+from ah.models import Namespace
+from ah.errors import NotModifiedError
+from ah.throttle import TokenBucket
+from ah.vendors.blizzardapi import AsyncWowGameDataApi
+
+
+class MockResponse(Mock):
+    def __init__(self, content=None, status_code=200, headers=None, **kwargs):
+        super().__init__(**kwargs)
+        self.content = content
+        self.status_code = status_code
+        self.headers = requests.structures.CaseInsensitiveDict(headers or {})
+
+    def json(self):
+        return self.content
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size=None):
+        yield from self.content
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class MockServer:
+    """Blizzard API stand-in for `AsyncWowGameDataApi`"""
+
+    def __init__(self) -> None:
+        self.n_tokens = 0
+        self.expired_tokens = set()
+        self.n_requests = {}
+        self.app = web.Application()
+        self.app.router.add_post("/oauth/token", self.token)
+        self.app.router.add_get(
+            "/{region}/data/wow/connected-realm/{crid}/auctions", self.auctions
+        )
+
+    async def token(self, request: web.Request) -> web.Response:
+        self.n_tokens += 1
+        return web.json_response({"access_token": f"token{self.n_tokens}"})
+
+    async def auctions(self, request: web.Request) -> web.Response:
+        crid = int(request.match_info["crid"])
+        n = self.n_requests[crid] = self.n_requests.get(crid, 0) + 1
+        if request.query["access_token"] in self.expired_tokens:
+            return web.Response(status=401)
+
+        # crid 1: flaky, crid 2: always throttled, crid 3: not found
+        if crid == 1 and n <= 2:
+            return web.Response(status=503)
+        if crid == 2:
+            return web.Response(status=429)
+        if crid == 3:
+            return web.Response(status=404)
+
+        etag = f'"{crid}"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304)
+
+        await asyncio.sleep(0.01)
+        return web.json_response(
+            {"auctions": [], "crid": crid}, headers={"ETag": etag}
+        )
+
+    async def __aenter__(self) -> str:
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = self.runner.addresses[0][:2]
+        return f"http://{host}:{port}"
+
+    async def __aexit__(self, *args) -> None:
+        await self.runner.cleanup()
+
+    @classmethod
+    def patch_api(cls, api: AsyncWowGameDataApi, url: str) -> None:
+        api._api_url = url + "/{0}{1}"
+        api._oauth_url = url + "/oauth{0}"
+        api.backoff_factor = 0
+
+
+class TestAsyncApi(TestCase):
+    def test_async_api(self):
+        server = MockServer()
+        api = AsyncWowGameDataApi("id", "secret", max_retries=3)
+
+        async def run():
+            async with server as url, api:
+                MockServer.patch_api(api, url)
+                crids = [1] + list(range(4, 100))
+                resps = await asyncio.gather(
+                    *(
+                        api.get_auctions("us", "en_US", "dynamic-us", crid)
+                        for crid in crids
+                    )
+                )
+                self.assertListEqual([resp["crid"] for resp in resps], crids)
+                # token shared by concurrent requests
+                self.assertEqual(server.n_tokens, 1)
+                # retried on 5xx
+                self.assertEqual(server.n_requests[1], 3)
+
+                with self.assertRaises(requests.exceptions.RetryError):
+                    await api.get_auctions("us", "en_US", "dynamic-us", 2)
+                self.assertEqual(server.n_requests[2], 4)
+
+                with self.assertRaises(requests.exceptions.HTTPError):
+                    await api.get_auctions("us", "en_US", "dynamic-us", 3)
+                self.assertEqual(server.n_requests[3], 1)
+
+                # renewed once expired
+                server.expired_tokens.add("token1")
+                resp = await api.get_auctions("us", "en_US", "dynamic-us", 4)
+                self.assertEqual(resp["crid"], 4)
+                self.assertEqual(server.n_tokens, 2)
+
+                # tokens are per region
+                await api.get_auctions("eu", "en_US", "dynamic-eu", 4)
+                self.assertEqual(server.n_tokens, 3)
+
+        asyncio.run(run())
+        # sessions are per loop, tokens outlive them
+        self.assertIsNone(api._session)
+        self.assertEqual(len(api._access_tokens), 2)
+
+    def test_bn_api_async(self):
+        server = MockServer()
+        namespace = Namespace.from_str("dynamic-us")
+        with TemporaryDirectory() as tmp_dir:
+            bn_api = BNAPI(
+                "id",
+                "secret",
+                Cache(tmp_dir),
+                rate_limiter=TokenBucket(1000, capacity=1000),
+                conditional=True,
+            )
+
+            async def run():
+                async with server as url:
+                    MockServer.patch_api(bn_api._async_api, url)
+                    resp = await bn_api.async_get_auctions(namespace, 4)
+                    self.assertEqual(resp["crid"], 4)
+                    bn_api.commit_validators(namespace, 4)
+                    with self.assertRaises(NotModifiedError):
+                        await bn_api.async_get_auctions(namespace, 4)
+
+                    # cached by time, shared with `get_auctions`
+                    bn_api.conditional = False
+                    resp = await bn_api.async_get_auctions(namespace, 5)
+                    self.assertEqual(
+                        await bn_api.async_get_auctions(namespace, 5), resp
+                    )
+                    self.assertEqual(bn_api.get_auctions(namespace, 5), resp)
+                    self.assertEqual(server.n_requests[5], 1)
+                    await bn_api.async_close()
+
+            asyncio.run(run())
+
+
+class TestBNAPI(TestCase):
+    VALIDATORS = {"ETag": '"abc"', "Last-Modified": "Wed, 01 May 2024 00:00:00 GMT"}
+
+    def get_bn_api(self, tmp_dir: str, responses, conditional=True) -> BNAPI:
+        bn_api = BNAPI(
+            "id",
+            "secret",
+            Cache(tmp_dir),
+            rate_limiter=TokenBucket(1000, capacity=1000),
+            conditional=conditional,
+        )
+        game_data = bn_api._api.wow.game_data
+        game_data._access_token = "token"
+        game_data._session = Mock()
+        game_data._session.get.side_effect = responses
+        return bn_api
+
+    def test_conditional(self):
+        namespace = Namespace.from_str("dynamic-us")
+        with TemporaryDirectory() as tmp_dir:
+            body = {"auctions": []}
+            bn_api = self.get_bn_api(
+                tmp_dir,
+                [
+                    MockResponse(body, headers=self.VALIDATORS),
+                    MockResponse(body, headers=self.VALIDATORS),
+                    MockResponse(status_code=304),
+                    MockResponse(body, headers={"ETag": '"def"'}),
+                    MockResponse(body),
+                ],
+            )
+            get = bn_api._api.wow.game_data._session.get
+            # first request has nothing to validate against
+            self.assertEqual(bn_api.get_auctions(namespace, 1), body)
+            self.assertEqual(get.call_args.kwargs["headers"], {})
+
+            # validators are not used until committed
+            self.assertEqual(bn_api.get_auctions(namespace, 1), body)
+            self.assertEqual(get.call_args.kwargs["headers"], {})
+            self.assertIsNone(bn_api.get_validators_state(namespace, 1))
+            bn_api.commit_validators(namespace, 1, state=b"state")
+            self.assertEqual(bn_api.get_validators_state(namespace, 1), b"state")
+
+            self.assertRaises(NotModifiedError, bn_api.get_auctions, namespace, 1)
+            self.assertEqual(
+                get.call_args.kwargs["headers"],
+                {
+                    "If-None-Match": '"abc"',
+                    "If-Modified-Since": "Wed, 01 May 2024 00:00:00 GMT",
+                },
+            )
+
+            # validators of other resources are kept apart
+            self.assertEqual(bn_api.get_auctions(namespace, 2), body)
+            self.assertEqual(get.call_args.kwargs["headers"], {})
+
+            # not cached by time
+            self.assertEqual(bn_api.get_auctions(namespace, 1), body)
+            self.assertEqual(get.call_count, 5)
+
+            bn_api.drop_validators(namespace, 1)
+            self.assertIsNone(bn_api.get_validators_state(namespace, 1))
+
+    def test_conditional_stream(self):
+        namespace = Namespace.from_str("dynamic-us")
+        with TemporaryDirectory() as tmp_dir:
+            chunks = [b'{"auctions": ', b"[]}"]
+            bn_api = self.get_bn_api(
+                tmp_dir,
+                [
+                    MockResponse(chunks, headers=self.VALIDATORS),
+                    MockResponse(chunks, headers=self.VALIDATORS),
+                    MockResponse(status_code=304),
+                ],
+            )
+            get = bn_api._api.wow.game_data._session.get
+            # body not fully received, validators can't be committed
+            next(bn_api.stream_commodities(namespace))
+            bn_api.commit_validators(namespace)
+            self.assertListEqual(list(bn_api.stream_commodities(namespace)), chunks)
+            self.assertEqual(get.call_args.kwargs["headers"], {})
+            bn_api.commit_validators(namespace)
+
+            self.assertRaises(NotModifiedError, bn_api.stream_commodities, namespace)
+            self.assertEqual(get.call_args.kwargs["headers"]["If-None-Match"], '"abc"')
+
+    def test_body_cache(self):
+        namespace = Namespace.from_str("dynamic-us")
+        auctions = [{"id": i, "item": {"id": 1}, "quantity": 1} for i in range(5000)]
+        body = json.dumps({"auctions": auctions}).encode()
+        chunks = [body[i : i + 1000] for i in range(0, len(body), 1000)]
+        with TemporaryDirectory() as tmp_dir:
+            bn_api = self.get_bn_api(
+                tmp_dir,
+                [MockResponse(chunks), MockResponse(chunks)],
+                conditional=False,
+            )
+            get = bn_api._api.wow.game_data._session.get
+            # not cached until fully received
+            next(bn_api.stream_auctions(namespace, 1))
+            self.assertEqual(b"".join(bn_api.stream_auctions(namespace, 1)), body)
+            self.assertEqual(get.call_count, 2)
+
+            # hits are parsed from the cached body, streamed or not
+            self.assertEqual(b"".join(bn_api.stream_auctions(namespace, 1)), body)
+            self.assertEqual(bn_api.get_auctions(namespace, 1), {"auctions": auctions})
+            self.assertEqual(get.call_count, 2)
+
+            # kept compressed
+            key = bn_api._get_auctions_key(namespace, 1, None)
+            self.assertLess(len(bn_api._cache.get(key)), len(body) / 5)
+            bn_api._cache.close()
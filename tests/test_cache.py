@@ -1,5 +1,8 @@
 from unittest import TestCase, mock
+from concurrent.futures import ThreadPoolExecutor
 import tempfile
+import asyncio
+import time
 import os
 
 from ah.cache import Cache, bound_cache, BoundCacheMixin
@@ -16,18 +19,23 @@ class Foo(BoundCacheMixin):
         self.count += 1
         return self.count
 
+    @bound_cache(expires=10, fname="foo")
+    async def async_foo(self):
+        return Foo.foo.__wrapped__(self)
+
 
 class TestCache(TestCase):
     def test_cache(self):
         with tempfile.TemporaryDirectory() as tmpdir:
             cache = Cache(tmpdir)
-            cache.set("key", "value")
-            self.assertEqual(cache.get("key"), "value")
-            self.assertEqual(cache.get("key", expires=-1), "value")
+            with mock.patch("time.time", return_value=100):
+                cache.set("key", "value")
+                self.assertEqual(cache.get("key"), "value")
+                self.assertEqual(cache.get("key", expires=-1), "value")
+                self.assertEqual(cache.get("missing"), None)
+                self.assertEqual(cache.get("missing", default=...), ...)
 
-            with mock.patch("os.path.getmtime", return_value=100), mock.patch(
-                "time.time", return_value=110
-            ):
+            with mock.patch("time.time", return_value=110):
                 self.assertEqual(cache.get("key", expires=11), "value")
                 self.assertEqual(cache.get("key", expires=10), "value")
                 # expired cache is removed automatically
@@ -37,60 +45,216 @@ class TestCache(TestCase):
                 self.assertEqual(cache.get("key", default=..., expires=10), ...)
 
             cache.purge()
+            # reopened on next use
+            cache.set("key", "value")
+            self.assertEqual(cache.get("key"), "value")
+            cache.close()
+
+            # persisted in a single file
+            self.assertEqual(os.listdir(tmpdir), [Cache.DB_FILE_NAME])
+            cache = Cache(tmpdir)
+            self.assertEqual(cache.get("key"), "value")
+            cache.close()
+
+    def test_compress(self):
+        value = {"auctions": [{"id": i, "quantity": 1} for i in range(1000)]}
+        sizes = {}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for compress in (False, True):
+                cache = Cache(os.path.join(tmpdir, str(compress)), compress=compress)
+                cache.set("key", value)
+                cache.set("small", "value")
+                self.assertEqual(cache.get("key"), value)
+                self.assertEqual(cache.get("small"), "value")
+                (sizes[compress],) = cache._connect().execute(
+                    "SELECT SUM(size) FROM entries"
+                ).fetchone()
+                cache.close()
+
+            # readable regardless of `compress`
+            cache = Cache(os.path.join(tmpdir, "True"), compress=False)
+            self.assertEqual(cache.get("key"), value)
+            cache.close()
+
+        self.assertLess(sizes[True], sizes[False] / 2)
+
+    def test_evict(self):
+        value = os.urandom(1000)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = Cache(tmpdir, max_size=3500)
+            for i, key in enumerate("abc"):
+                with mock.patch("time.time", return_value=100 + i):
+                    cache.set(key, value)
+
+            # "a" used recently, "b" is the least recently used
+            with mock.patch("time.time", return_value=200):
+                self.assertEqual(cache.get("a"), value)
+
+            with mock.patch("time.time", return_value=201):
+                cache.set("d", value)
+
+            self.assertEqual(cache.get("b"), None)
+            for key in "acd":
+                self.assertEqual(cache.get(key), value)
+
+            # larger than the cache, evicts everything
+            cache.set("e", os.urandom(4000))
+            for key in "acde":
+                self.assertEqual(cache.get(key), None)
+
+            cache.close()
+
+    def test_memory(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = Cache(tmpdir, memory_entries=2)
+            for key in "abc":
+                cache.set(key, [key])
+
+            self.assertEqual(cache.lookup("a"), (["a"], "disk"))
+            self.assertEqual(cache.lookup("a"), (["a"], "memory"))
+            self.assertEqual(cache.lookup("c"), (["c"], "memory"))
+            # "b" is the least recently used
+            self.assertEqual(cache.lookup("b"), (["b"], "disk"))
+            self.assertIs(cache.get("b"), cache.get("b"))
+            self.assertEqual(cache.lookup("missing"), (None, None))
+
+            # expires the same as on disk
+            with mock.patch("time.time", return_value=time.time() + 11):
+                self.assertEqual(cache.lookup("b", expires=10), (None, None))
+
+            cache.close()
+            self.assertEqual(cache.lookup("c"), (["c"], "disk"))
+
+            # bounded by size too
+            cache = Cache(tmpdir, memory_size=1500)
+            value = os.urandom(1000)
+            cache.set("a", value)
+            cache.set("b", value)
+            self.assertEqual(cache.lookup("a"), (value, "disk"))
+            self.assertEqual(cache.lookup("a"), (value, "memory"))
+            self.assertEqual(cache.lookup("b"), (value, "disk"))
+            cache.close()
+
+    def test_stats(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = Cache(tmpdir)
+            foo = Foo(cache)
+            for _ in range(3):
+                self.assertEqual(foo.foo(), 1)
+
+            # fresh memory
+            cache_2 = Cache(tmpdir)
+            self.assertEqual(Foo(cache_2).foo(), 1)
+            self.assertEqual(asyncio.run(Foo(cache_2).async_foo()), 1)
+
+            stats = cache.get_stats()["foo"]
+            self.assertEqual(
+                (stats.misses, stats.memory_hits, stats.disk_hits), (1, 2, 0)
+            )
+            self.assertAlmostEqual(stats.hit_rate, 2 / 3)
+            self.assertGreater(stats.miss_time, 0)
+            self.assertGreater(stats.avg_hit_time, 0)
+
+            stats_2 = cache_2.get_stats()
+            self.assertListEqual(sorted(stats_2), ["async_foo", "foo"])
+            self.assertEqual(stats_2["foo"].disk_hits, 1)
+            self.assertEqual(stats_2["async_foo"].memory_hits, 1)
+            # snapshot
+            stats_2["foo"].misses += 1
+            self.assertEqual(cache_2.get_stats()["foo"].misses, 0)
+            cache.close()
+            cache_2.close()
+
+    def test_threads(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = Cache(tmpdir)
+
+            def set_get(i):
+                cache.set(i, [i] * 1000)
+                return cache.get(i)
+
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                values = list(executor.map(set_get, range(100)))
+
+            self.assertListEqual(values, [[i] * 1000 for i in range(100)])
+            cache.close()
 
     def test_bound_cache(self):
         with tempfile.TemporaryDirectory() as tmpdir:
             cache = Cache(tmpdir)
             foo = Foo(cache)
-            self.assertEqual(foo.foo(), 1)
-            self.assertEqual(foo.foo(), 1)
+            with mock.patch("time.time", return_value=100):
+                self.assertEqual(foo.foo(), 1)
+                self.assertEqual(foo.foo(), 1)
 
-            with mock.patch("os.path.getmtime", return_value=100), mock.patch(
-                "time.time", return_value=110
-            ):
+            with mock.patch("time.time", return_value=110):
                 self.assertEqual(foo.foo(), 1)
                 self.assertEqual(foo.foo(), 1)
 
-            with mock.patch("os.path.getmtime", return_value=100), mock.patch(
-                "time.time", return_value=111
-            ):
+            with mock.patch("time.time", return_value=111):
+                self.assertEqual(foo.foo(), 2)
+                self.assertEqual(foo.foo(), 2)
+
+            with mock.patch("time.time", return_value=121):
                 self.assertEqual(foo.foo(), 2)
-                self.assertEqual(foo.foo(), 3)
 
-            with mock.patch("os.path.getmtime", return_value=100), mock.patch(
-                "time.time", return_value=110
-            ):
+            with mock.patch("time.time", return_value=122):
                 self.assertEqual(foo.foo(), 3)
                 self.assertEqual(foo.foo(), 3)
 
             cache.purge()
 
+    def test_bound_cache_async(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = Cache(tmpdir)
+            foo = Foo(cache)
+            with mock.patch("time.time", return_value=100):
+                self.assertEqual(asyncio.run(foo.async_foo()), 1)
+                self.assertEqual(asyncio.run(foo.async_foo()), 1)
+                # shares cache with `foo`
+                self.assertEqual(foo.foo(), 1)
+
+            with mock.patch("time.time", return_value=111):
+                self.assertEqual(asyncio.run(foo.async_foo()), 2)
+                self.assertEqual(foo.foo(), 2)
+
+            cache.close()
+
     def test_remove_expired(self):
-        files = {
+        ts_sets = {
             "a": 100,
             "b": 200,
             "c": 300,
         }
         with tempfile.TemporaryDirectory() as tmpdir:
             cache = Cache(tmpdir)
-            for key, mtime in files.items():
-                path = cache._get_path(key)
-                with open(path, "w") as file:
-                    file.write(key)
-                os.utime(path, (mtime, mtime))
+            for key, ts_set in ts_sets.items():
+                with mock.patch("time.time", return_value=ts_set):
+                    cache.set(key, key)
+
+            # left by the old file based cache
+            legacy_file = os.path.join(tmpdir, Cache._get_key_str("a"))
+            with open(legacy_file, "wb") as file:
+                file.write(b"")
+
+            def keys():
+                return {key for key in ts_sets if cache.get(key) is not None}
 
             with mock.patch("time.time", return_value=400):
                 cache.remove_expired(expires_in=300)
-                self.assertEqual(set(os.listdir(tmpdir)), {"a", "b", "c"})
+                self.assertEqual(keys(), {"a", "b", "c"})
+                self.assertFalse(os.path.exists(legacy_file))
 
             with mock.patch("time.time", return_value=400):
                 cache.remove_expired(expires_in=299)
-                self.assertEqual(set(os.listdir(tmpdir)), {"b", "c"})
+                self.assertEqual(keys(), {"b", "c"})
 
             with mock.patch("time.time", return_value=400):
                 cache.remove_expired(expires_in=100)
-                self.assertEqual(os.listdir(tmpdir), ["c"])
+                self.assertEqual(keys(), {"c"})
 
             with mock.patch("time.time", return_value=400):
                 cache.remove_expired(expires_in=99)
-                self.assertEqual(os.listdir(tmpdir), [])
+                self.assertEqual(keys(), set())
+
+            cache.close()
@@ -3,10 +3,16 @@ from typing import Optional
 import tempfile
 import json
 import gzip
+import os
+
+import zstandard
 
 from ah.errors import DownloadError
 from ah.db import DBHelper, GithubFileForker
+from ah.defs import SECONDS_IN
+from ah.storage import BinaryFile, MappedFile, GzipCodec, ZstdCodec
 from ah.updater import Updater
+from ah.protobuf.item_db_pb2 import ItemDB
 from ah.models import (
     MapItemStringMarketValueRecord,
     MapItemStringMarketValueRecords,
@@ -20,6 +26,7 @@ from ah.models import (
     DBFileName,
     DBExtEnum,
     FactionEnum,
+    RealmCategoryEnum,
     Meta,
 )
 
@@ -383,6 +390,233 @@ class TestAuctionDB(TestCase):
         pick_map = MapItemStringMarketValueRecords.from_file(pick_file, forker=forker)
         self.assertEqual(len(pick_map), 1)
 
+    def test_db_ext(self):
+        namespace = Namespace.from_str("dynamic-us")
+        for db_ext, file_cls, codec_cls in (
+            (None, BinaryFile, GzipCodec),
+            (DBExtEnum.GZ, BinaryFile, GzipCodec),
+            (DBExtEnum.ZST, BinaryFile, ZstdCodec),
+            (DBExtEnum.BIN, BinaryFile, type(None)),
+            (DBExtEnum.MMAP, MappedFile, type(None)),
+        ):
+            db_helper = DBHelper(self.tmp_dir.name, db_ext=db_ext)
+            file = db_helper.get_file(namespace, DBTypeEnum.AUCTIONS, crid=1)
+            self.assertIs(type(file), file_cls)
+            self.assertIsInstance(file.codec, codec_cls)
+            self.assertEqual(
+                DBFileName.from_str(file.file_name).ext, db_ext or DBExtEnum.GZ
+            )
+            meta_file = db_helper.get_file(namespace, DBTypeEnum.META)
+            self.assertEqual(DBFileName.from_str(meta_file.file_name).ext, "json")
+
+        self.assertRaises(ValueError, DBHelper, self.tmp_dir.name, DBExtEnum.JSON)
+
+    def test_region_file(self):
+        namespace = Namespace.from_str("dynamic-classic-us")
+        for db_ext, ext in (
+            (DBExtEnum.GZ, "gz"),
+            (DBExtEnum.ZST, "zst"),
+            (DBExtEnum.MMAP, "bin"),
+        ):
+            db_helper = DBHelper(self.tmp_dir.name, db_ext=db_ext)
+            file = db_helper.get_file(
+                namespace, DBTypeEnum.REGION, category=RealmCategoryEnum.HARDCORE
+            )
+            self.assertEqual(
+                file.file_name, f"dynamic-classic-us_region_hardcore.{ext}"
+            )
+            file_name = DBFileName.from_str(file.file_name)
+            self.assertEqual(file_name.db_type, DBTypeEnum.REGION)
+            self.assertEqual(file_name.category, RealmCategoryEnum.HARDCORE)
+            self.assertIsNone(file_name.crid)
+            self.assertIsNone(file_name.faction)
+
+        for kwargs in (
+            # no category
+            {"db_type": DBTypeEnum.REGION, "ext": DBExtEnum.GZ},
+            {"db_type": DBTypeEnum.REGION, "category": "default", "ext": "mmap"},
+            {"db_type": DBTypeEnum.REGION, "category": "default", "ext": "json"},
+            {"db_type": DBTypeEnum.REGION, "category": "default", "crid": 1},
+            {"db_type": DBTypeEnum.REGION, "category": "default", "faction": "a"},
+            {
+                "db_type": DBTypeEnum.AUCTIONS,
+                "category": "default",
+                "crid": 1,
+                "faction": "a",
+            },
+        ):
+            kwargs.setdefault("ext", DBExtEnum.GZ)
+            self.assertRaises(ValueError, DBFileName, namespace=namespace, **kwargs)
+
+    def test_codecs(self):
+        data = b"".join(i.to_bytes(4, "little") for i in range(10000))
+        codecs = [
+            GzipCodec(),
+            GzipCodec(level=1),
+            ZstdCodec(),
+            ZstdCodec(level=19, threads=2),
+            ZstdCodec(
+                dict_data=zstandard.train_dictionary(1024, [data] * 10).as_bytes()
+            ),
+        ]
+        for i, codec in enumerate(codecs):
+            file = BinaryFile(f"{self.tmp_dir.name}/{i}", codec=codec)
+            with file.open("wb") as f:
+                f.write(data)
+
+            with open(file.file_path, "rb") as f:
+                self.assertLess(len(f.read()), len(data))
+
+            # appended frames / members are read as one stream
+            with file.open("ab") as f:
+                f.write(data[:100])
+
+            with file.open("rb") as f:
+                self.assertEqual(f.read(), data + data[:100])
+
+        # turning off compression reads / writes raw content
+        file.use_compression = False
+        with file.open("rb") as f:
+            self.assertNotEqual(f.read(), data + data[:100])
+
+    def test_convert_db_ext(self):
+        namespace = Namespace.from_str("dynamic-us")
+        ts = SECONDS_IN.DAY * 100
+        item_string = ItemString(
+            type=ItemStringTypeEnum.ITEM,
+            id=1,
+            bonuses=None,
+            mods=None,
+        )
+        increment = MapItemStringMarketValueRecord(
+            __root__={
+                item_string: MarketValueRecord(
+                    timestamp=ts,
+                    market_value=100,
+                    num_auctions=1,
+                    min_buyout=1,
+                )
+            }
+        )
+        gz_helper = DBHelper(self.tmp_dir.name, db_ext=DBExtEnum.GZ)
+        gz_file = gz_helper.get_file(namespace, DBTypeEnum.AUCTIONS, crid=1)
+        Updater({}, gz_helper).save_increment(gz_file, increment, ts)
+
+        # legacy file is read until converted by the next compaction
+        zst_helper = DBHelper(self.tmp_dir.name, db_ext=DBExtEnum.ZST)
+        file = zst_helper.get_file(namespace, DBTypeEnum.AUCTIONS, crid=1)
+        self.assertEqual(file.file_path, gz_file.file_path)
+        records = MapItemStringMarketValueRecords.from_file(file)
+        self.assertEqual(len(records[item_string]), 1)
+
+        Updater({}, zst_helper).save_increment(file, increment, ts)
+        self.assertFalse(gz_file.exists())
+        file = zst_helper.get_file(namespace, DBTypeEnum.AUCTIONS, crid=1)
+        self.assertEqual(DBFileName.from_str(file.file_name).ext, DBExtEnum.ZST)
+        self.assertIsInstance(file.codec, ZstdCodec)
+        records = MapItemStringMarketValueRecords.from_file(file)
+        self.assertEqual(len(records[item_string]), 2)
+
+    def test_append_segments(self):
+        db_helper = DBHelper(self.tmp_dir.name)
+        namespace = Namespace(
+            category=NameSpaceCategoriesEnum.DYNAMIC,
+            game_version=GameVersionEnum.RETAIL,
+            region="us",
+        )
+        file = db_helper.get_file(namespace, DBTypeEnum.AUCTIONS, crid=1)
+        item_string = ItemString(
+            type=ItemStringTypeEnum.ITEM,
+            id=1,
+            bonuses=None,
+            mods=None,
+        )
+        updater = Updater({}, db_helper, append_segments=True)
+        ts_day = SECONDS_IN.DAY * 100
+
+        def save(ts, ts_compressed):
+            increment = MapItemStringMarketValueRecord(
+                __root__={
+                    item_string: MarketValueRecord(
+                        timestamp=ts,
+                        market_value=100,
+                        num_auctions=1,
+                        min_buyout=1,
+                    )
+                }
+            )
+            return updater.save_increment(
+                file, increment, ts, ts_compressed=ts_compressed, is_tsc_local=True
+            )
+
+        # no db file yet, written as a whole
+        save(ts_day + 100, 0)
+        size = os.path.getsize(file.file_path)
+
+        # same day as last compaction, appended
+        for i in range(1, 4):
+            segment = save(ts_day + 100 * (i + 1), ts_day)
+            self.assertEqual(len(segment[item_string]), 1)
+            self.assertGreater(os.path.getsize(file.file_path), size)
+            size = os.path.getsize(file.file_path)
+            records = MapItemStringMarketValueRecords.from_file(file)
+            self.assertEqual(len(records[item_string]), i + 1)
+
+        # a day passed, segments get merged and compressed
+        records = save(ts_day + SECONDS_IN.DAY + 100, ts_day)
+        self.assertListEqual(
+            records[item_string].timestamp.tolist(),
+            [ts_day + SECONDS_IN.DAY // 2, ts_day + SECONDS_IN.DAY + 100],
+        )
+        self.assertEqual(MapItemStringMarketValueRecords.from_file(file), records)
+        self.assertLess(os.path.getsize(file.file_path), size)
+
+    def test_rewrite_without_append_segments(self):
+        db_helper = DBHelper(self.tmp_dir.name)
+        namespace = Namespace(
+            category=NameSpaceCategoriesEnum.DYNAMIC,
+            game_version=GameVersionEnum.RETAIL,
+            region="us",
+        )
+        file = db_helper.get_file(namespace, DBTypeEnum.AUCTIONS, crid=1)
+        item_string = ItemString(
+            type=ItemStringTypeEnum.ITEM,
+            id=1,
+            bonuses=None,
+            mods=None,
+        )
+        ts_day = SECONDS_IN.DAY * 100
+        for append_segments, n_items in ((False, 1), (True, 3)):
+            file.remove()
+            updater = Updater({}, db_helper, append_segments=append_segments)
+            for i in range(3):
+                increment = MapItemStringMarketValueRecord(
+                    __root__={
+                        item_string: MarketValueRecord(
+                            timestamp=ts_day + 100 * (i + 1),
+                            market_value=100,
+                            num_auctions=1,
+                            min_buyout=1,
+                        )
+                    }
+                )
+                updater.save_increment(
+                    file,
+                    increment,
+                    ts_day + 100 * (i + 1),
+                    ts_compressed=ts_day,
+                    is_tsc_local=i > 0,
+                )
+
+            # a plain `ItemDB` parse, as readers without segments support do
+            pb_item_db = ItemDB()
+            with file.open("rb") as f:
+                pb_item_db.ParseFromString(f.read())
+
+            self.assertEqual(len(pb_item_db.items), n_items)
+            records = MapItemStringMarketValueRecords.from_file(file)
+            self.assertEqual(len(records[item_string]), 3)
+
     def test_load_db(self):
         # mode = AuctionManager.MODE_REMOTE_R
         db_path = self.tmp_dir.name
@@ -0,0 +1,115 @@
+from unittest import TestCase
+import random
+
+import numpy as np
+
+from ah.tsm_exporter import TSMExporter, ExportFields
+from ah.models import (
+    MapItemStringMarketValueRecords,
+    MarketValueRecords,
+    ItemString,
+    ItemStringTypeEnum,
+)
+from ah.defs import SECONDS_IN
+
+
+class TestExporter(TestCase):
+    def test_base_n(self):
+        nums = [0, 1, 31, 32, 33, 1023, 1024, 2**31 - 1, 2**62 + 12345]
+        for num in nums:
+            self.assertEqual(int(TSMExporter.baseN(num, 32), 32), num)
+            self.assertEqual(int(TSMExporter.baseN(num, 10)), num)
+
+        self.assertEqual(TSMExporter.baseN(0, 32), "0")
+        self.assertEqual(TSMExporter.baseN(32, 32), "10")
+        self.assertListEqual(
+            TSMExporter.baseN_array(np.array(nums), 32),
+            [TSMExporter.baseN(num, 32) for num in nums],
+        )
+        self.assertListEqual(TSMExporter.baseN_array(np.array([0, 0]), 32), ["0"] * 2)
+        self.assertListEqual(TSMExporter.baseN_array(np.array([], dtype=int), 32), [])
+        self.assertRaises(ValueError, TSMExporter.baseN, -1, 32)
+        self.assertRaises(ValueError, TSMExporter.baseN_array, np.array([-1]), 32)
+
+    @classmethod
+    def generate_map_records(
+        cls, ts_update_begin: int, n_items: int, seed: int = 0
+    ) -> MapItemStringMarketValueRecords:
+        rng = random.Random(seed)
+        day_end = ts_update_begin - ts_update_begin % SECONDS_IN.DAY
+        map_records = MapItemStringMarketValueRecords()
+        for i in range(n_items):
+            item_string = ItemString(
+                type=ItemStringTypeEnum.ITEM,
+                id=i,
+                bonuses=(i,) if i % 3 else None,
+                mods=None,
+            )
+            # compressed records before today, one per day
+            days = sorted(rng.sample(range(1, 70), rng.randint(0, 20)), reverse=True)
+            timestamps = [day_end - day * SECONDS_IN.DAY + 100 for day in days]
+            # today's records, last one maybe from last update
+            timestamps += sorted(
+                rng.randint(day_end, ts_update_begin - 1)
+                for _ in range(rng.randint(0, 5))
+            )
+            if timestamps and rng.random() < 0.5:
+                timestamps[-1] = ts_update_begin + 10
+
+            n = len(timestamps)
+            map_records[item_string] = MarketValueRecords.from_columns(
+                timestamp=timestamps,
+                market_value=[rng.choice([0, rng.randint(1, 10**7)]) for _ in range(n)],
+                num_auctions=[rng.randint(0, 100) for _ in range(n)],
+                min_buyout=[rng.randint(0, 10**7) for _ in range(n)],
+            )
+
+        return map_records
+
+    def test_export_fields(self):
+        ts_update_begin = SECONDS_IN.DAY * 100 + 1000
+        ts_update_end = ts_update_begin + 100
+        ts_compressed = MarketValueRecords.get_compress_end_ts(ts_update_begin)
+        map_records = self.generate_map_records(ts_update_begin, 200)
+        export_fields = ExportFields(map_records, ts_update_begin, ts_update_end)
+        fields = [
+            "itemString",
+            "minBuyout",
+            "numAuctions",
+            "marketValueRecent",
+            "historical",
+            "marketValue",
+        ]
+        export_fields.compute(fields)
+
+        # same as computing every item on its own
+        items_data = []
+        for item_string, records in map_records.items():
+            values = [
+                records.get_recent_min_buyout(ts_update_begin),
+                records.get_recent_num_auctions(ts_update_begin),
+                records.get_recent_market_value(ts_update_begin),
+                records.get_historical_market_value(ts_update_end, ts_compressed),
+                records.get_weighted_market_value(ts_update_end, ts_compressed),
+            ]
+            if any(values):
+                item_data = [f'"{item_string.to_str()}"']
+                if item_string.bonuses is None:
+                    item_data = [item_string.to_str()]
+
+                item_data += [TSMExporter.baseN(int(v), 32) for v in values]
+                items_data.append("{" + ",".join(item_data) + "}")
+
+        self.assertTrue(items_data)
+        self.assertEqual(export_fields.get_data(fields), ",".join(items_data))
+        # cached
+        self.assertIs(export_fields.get_data(fields), export_fields.get_data(fields))
+        self.assertEqual(export_fields.get_data(["itemString"]), "")
+
+        self.assertRaises(ValueError, export_fields.compute, ["unknown"])
+        self.assertEqual(
+            ExportFields(
+                MapItemStringMarketValueRecords(), ts_update_begin, ts_update_end
+            ).get_data(fields),
+            "",
+        )
@@ -0,0 +1,73 @@
+from unittest import TestCase
+import json
+import random
+
+from ah.json_stream import iter_json_array
+from ah.errors import JSONStreamError
+
+
+class TestJSONStream(TestCase):
+    @classmethod
+    def split(cls, raw, n_chunks):
+        cuts = sorted(random.sample(range(1, len(raw)), min(len(raw) - 1, n_chunks)))
+        return [raw[i:j] for i, j in zip([0] + cuts, cuts + [len(raw)])]
+
+    def test_iter(self):
+        for _ in range(50):
+            obj = {
+                "_links": {"self": {"href": "https://...\"\\"}},
+                "auctions": [
+                    {
+                        "id": i,
+                        "item": {"id": random.randint(1, 10**6), "bonus_lists": [1]},
+                        "buyout": random.randint(1, 10**12),
+                        "quantity": random.randint(1, 200),
+                        "time_left": "VERY_LONG",
+                        "note": "测试",
+                    }
+                    for i in range(random.randint(0, 30))
+                ],
+                "timestamp": 1234567890,
+            }
+            raw = json.dumps(obj, indent=random.choice([None, 2])).encode()
+            others = {}
+            chunks = self.split(raw, random.randint(0, 50))
+            auctions = list(iter_json_array(chunks, "auctions", others))
+            self.assertListEqual(obj["auctions"], auctions)
+            self.assertDictEqual(
+                {"_links": obj["_links"], "timestamp": obj["timestamp"]}, others
+            )
+
+    def test_edge(self):
+        self.assertListEqual([], list(iter_json_array([b"{}"], "auctions")))
+        self.assertListEqual(
+            [], list(iter_json_array([b'{"auctions": null}'], "auctions"))
+        )
+        # number split across chunks
+        chunks = [b'{"auctions": [1', b"23", b"4]}"]
+        self.assertListEqual([1234], list(iter_json_array(chunks, "auctions")))
+        raw = b'{"auctions": [1.5, -2e+10, 3.25E-2, true], "t": 1.5e3}'
+        for i in range(1, len(raw)):
+            others = {}
+            chunks = [raw[:i], raw[i:]]
+            self.assertListEqual(
+                [1.5, -2e10, 3.25e-2, True],
+                list(iter_json_array(chunks, "auctions", others)),
+            )
+            self.assertDictEqual({"t": 1.5e3}, others)
+
+    def test_malformed(self):
+        for raw in [
+            b'{"auctions": [1, 2',
+            b'{"auctions": [1 2]}',
+            b'{"auctions": 1}',
+            b'{"auctions": []} []',
+            b"[]",
+            b"",
+            b'{"auctions": [1.]}',
+            # invalid UTF-8, and a body cut in the middle of a character
+            b'{"auctions": ["\xff"]}',
+            '{"auctions": ["测'.encode()[:-1],
+        ]:
+            with self.assertRaises(JSONStreamError):
+                list(iter_json_array(self.split(raw, 3) if raw else [], "auctions"))
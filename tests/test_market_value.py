@@ -1,4 +1,8 @@
+import random
 from unittest import TestCase
+
+import numpy as np
+
 from ah.models import MapItemStringMarketValueRecord
 
 
@@ -7,6 +11,15 @@ class TestMarketValue(TestCase):
         super().__init__(*args, **kwargs)
         # self.temp_dir = None
 
+    def assert_market_value(self, expected, item_n, price_groups):
+        actual = MapItemStringMarketValueRecord.calc_market_value(item_n, price_groups)
+        self.assertAlmostEqual(expected, actual)
+        prices, quantities = zip(*price_groups)
+        (actual,) = MapItemStringMarketValueRecord.batch_calc_market_value(
+            np.array(prices), np.array(quantities), [0, len(price_groups)]
+        )
+        self.assertAlmostEqual(expected, actual)
+
     def test_market_value_calc_official_1(self):
         price_groups = [
             (5, 1),
@@ -24,8 +37,7 @@ class TestMarketValue(TestCase):
             (100, 1),
         ]
         expected = 14.5
-        actual = MapItemStringMarketValueRecord.calc_market_value(24, price_groups)
-        self.assertAlmostEqual(expected, actual)
+        self.assert_market_value(expected, 24, price_groups)
 
     def test_market_value_calc_official_2(self):
         # viration of official test case from TradeSkillMaster website
@@ -44,36 +56,74 @@ class TestMarketValue(TestCase):
             (100, 1),
         ]
         expected = 14.5
-        actual = MapItemStringMarketValueRecord.calc_market_value(24, price_groups)
-        self.assertAlmostEqual(expected, actual)
+        self.assert_market_value(expected, 24, price_groups)
 
     def test_market_value_calc_edge_1(self):
         price_groups = [(1, 1), (1.1, 6)]
         expected = 1.05
-        actual = MapItemStringMarketValueRecord.calc_market_value(7, price_groups)
-        self.assertAlmostEqual(expected, actual)
+        self.assert_market_value(expected, 7, price_groups)
 
     def test_market_value_calc_edge_2(self):
         price_groups = [(4, 1), (4.7, 1)]
         expected = 4
-        actual = MapItemStringMarketValueRecord.calc_market_value(2, price_groups)
-        self.assertAlmostEqual(expected, actual)
+        self.assert_market_value(expected, 2, price_groups)
 
     def test_market_value_calc_edge_3(self):
         price_groups = [(10, 1), (100, 1)]
         expected = 10
-        actual = MapItemStringMarketValueRecord.calc_market_value(2, price_groups)
-        self.assertAlmostEqual(expected, actual)
+        self.assert_market_value(expected, 2, price_groups)
 
     def test_market_value_calc_edge_4(self):
         price_groups = [(4, 1)]
         expected = 4
-        actual = MapItemStringMarketValueRecord.calc_market_value(1, price_groups)
-        self.assertAlmostEqual(expected, actual)
+        self.assert_market_value(expected, 1, price_groups)
 
     def test_market_value_calc_edge_5(self):
         price_groups = [(1, 1), (2, 6)]
         # jump limit excessed
         expected = 1
-        actual = MapItemStringMarketValueRecord.calc_market_value(7, price_groups)
-        self.assertAlmostEqual(expected, actual)
+        self.assert_market_value(expected, 7, price_groups)
+
+    def test_batch_calc_market_value(self):
+        rng = random.Random(0)
+        items = []
+        for _ in range(1000):
+            base = rng.randint(1, 10**6)
+            items.append(
+                sorted(
+                    (int(base * (1 + abs(rng.gauss(0, 0.3)))), rng.choice([1, 2, 20]))
+                    for _ in range(rng.choice([0, 1, 2, 3, 10, 50]))
+                )
+            )
+
+        prices = np.array([price for item in items for price, _ in item])
+        quantities = np.array([quantity for item in items for _, quantity in item])
+        offsets = np.cumsum([0] + [len(item) for item in items])
+        actual = MapItemStringMarketValueRecord.batch_calc_market_value(
+            prices, quantities, offsets
+        )
+        for item, market_value in zip(items, actual.tolist()):
+            expected = MapItemStringMarketValueRecord.calc_market_value(
+                sum(quantity for _, quantity in item), item
+            )
+            if expected is None:
+                self.assertTrue(np.isnan(market_value))
+            else:
+                self.assertEqual(expected, market_value)
+
+    def test_calc_shard(self):
+        # code 1 is bid-only, code 2 has no auctions
+        codes = np.array([0, 1, 0, 0, 1])
+        prices = np.array([20, 7, 10, 15, 5])
+        quantities = np.array([6, 1, 1, 3, 1])
+        buyouts = np.array([20, 0, 0, 15, 0])
+        market_values, num_auctions, min_buyouts = (
+            MapItemStringMarketValueRecord._calc_shard(
+                3, codes, prices, quantities, buyouts
+            )
+        )
+        self.assertAlmostEqual(market_values[0], 10)
+        self.assertAlmostEqual(market_values[1], 5)
+        self.assertTrue(np.isnan(market_values[2]))
+        self.assertListEqual(num_auctions.tolist(), [10, 2, 0])
+        self.assertListEqual(min_buyouts.tolist(), [15, 0, 0])
@@ -1,10 +1,17 @@
 from unittest import TestCase
+from tempfile import TemporaryDirectory
 import random
+import json
+import os
 
+import numpy as np
+
+from ah.data import BonusTable
 from ah.models import (
     ItemString,
     ItemStringTypeEnum,
     AuctionItem,
+    CommodityItem,
 )
 
 
@@ -181,6 +188,43 @@ class TestModels(TestCase):
         self.assertEqual(item_string.mods, None)
         self.assertEqual(item_string.to_str(), f"p:{item_string.id}")
 
+    def test_item_string_intern(self):
+        ItemString.clear_intern_cache()
+        bonus_in, bonus_out = self.mock_bonuses()
+        modifiers_in, modifiers_out = self.mock_modifiers()
+        item = AuctionItem(id=1000, bonus_lists=bonus_in, modifiers=modifiers_in)
+        item_string = ItemString.from_item(item)
+        stats = ItemString.get_intern_stats()
+        self.assertEqual((0, 1, 1), (stats["hits"], stats["misses"], stats["size"]))
+
+        # same shape, different context
+        item = AuctionItem(
+            id=1000, context=1, bonus_lists=bonus_in, modifiers=modifiers_in
+        )
+        self.assertIs(item_string, ItemString.from_item(item))
+        self.assertEqual(1, ItemString.get_intern_stats()["hits"])
+
+        item = AuctionItem(id=1001, bonus_lists=bonus_in, modifiers=modifiers_in)
+        self.assertNotEqual(item_string, ItemString.from_item(item))
+        self.assertEqual(2, ItemString.get_intern_stats()["misses"])
+
+        # commodity and plain auction item share their item string
+        item_string = ItemString.from_item(CommodityItem(id=1000))
+        self.assertIs(item_string, ItemString.from_item(AuctionItem(id=1000)))
+        self.assertEqual(
+            item_string,
+            ItemString(type=ItemStringTypeEnum.ITEM, id=1000, bonuses=None, mods=None),
+        )
+
+        # bounded
+        for i in range(ItemString.INTERN_CACHE_SIZE + 10):
+            ItemString.from_item(CommodityItem(id=i))
+
+        stats = ItemString.get_intern_stats()
+        self.assertEqual(stats["max_size"], stats["size"])
+        ItemString.clear_intern_cache()
+        self.assertEqual(0, ItemString.get_intern_stats()["size"])
+
     def test_item_level(self):
         bonuses, mods = [8851, 8852, 8801], [
             {"type": 28, "value": 2164},
@@ -309,3 +353,105 @@ class TestModels(TestCase):
             )
         )
         self.assertEqual(i.to_str(), ret)
+
+    def test_bonus_table(self):
+        data = {
+            "1": {},
+            "3": {"level": -5},
+            "7": {"base_level": 200},
+            "9": {"curveId": 10, "points": [[1, 5], [10, 10], [10, 12], [20, 30]]},
+            "11": {"curveId": 11, "points": []},
+        }
+        with TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "bonuses.json")
+            with open(path, "w") as f:
+                json.dump(data, f)
+
+            table = BonusTable(path)
+            self.assertFalse(table._loaded)
+            self.assertIn(9, table)
+            self.assertIn(np.int32(9), table)
+            self.assertNotIn(2, table)
+            self.assertNotIn(100, table)
+            self.assertNotIn("9", table)
+            # same as the json file
+            self.assertDictEqual(dict(table), {int(k): v for k, v in data.items()})
+            self.assertListEqual(table.point_offsets.tolist(), [0, 0, 0, 0, 4, 4])
+
+            row = table.get_row(9)
+            # clamped, first of points with the same player level
+            self.assertEqual(table.get_ilvl_from_curve(row, 0), 5)
+            self.assertEqual(table.get_ilvl_from_curve(row, 10), 10)
+            self.assertEqual(table.get_ilvl_from_curve(row, 99), 30)
+            # interpolated from the last of them, rounded half up
+            self.assertEqual(table.get_ilvl_from_curve(row, 15), 21)
+            self.assertEqual(table.get_ilvl_from_curve(row, 5), 7)
+            self.assertRaises(
+                ValueError, table.get_ilvl_from_curve, table.get_row(11), 1
+            )
+
+            self.assertEqual(len(BonusTable(os.path.join(tmp_dir, "missing"))), 0)
+
+    def test_bonus_table_binary(self):
+        data = {
+            "1": {"level": 5},
+            "9": {"curveId": 10, "points": [[1, 5], [20, 30]]},
+        }
+        with TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "bonuses.json")
+            binary_path = os.path.join(tmp_dir, "bonuses.bin")
+            BonusTable.from_dict(data).to_binary(binary_path)
+            # mapped, json isn't needed
+            table = BonusTable(path, binary_path=binary_path)
+            self.assertDictEqual(dict(table), {int(k): v for k, v in data.items()})
+            self.assertEqual(table.get_ilvl_from_curve(table.get_row(9), 20), 30)
+            self.assertFalse(table.ids.flags.writeable)
+
+            # falls back to json if unreadable
+            with open(path, "w") as f:
+                json.dump({"2": {}}, f)
+
+            with open(binary_path, "r+b") as f:
+                f.seek(4)
+                f.write(b"\xff")
+
+            self.assertListEqual(list(BonusTable(path, binary_path=binary_path)), [2])
+            for content in (b"", b"AHBT"):
+                with open(binary_path, "wb") as f:
+                    f.write(content)
+
+                table = BonusTable(path, binary_path=binary_path)
+                self.assertListEqual(list(table), [2])
+
+        # shipped binary table is up to date
+        self.assertDictEqual(
+            dict(BonusTable(ItemString.MAP_BONUSES.path)),
+            dict(BonusTable(None, binary_path=ItemString.MAP_BONUSES.binary_path)),
+        )
+
+    def test_get_ilvls(self):
+        rng = random.Random(0)
+        table = ItemString.MAP_BONUSES
+        bonus_ids = list(table)
+        curve_ids = [bid for bid in bonus_ids if "curveId" in table[bid]]
+        bonus_lists = [[]]
+        for _ in range(3000):
+            bonus_list = rng.sample(bonus_ids, rng.randint(1, 4))
+            # more curves competing
+            bonus_list += rng.sample(curve_ids, rng.randint(0, 2))
+            bonus_lists.append(bonus_list)
+
+        plvls = [rng.choice([1, 10, 45, 60, 70, 80, 200]) for _ in bonus_lists]
+        offsets = np.cumsum([0] + [len(bonus_list) for bonus_list in bonus_lists])
+        ilvls, is_relative, has_ilvl = ItemString.get_ilvls(
+            offsets,
+            [bid for bonus_list in bonus_lists for bid in bonus_list],
+            plvls,
+        )
+        self.assertTrue(has_ilvl.any() and not has_ilvl.all())
+        for i, (bonus_list, plvl) in enumerate(zip(bonus_lists, plvls)):
+            expected = ItemString.get_ilvl(bonus_list, plvl)
+            actual = (ilvls[i], is_relative[i]) if has_ilvl[i] else None
+            self.assertEqual(actual, expected, bonus_list)
+
+        self.assertRaises(KeyError, ItemString.get_ilvls, [0, 1], [-1], [1])
@@ -1,5 +1,7 @@
-from unittest import TestCase
+from unittest import TestCase, mock
+from concurrent.futures import ThreadPoolExecutor
 import random
+import json
 
 from ah.models import (
     MapItemStringMarketValueRecord,
@@ -7,6 +9,9 @@ from ah.models import (
     CommodityItem,
     AuctionsResponse,
     CommoditiesResponse,
+    AuctionsStreamResponse,
+    CommoditiesStreamResponse,
+    DecodedAuctionsResponse,
     Auction,
     Commodity,
     GameVersionEnum,
@@ -178,6 +183,90 @@ class TestModels(TestCase):
             self.assertEqual(record.num_auctions, expected[item_id][1])
             self.assertEqual(record.min_buyout, min_price)
 
+    @mock.patch.object(MapItemStringMarketValueRecord, "MIN_PARALLEL_AUCTIONS", 0)
+    def test_increment_workers(self):
+        """sharded computation gives identical increment, in the same order"""
+        for type_ in ("auction", "commodity"):
+            resp, _, _ = self.mock_response(type_, 50, timestamp=1000)
+            expected = MapItemStringMarketValueRecord.from_response(resp)
+            for workers in (2, 3):
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    increment = MapItemStringMarketValueRecord.from_response(
+                        resp, workers=workers, executor=executor
+                    )
+
+                self.assertListEqual(list(expected), list(increment))
+                for item_string, record in expected.items():
+                    other = increment[item_string]
+                    self.assertEqual(record.market_value, other.market_value)
+                    self.assertEqual(record.num_auctions, other.num_auctions)
+                    self.assertEqual(record.min_buyout, other.min_buyout)
+
+        # temporary process pool
+        increment = MapItemStringMarketValueRecord.from_response(resp, workers=2)
+        self.assertListEqual(list(expected), list(increment))
+
+    def test_increment_stream(self):
+        for type_, cls in (
+            ("auction", AuctionsStreamResponse),
+            ("commodity", CommoditiesStreamResponse),
+        ):
+            resp, _, _ = self.mock_response(type_, 20, timestamp=1000)
+            raw = json.dumps(resp.model_dump(by_alias=True)).encode()
+            chunks = [raw[i : i + 100] for i in range(0, len(raw), 100)]
+            stream_resp = cls(chunks, timestamp=1000)
+            expected = MapItemStringMarketValueRecord.from_response(resp)
+            increment = MapItemStringMarketValueRecord.from_response(stream_resp)
+            self.assertListEqual(list(expected), list(increment))
+            for item_string, record in expected.items():
+                other = increment[item_string]
+                self.assertEqual(record.market_value, other.market_value)
+                self.assertEqual(record.num_auctions, other.num_auctions)
+                self.assertEqual(record.min_buyout, other.min_buyout)
+
+            # body can only be consumed once
+            self.assertRaises(ValueError, stream_resp.get_auctions)
+
+    def test_increment_decoded(self):
+        for type_, decode in (
+            ("auction", DecodedAuctionsResponse.decode_auctions),
+            ("commodity", DecodedAuctionsResponse.decode_commodities),
+        ):
+            resp, _, _ = self.mock_response(type_, 20, timestamp=1000)
+            raw = json.loads(json.dumps(resp.model_dump(by_alias=True)))
+            decoded = decode(raw["auctions"], timestamp=1000)
+            self.assertEqual(len(resp.auctions), len(decoded))
+            expected = MapItemStringMarketValueRecord.from_response(resp)
+            increment = MapItemStringMarketValueRecord.from_response(decoded)
+            self.assertListEqual(list(expected), list(increment))
+            for item_string, record in expected.items():
+                other = increment[item_string]
+                self.assertEqual(record.market_value, other.market_value)
+                self.assertEqual(record.num_auctions, other.num_auctions)
+                self.assertEqual(record.min_buyout, other.min_buyout)
+
+            for auction, decoded_auction in zip(resp.auctions, decoded.get_auctions()):
+                self.assertEqual(auction.get_price(), decoded_auction.get_price())
+                self.assertEqual(auction.get_quantity(), decoded_auction.get_quantity())
+                self.assertEqual(
+                    auction.get_time_left(), decoded_auction.get_time_left()
+                )
+
+    def test_decode_checks(self):
+        """same checks as model validators, done in bulk"""
+        auction = {"id": 1, "item": {"id": 1}, "quantity": 1, "time_left": "SHORT"}
+        decode = DecodedAuctionsResponse.decode_auctions
+        # no bid nor buyout
+        self.assertRaises(ValueError, decode, [{**auction, "bid": 1}, auction])
+        # missing pet fields
+        pet_item = {"id": 82800, "pet_species_id": 1, "pet_level": 1}
+        self.assertRaises(ValueError, decode, [{**auction, "bid": 1, "item": pet_item}])
+        # invalid time left
+        self.assertRaises(ValueError, decode, [{**auction, "bid": 1, "time_left": "?"}])
+        # missing field
+        self.assertRaises(ValueError, decode, [{"id": 1, "bid": 1}])
+        self.assertEqual(1, len(decode([{**auction, "bid": 1}])))
+
     def test_edge(self):
         obj = {
             "_links": {},
@@ -1,15 +1,24 @@
 from unittest import TestCase
+from functools import partial
+from tempfile import TemporaryDirectory
 from tests.test_models_mvrs import TestModels as TestModelsMVRs
+from tests.test_exporter import TestExporter
+
+import numpy as np
 
 from ah.models import (
     MarketValueRecords,
     MapItemStringMarketValueRecord,
     MapItemStringMarketValueRecords,
+    MapItemStringMarketValueRecordsView,
+    DailyMarketValueSums,
     MarketValueRecord,
     ItemString,
     ItemStringTypeEnum,
 )
 from ah.defs import SECONDS_IN
+from ah.storage import BinaryFile, MappedFile
+from ah.errors import DBFormatError
 
 
 class TestModels(TestCase):
@@ -182,6 +191,143 @@ class TestModels(TestCase):
 
         self.assertEqual(len(db1), 150)
 
+    def test_view(self):
+        ts = SECONDS_IN.DAY * 100 + 1000
+        maps = [
+            TestExporter.generate_map_records(ts, n_items, seed=seed)
+            for seed, n_items in enumerate([50, 80, 0, 30])
+        ]
+        extended = MapItemStringMarketValueRecords()
+        for map_ in maps:
+            extended.extend(map_)
+
+        view = MapItemStringMarketValueRecordsView(*maps)
+        self.assertEqual(len(view), len(extended))
+        self.assertListEqual(list(view), list(extended.keys()))
+        for (item_string, records), (expected_item_string, expected) in zip(
+            view.items(), extended.items()
+        ):
+            self.assertEqual(item_string, expected_item_string)
+            self.assertIn(item_string, view)
+            self.assertListEqual(list(records), list(expected))
+            self.assertListEqual(list(view[item_string]), list(expected))
+
+        # records only in one map are not copied
+        item_string = next(k for k, v in maps[1].items() if v and k not in maps[0])
+        self.assertIs(view[item_string], maps[1][item_string])
+
+        missing = ItemString(
+            type=ItemStringTypeEnum.ITEM, id=10**6, bonuses=None, mods=None
+        )
+        self.assertNotIn(missing, view)
+        self.assertRaises(KeyError, view.__getitem__, missing)
+        self.assertEqual(len(MapItemStringMarketValueRecordsView()), 0)
+
+        # sorted on access
+        view = MapItemStringMarketValueRecordsView(maps[1], maps[0], sort=True)
+        for records in view.values():
+            self.assertTrue(np.all(np.diff(records.timestamp) >= 0))
+
+    def test_daily_sums(self):
+        ts_now = SECONDS_IN.DAY * 100 + 1000
+        maps = [
+            TestExporter.generate_map_records(ts_now - 100, n_items, seed=seed)
+            for seed, n_items in enumerate([50, 80, 0, 30])
+        ]
+        extended = MapItemStringMarketValueRecords()
+        sums = DailyMarketValueSums(ts_now)
+        for map_ in maps:
+            extended.extend(map_)
+            sums.add(map_)
+
+        extended.sort()
+        self.assertListEqual(list(sums.keys()), list(extended.keys()))
+        expected = MarketValueRecords.batch_market_value(extended.values(), ts_now)
+        for values, expected_values in zip(sums.batch_market_value(), expected):
+            self.assertListEqual(values.tolist(), expected_values.tolist())
+
+        historicals, weighteds = sums.batch_market_value(historical=False)
+        self.assertIsNone(historicals)
+        self.assertListEqual(weighteds.tolist(), expected[1].tolist())
+        self.assertRaises(
+            ValueError, DailyMarketValueSums(ts_now, n_days=15).batch_market_value
+        )
+
+    def test_daily_sums_file(self):
+        day = SECONDS_IN.DAY
+        ts_now = DailyMarketValueSums.get_day_end_ts(day * 100 + 1000)
+        self.assertEqual(ts_now, day * 101)
+        sums = DailyMarketValueSums(ts_now, n_days=61, ts_updated=day * 100)
+        sums.add(TestExporter.generate_map_records(day * 100 + 1000, 50))
+        increment = MapItemStringMarketValueRecord()
+        for i in range(60):
+            item_string = ItemString(
+                type=ItemStringTypeEnum.PET, id=i, bonuses=None, mods=None
+            )
+            increment[item_string] = MarketValueRecord(
+                timestamp=day * 100 + 10, market_value=i, num_auctions=1, min_buyout=1
+            )
+
+        sums.add_increment(increment)
+        self.assertEqual(len(sums), 110)
+
+        with TemporaryDirectory() as tmp_dir:
+            for use_compression in (True, False):
+                file = BinaryFile(f"{tmp_dir}/sums", use_compression=use_compression)
+                sums.to_file(file)
+                loaded = DailyMarketValueSums.from_file(file)
+                self.assertEqual(loaded.ts_now, sums.ts_now)
+                self.assertEqual(loaded.n_days, sums.n_days)
+                self.assertEqual(loaded.ts_updated, sums.ts_updated)
+                self.assertListEqual(list(loaded.keys()), list(sums.keys()))
+                for values, expected in zip(
+                    loaded.batch_market_value(), sums.batch_market_value()
+                ):
+                    self.assertListEqual(values.tolist(), expected.tolist())
+
+            self.assertIsNone(DailyMarketValueSums.from_file(BinaryFile("missing")))
+            with BinaryFile(f"{tmp_dir}/bad").open("wb") as f:
+                f.write(b"bad")
+
+            bad_file = BinaryFile(f"{tmp_dir}/bad")
+            self.assertRaises(DBFormatError, DailyMarketValueSums.from_file, bad_file)
+            self.assertRaises(
+                DBFormatError, DailyMarketValueSums.from_bytes, sums.to_bytes()[:-1]
+            )
+
+        # same as summing up at the later day
+        shifted = DailyMarketValueSums.from_bytes(sums.to_bytes())
+        shifted.shift(ts_now + day * 10)
+        expected = DailyMarketValueSums(ts_now + day * 10, n_days=61)
+        expected.add(TestExporter.generate_map_records(day * 100 + 1000, 50))
+        expected.add_increment(increment)
+        # pets only had records today, still in range
+        self.assertListEqual(list(shifted.keys()), list(expected.keys()))
+        for values, expected_values in zip(
+            shifted.batch_market_value(), expected.batch_market_value()
+        ):
+            self.assertListEqual(values.tolist(), expected_values.tolist())
+
+        # everything falls out
+        shifted.shift(ts_now + day * 100)
+        self.assertEqual(len(shifted), 0)
+        self.assertRaises(ValueError, shifted.shift, ts_now + 1)
+
+    def test_daily_sums_clear(self):
+        day = SECONDS_IN.DAY
+        map_records = TestExporter.generate_map_records(day * 100 + 1000, 50)
+        sums = DailyMarketValueSums(day * 101)
+        sums.add(map_records)
+        expected = sums.batch_market_value()
+        # days cleared and added again from the same records
+        sums.clear(day * 90, day * 99)
+        self.assertNotEqual(sums.batch_market_value()[0].tolist(), expected[0].tolist())
+        sums.add(map_records, ts_begin=day * 90, ts_end=day * 99)
+        for values, expected_values in zip(sums.batch_market_value(), expected):
+            self.assertListEqual(values.tolist(), expected_values.tolist())
+
+        self.assertRaises(ValueError, sums.clear, day * 90 + 1, day * 99)
+
     def test_update_increment(self):
         increment = MapItemStringMarketValueRecord(
             __root__={
@@ -234,6 +380,110 @@ class TestModels(TestCase):
             else:
                 self.assertEqual(len(recs), 3)
 
+    def test_append_segments(self):
+        def make_increment(ts, ids):
+            return MapItemStringMarketValueRecord(
+                __root__={
+                    ItemString(
+                        type=ItemStringTypeEnum.ITEM,
+                        id=i,
+                        bonuses=None,
+                        mods=None,
+                    ): MarketValueRecord(
+                        timestamp=ts,
+                        market_value=ts * 10 + i,
+                        num_auctions=1,
+                        min_buyout=ts,
+                    )
+                    for i in ids
+                }
+            )
+
+        increments = [
+            make_increment(1, range(5)),
+            make_increment(2, range(3, 8)),
+            make_increment(3, range(0, 8, 2)),
+        ]
+        expected = MapItemStringMarketValueRecords()
+        for increment in increments:
+            expected.update_increment(increment)
+
+        for file_cls in (
+            partial(BinaryFile, use_compression=True),
+            partial(BinaryFile, use_compression=False),
+            MappedFile,
+        ):
+            with TemporaryDirectory() as temp:
+                file = file_cls(f"{temp}/db")
+                base = MapItemStringMarketValueRecords()
+                base.update_increment(increments[0])
+                base.to_file(file)
+                for increment in increments[1:]:
+                    segment = MapItemStringMarketValueRecords()
+                    segment.update_increment(increment)
+                    segment.to_file(file, append=True)
+
+                db = MapItemStringMarketValueRecords.from_file(file)
+                self.assertListEqual(list(db.keys()), list(expected.keys()))
+                for item_string, records in expected.items():
+                    self.assertEqual(db[item_string], records)
+
+                # compaction rewrites a single segment
+                db.to_file(file)
+                with file.open("rb") as f:
+                    if isinstance(file, MappedFile):
+                        self.assertEqual(f.read(), expected.to_mmap_bytes())
+                    else:
+                        self.assertEqual(f.read(), expected.to_protobuf_bytes())
+
+    def test_mmap(self):
+        db = MapItemStringMarketValueRecords()
+        for i in range(10):
+            item_string = ItemString(
+                type=ItemStringTypeEnum.PET if i % 2 else ItemStringTypeEnum.ITEM,
+                id=i,
+                bonuses=(i, i + 1) if i % 3 else None,
+                mods=(9, i) if i % 4 else None,
+            )
+            for ts in range(i):
+                db.add_market_value_record(
+                    item_string,
+                    MarketValueRecord(
+                        timestamp=ts,
+                        market_value=2**40 + ts,
+                        num_auctions=i,
+                        min_buyout=ts * i,
+                    ),
+                )
+
+        with TemporaryDirectory() as temp:
+            file = MappedFile(f"{temp}/db.mmap")
+            db.to_file(file)
+            mapped = MapItemStringMarketValueRecords.from_file(file)
+
+        # empty entries are skipped
+        self.assertEqual(len(mapped), 9)
+        for item_string, records in mapped.items():
+            self.assertEqual(records, db[item_string])
+            # zero-copy, read-only views
+            self.assertFalse(records.timestamp.flags.owndata)
+            self.assertFalse(records.min_buyout.flags.writeable)
+
+        self.assertEqual(
+            len(MapItemStringMarketValueRecords.from_mmap_buffer(b"")), 0
+        )
+        data = db.to_mmap_bytes()
+        self.assertRaises(
+            DBFormatError,
+            MapItemStringMarketValueRecords.from_mmap_buffer,
+            data[:-8],
+        )
+        self.assertRaises(
+            DBFormatError,
+            MapItemStringMarketValueRecords.from_mmap_buffer,
+            b"XXXX" + data[4:],
+        )
+
     def test_query(self):
         increment = MapItemStringMarketValueRecord(
             __root__={
@@ -2,11 +2,14 @@ from unittest import TestCase
 from math import gcd
 from copy import deepcopy
 
+import numpy as np
+
 from ah.models import (
     MarketValueRecord,
     MarketValueRecords,
 )
 from ah.defs import SECONDS_IN
+from ah.errors import CompressTsError
 
 
 class TestModels(TestCase):
@@ -497,6 +500,114 @@ class TestModels(TestCase):
         records.remove_expired(100)
         self.assertEqual(len(records), 0)
 
+    def test_columns(self):
+        records = MarketValueRecords.from_columns(
+            timestamp=[1, 2, 3],
+            market_value=[10, 20, 30],
+            num_auctions=[100, 200, 300],
+            min_buyout=[1000, 0, 3000],
+        )
+        self.assertEqual(records.timestamp.dtype, np.int32)
+        self.assertEqual(records.market_value.dtype, np.int64)
+        self.assertEqual(records.num_auctions.dtype, np.int32)
+        self.assertEqual(records.min_buyout.dtype, np.int64)
+        self.assertEqual(len(records), 3)
+        self.assertEqual(records[-1].market_value, 30)
+        self.assertEqual(records[1].min_buyout, 0)
+
+        # same records as list of `MarketValueRecord`
+        records_ = MarketValueRecords(__root__=list(records))
+        for name in MarketValueRecords.COLUMNS:
+            self.assertListEqual(
+                getattr(records, name).tolist(), getattr(records_, name).tolist()
+            )
+
+        records_.extend(records)
+        self.assertEqual(len(records_), 6)
+        records_.sort()
+        self.assertListEqual(records_.timestamp.tolist(), [1, 1, 2, 2, 3, 3])
+
+        record = records_.pop(0)
+        self.assertEqual(record.timestamp, 1)
+        self.assertEqual(len(records_), 5)
+
+        records_[0] = MarketValueRecord(
+            timestamp=0, market_value=1, num_auctions=1, min_buyout=1
+        )
+        self.assertEqual(records_.market_value[0], 1)
+
+        records_.empty()
+        self.assertFalse(records_)
+
+    def test_batch(self):
+        RECORDED_DAYS = 70
+        RECORDS_PER_DAY = 4
+        NOW = SECONDS_IN.DAY * RECORDED_DAYS
+        records_list = []
+        for n_item in range(10):
+            records = MarketValueRecords()
+            for i in range(n_item * 7 * RECORDS_PER_DAY):
+                records.add(
+                    MarketValueRecord(
+                        timestamp=SECONDS_IN.DAY * (i / RECORDS_PER_DAY),
+                        market_value=100 * (i % 7 + n_item),
+                        num_auctions=i % 5,
+                        min_buyout=i % 3,
+                    ),
+                    sort=False,
+                )
+            records_list.append(records)
+
+        # compress some of the days
+        ts_compressed = SECONDS_IN.DAY * 30
+        for records in records_list:
+            records.compress(ts_compressed, SECONDS_IN.DAY * 60)
+
+        groups, days, averaged = MarketValueRecords.batch_average_by_day(
+            records_list, NOW, 20, ts_compressed=ts_compressed
+        )
+        for n_item, records in enumerate(records_list):
+            avgs = MarketValueRecords.average_by_day(
+                records, NOW, 20, return_mvr=True, ts_compressed=ts_compressed
+            )
+            self.assertListEqual(
+                [day for day, avg in enumerate(avgs) if avg],
+                days[groups == n_item].tolist(),
+            )
+            for name in MarketValueRecords.COLUMNS:
+                self.assertListEqual(
+                    [getattr(avg, name) for avg in avgs if avg],
+                    getattr(averaged, name)[groups == n_item].tolist(),
+                )
+
+        historicals, weighteds = MarketValueRecords.batch_market_value(
+            records_list, NOW, ts_compressed=ts_compressed
+        )
+        for records, historical, weighted in zip(records_list, historicals, weighteds):
+            self.assertEqual(
+                records.get_historical_market_value(NOW, ts_compressed=ts_compressed),
+                historical,
+            )
+            self.assertEqual(
+                records.get_weighted_market_value(NOW, ts_compressed=ts_compressed),
+                weighted,
+            )
+
+        historicals, weighteds = MarketValueRecords.batch_market_value(
+            records_list, NOW, historical=False
+        )
+        self.assertIsNone(historicals)
+        self.assertEqual(len(weighteds), len(records_list))
+
+        # two compressed records in the same day
+        records = records_list[-1]
+        records.add(records[15])
+        records.sort()
+        with self.assertRaises(CompressTsError):
+            MarketValueRecords.batch_average_by_day(
+                records_list, NOW, 60, ts_compressed=ts_compressed
+            )
+
     @classmethod
     def generate_records(
         cls,
@@ -0,0 +1,46 @@
+from unittest import TestCase
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import time
+
+from ah.throttle import TokenBucket
+
+
+class TestTokenBucket(TestCase):
+    def test_burst(self):
+        bucket = TokenBucket(1, capacity=3)
+        for _ in range(3):
+            self.assertTrue(bucket.try_acquire())
+
+        self.assertFalse(bucket.try_acquire())
+
+    def test_acquire_blocks(self):
+        bucket = TokenBucket(20, capacity=1)
+        ts_start = time.monotonic()
+        for _ in range(5):
+            bucket.acquire()
+
+        # first token is free, rest refill at 20 per second
+        self.assertGreaterEqual(time.monotonic() - ts_start, 4 / 20 * 0.9)
+
+    def test_threads(self):
+        bucket = TokenBucket(50, capacity=5)
+        ts_start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda _: bucket.acquire(), range(20)))
+
+        self.assertGreaterEqual(time.monotonic() - ts_start, 15 / 50 * 0.9)
+
+    def test_coroutines(self):
+        bucket = TokenBucket(50, capacity=5)
+
+        async def acquire_all():
+            await asyncio.gather(*(bucket.acquire_async() for _ in range(20)))
+
+        ts_start = time.monotonic()
+        asyncio.run(acquire_all())
+        self.assertGreaterEqual(time.monotonic() - ts_start, 15 / 50 * 0.9)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, TokenBucket, 0)
+        self.assertRaises(ValueError, TokenBucket(1, capacity=2).acquire, 3)
@@ -1,9 +1,12 @@
 from unittest import TestCase, mock
 from random import shuffle, randint
 from tempfile import TemporaryDirectory
+import asyncio
+import json
+import time
 import os
 
-from requests.exceptions import RetryError
+from requests.exceptions import HTTPError, RetryError, ConnectionError
 
 from ah.updater import Updater
 from ah.models import (
@@ -16,19 +19,40 @@ from ah.models import (
     Namespace,
     NameSpaceCategoriesEnum,
     DBTypeEnum,
+    DBExtEnum,
     RegionEnum,
     Meta,
     DBFileName,
+    DailyMarketValueSums,
 )
 from ah.db import DBHelper
 from ah.updater import main as updater_main, parse_args as updater_parse_args
 from ah.tsm_exporter import main as exporter_main, parse_args as exporter_parse_args
 from ah.fs import ensure_path
 from ah.defs import SECONDS_IN
+from ah.errors import NotModifiedError
 from ah.storage import BinaryFile
 
 
 class DummyAPIWrapper:
+    def __init__(self, snapshots=None):
+        # (connected_realm_id, auction_house_id) -> state committed, share it
+        # between instances to carry it over runs
+        self.snapshots = {} if snapshots is None else snapshots
+
+    def commit_validators(
+        self, region, connected_realm_id=None, auction_house_id=None, state=None
+    ):
+        self.snapshots[(connected_realm_id, auction_house_id)] = state
+
+    def get_validators_state(
+        self, region, connected_realm_id=None, auction_house_id=None
+    ):
+        return self.snapshots.get((connected_realm_id, auction_house_id))
+
+    def drop_validators(self, region, connected_realm_id=None, auction_house_id=None):
+        self.snapshots.pop((connected_realm_id, auction_house_id), None)
+
     def get_connected_realms_index(self, region):
         return {
             "connected_realms": [
@@ -127,6 +151,28 @@ class DummyAPIWrapper:
         }
 
 
+class AsyncDummyAPIWrapper(DummyAPIWrapper):
+    """`DummyAPIWrapper` with the coroutines of `BNAPI` used by updater"""
+
+    async def async_get_auctions_body(
+        self, region, connected_realm_id, auction_house_id=None
+    ):
+        # out of order completion
+        await asyncio.sleep(0.01 * (connected_realm_id % 3))
+        resp = self.get_auctions(region, connected_realm_id, auction_house_id)
+        return json.dumps(resp).encode()
+
+    async def async_get_commodities_body(self, region):
+        return json.dumps(self.get_commodities(region)).encode()
+
+    async def async_get_connected_realm(self, region, connected_realm_id):
+        await asyncio.sleep(0.01 * (connected_realm_id % 3))
+        return self.get_connected_realm(region, connected_realm_id)
+
+    async def async_close(self):
+        pass
+
+
 class TestWorkflow(TestCase):
     @classmethod
     def mock_request_commodities_single_item(cls, item_id, item_price_groups):
@@ -330,9 +376,136 @@ class TestWorkflow(TestCase):
                 "dynamic-us_auctions_1.gz",
                 "dynamic-us_auctions_2.gz",
                 "dynamic-us_commodities.gz",
+                # connected realm 2 is hardcore
+                "dynamic-us_region_default.gz",
+                "dynamic-us_region_hardcore.gz",
+            }
+            self.assertSetEqual(expected, files)
+
+    @mock.patch("time.time", return_value=1000)
+    def test_updater_fetch_workers(self, *args):
+        temp = TemporaryDirectory()
+        db_helper = DBHelper(temp.name)
+        updater = Updater(DummyAPIWrapper(), db_helper, fetch_workers=3)
+        namespace = Namespace.from_str("dynamic-classic-us")
+        crids = list(range(1, 10))
+        with temp:
+            updater.update_region_records(namespace, crids)
+            files = set(os.listdir(temp.name))
+            expected = {
+                f"dynamic-classic-us_auctions_{crid}_{faction}.gz"
+                for crid in crids
+                for faction in ("a", "h")
             }
             self.assertSetEqual(expected, files)
 
+    @mock.patch("time.time", return_value=1000)
+    def test_updater_fetch_async(self, *args):
+        namespace = Namespace.from_str("dynamic-us")
+        crids = list(range(1, 10))
+        for trusted_decode in (False, True):
+            contents = []
+            for bn_api, fetch_async in (
+                (DummyAPIWrapper(), False),
+                (AsyncDummyAPIWrapper(), True),
+            ):
+                with TemporaryDirectory() as temp:
+                    updater = Updater(
+                        bn_api,
+                        DBHelper(temp),
+                        fetch_workers=4,
+                        trusted_decode=trusted_decode,
+                        fetch_async=fetch_async,
+                    )
+                    updater.update_region_records(namespace, crids)
+                    content = {}
+                    for name in os.listdir(temp):
+                        with open(os.path.join(temp, name), "rb") as f:
+                            content[name] = f.read()
+
+                    contents.append(content)
+
+            self.assertEqual(len(contents[0]), len(crids) + 1)
+            self.assertEqual(contents[0], contents[1])
+
+        self.assertRaises(
+            ValueError,
+            Updater,
+            AsyncDummyAPIWrapper(),
+            DBHelper("db"),
+            stream=True,
+            fetch_async=True,
+        )
+
+    @mock.patch("time.time", return_value=1000)
+    def test_updater_fetch_async_errors(self, *args):
+        class FlakyAPI(AsyncDummyAPIWrapper):
+            async def async_get_auctions_body(
+                self, region, connected_realm_id, auction_house_id=None
+            ):
+                if connected_realm_id == 2:
+                    raise RetryError("too many 429 error responses")
+
+                if connected_realm_id == 3:
+                    raise ConnectionError("connection reset by peer")
+
+                if connected_realm_id == 4:
+                    return b'{"auctions": ['
+
+                return await super().async_get_auctions_body(
+                    region, connected_realm_id, auction_house_id
+                )
+
+            async def async_get_commodities_body(self, region):
+                raise ConnectionError("connection reset by peer")
+
+        namespace = Namespace.from_str("dynamic-us")
+        for trusted_decode in (False, True):
+            with TemporaryDirectory() as temp:
+                updater = Updater(
+                    FlakyAPI(),
+                    DBHelper(temp),
+                    trusted_decode=trusted_decode,
+                    fetch_async=True,
+                )
+                updater.update_region_records(namespace, [1, 2, 3, 4, 5])
+                # failed snapshots don't stop the others
+                for crid, n_items in ((1, 1), (2, 0), (3, 0), (4, 0), (5, 1)):
+                    file = BinaryFile(f"{temp}/dynamic-us_auctions_{crid}.gz", True)
+                    records = MapItemStringMarketValueRecords.from_file(file)
+                    self.assertEqual(len(records), n_items)
+
+                file = BinaryFile(f"{temp}/dynamic-us_commodities.gz", True)
+                records = MapItemStringMarketValueRecords.from_file(file)
+                self.assertEqual(len(records), 0)
+
+    def test_meta_from_api_concurrent(self):
+        class ManyRealmsAPI(AsyncDummyAPIWrapper):
+            def get_connected_realms_index(self, region):
+                return {
+                    "connected_realms": [
+                        {"href": f"https://x/data/wow/connected-realm/{crid}"}
+                        for crid in range(1, 30)
+                    ]
+                }
+
+            def get_connected_realm(self, region, connected_realm_id):
+                if connected_realm_id % 7 == 0:
+                    raise HTTPError("404 Client Error: Not Found")
+
+                return super().get_connected_realm(region, connected_realm_id)
+
+        namespace = Namespace.from_str("dynamic-us")
+        bn_api = ManyRealmsAPI()
+        expected = Meta.from_api(bn_api, namespace)
+        crids = [crid for crid in range(1, 30) if crid % 7]
+        self.assertListEqual(list(expected.get_connected_realm_ids()), crids)
+        for kwargs in ({"workers": 8}, {"workers": 8, "fetch_async": True}):
+            meta = Meta.from_api(bn_api, namespace, **kwargs)
+            self.assertEqual(meta._data, expected._data)
+            # same order
+            self.assertListEqual(list(meta.get_connected_realm_ids()), crids)
+
     def test_updater_parse_args(self):
         raw_args = [
             "--db_path",
@@ -345,6 +518,27 @@ class TestWorkflow(TestCase):
         self.assertEqual(args.region, RegionEnum.US)
         self.assertEqual(args.db_path, "db")
         self.assertEqual(args.game_version, GameVersionEnum.CLASSIC_WLK)
+        self.assertEqual(args.fetch_workers, 1)
+        self.assertFalse(args.stream)
+        self.assertFalse(args.append_segments)
+
+        args = updater_parse_args(["--fetch_workers", "4", "us"])
+        self.assertEqual(args.fetch_workers, 4)
+        self.assertRaises(
+            ValueError, updater_parse_args, ["--fetch_workers", "0", "us"]
+        )
+        args = updater_parse_args(["--parse_workers", "2", "us"])
+        self.assertEqual(args.parse_workers, 2)
+        args = updater_parse_args(["--append_segments", "us"])
+        self.assertTrue(args.append_segments)
+        self.assertRaises(
+            ValueError, updater_parse_args, ["--parse_workers", "0", "us"]
+        )
+        args = updater_parse_args(["--fetch_async", "--fetch_workers", "200", "us"])
+        self.assertTrue(args.fetch_async)
+        self.assertRaises(
+            ValueError, updater_parse_args, ["--fetch_async", "--stream", "us"]
+        )
 
     def test_exporter_parse_args(self):
         wow_folders = [
@@ -438,6 +632,311 @@ class TestWorkflow(TestCase):
             for expected, count in expected_occurances:
                 self.assertEqual(content.count(expected), count)
 
+    def test_update_and_export_db_ext(self):
+        """every db file format exports the same data"""
+        contents = {}
+        for db_ext in ("gz", "zst", "mmap"):
+            temp = TemporaryDirectory()
+            db_path = f"{temp.name}/db"
+            with temp:
+                wow_base = f"{temp.name}/wow"
+                ensure_path(f"{wow_base}/_retail_")
+                lua_path = (
+                    f"{wow_base}/_retail_/Interface/AddOns/"
+                    "TradeSkillMaster_AppHelper/AppData.lua"
+                )
+                # second update appends a segment to each db file
+                for ts in (1000, 2000):
+                    raw_args = ["--db_path", db_path, "--db_ext", db_ext, "us"]
+                    args = updater_parse_args(raw_args)
+                    with mock.patch("time.time", return_value=ts):
+                        updater_main(**vars(args), bn_api=DummyAPIWrapper())
+
+                # region aggregates have no mmap layout
+                self.assertSetEqual(
+                    {f.rsplit(".", 1)[1] for f in os.listdir(db_path)},
+                    {"json", db_ext, "bin" if db_ext == "mmap" else db_ext},
+                )
+                raw_args = [
+                    "--db_path",
+                    db_path,
+                    "--db_ext",
+                    db_ext,
+                    "--warcraft_base",
+                    wow_base,
+                    "us",
+                    "realm11",
+                    "realm21",
+                ]
+                args = exporter_parse_args(raw_args)
+                self.assertEqual(args.db_ext, DBExtEnum(db_ext))
+                exporter_main(**vars(args))
+                with open(lua_path) as f:
+                    contents[db_ext] = f.read()
+
+        self.assertIn("AUCTIONDB_REALM_DATA", contents["gz"])
+        self.assertEqual(contents["gz"], contents["zst"])
+        self.assertEqual(contents["gz"], contents["mmap"])
+
+    def test_update_and_export_region_sums(self):
+        """region data exported from aggregates kept by the updater is the same
+        as from db files of every realm
+        """
+        temp = TemporaryDirectory()
+        db_path = f"{temp.name}/db"
+        with temp:
+            wow_base = f"{temp.name}/wow"
+            ensure_path(f"{wow_base}/_retail_")
+            lua_path = (
+                f"{wow_base}/_retail_/Interface/AddOns/"
+                "TradeSkillMaster_AppHelper/AppData.lua"
+            )
+            region_files = [
+                f"{db_path}/dynamic-us_region_default.gz",
+                f"{db_path}/dynamic-us_region_hardcore.gz",
+            ]
+
+            def update(ts):
+                args = updater_parse_args(["--db_path", db_path, "us"])
+                with mock.patch("time.time", return_value=ts):
+                    updater_main(**vars(args), bn_api=DummyAPIWrapper())
+
+            def export():
+                raw_args = [
+                    "--db_path",
+                    db_path,
+                    "--warcraft_base",
+                    wow_base,
+                    "us",
+                    "realm11",
+                    "realm21",
+                ]
+                exporter_main(**vars(exporter_parse_args(raw_args)))
+                with open(lua_path) as f:
+                    return f.read()
+
+            update(1000)
+            # increment added to the aggregate
+            update(2000)
+            sums = DailyMarketValueSums.from_file(BinaryFile(region_files[0], True))
+            self.assertEqual(sums.ts_updated, 2000)
+            # realm db files aren't summed up again
+            with mock.patch.object(DailyMarketValueSums, "add") as add:
+                content = export()
+                add.assert_not_called()
+
+            self.assertIn("AUCTIONDB_REGION_HISTORICAL", content)
+            for file_path in region_files:
+                os.remove(file_path)
+
+            self.assertEqual(export(), content)
+
+            # rebuilt from db files
+            update(3000)
+            self.assertTrue(all(map(os.path.exists, region_files)))
+            content = export()
+            for file_path in region_files:
+                os.remove(file_path)
+
+            self.assertEqual(export(), content)
+
+    def test_region_sums_weigh_realms_by_day(self):
+        """a finished day weighs every realm the same in the region aggregate,
+        however many updates it had, same as in one rebuilt from db files
+        """
+
+        class API(DummyAPIWrapper):
+            def get_connected_realm(self, region, connected_realm_id):
+                resp = super().get_connected_realm(region, connected_realm_id)
+                for realm in resp["realms"]:
+                    realm["category"] = ""
+
+                return resp
+
+            def get_auctions(self, region, connected_realm_id, auction_house_id=None):
+                # realm 2 only gets updated twice a day
+                if connected_realm_id == 2 and time.time() % (12 * 3600) != 1000:
+                    raise HTTPError()
+
+                resp = super().get_auctions(region, connected_realm_id)
+                resp["auctions"] = resp["auctions"][:1]
+                resp["auctions"][0]["buyout"] = connected_realm_id * 100
+                return resp
+
+            def get_commodities(self, region):
+                return {"_links": {}, "auctions": []}
+
+        temp = TemporaryDirectory()
+        db_path = f"{temp.name}/db"
+        with temp, mock.patch("time.time") as time_:
+            args = updater_parse_args(["--db_path", db_path, "us"])
+            for ts in [1000 + hour * 3600 for hour in range(24)] + [
+                SECONDS_IN.DAY + 1000
+            ]:
+                time_.return_value = ts
+                updater_main(**vars(args), bn_api=API())
+
+            sums = DailyMarketValueSums.from_file(
+                BinaryFile(f"{db_path}/dynamic-us_region_default.gz", True)
+            )
+            rebuilt = DailyMarketValueSums(sums.ts_now, n_days=sums.n_days)
+            for name in ("auctions_1", "auctions_2", "commodities"):
+                rebuilt.add(
+                    MapItemStringMarketValueRecords.from_file(
+                        BinaryFile(f"{db_path}/dynamic-us_{name}.gz", True)
+                    )
+                )
+
+            self.assertListEqual(list(sums.keys()), list(rebuilt.keys()))
+            for market_values, expected in zip(
+                sums.batch_market_value(), rebuilt.batch_market_value()
+            ):
+                self.assertListEqual(market_values.tolist(), expected.tolist())
+                self.assertListEqual(market_values.tolist(), [150])
+
+    def test_updater_not_modified(self):
+        """snapshots not modified since last update aren't parsed, their latest
+        records are repeated
+        """
+
+        class NotModifiedAPI(DummyAPIWrapper):
+            def get_auctions(self, region, connected_realm_id, auction_house_id=None):
+                if connected_realm_id == 1:
+                    raise NotModifiedError()
+
+                return super().get_auctions(region, connected_realm_id)
+
+        temp = TemporaryDirectory()
+        db_path = f"{temp.name}/db"
+        snapshots = {}
+        with temp:
+            args = updater_parse_args(["--db_path", db_path, "--conditional", "us"])
+            self.assertTrue(args.conditional)
+            for ts in (1000, 1500):
+                with mock.patch("time.time", return_value=ts):
+                    updater_main(**vars(args), bn_api=DummyAPIWrapper(snapshots))
+
+            # increments saved are committed with validators
+            self.assertSetEqual(set(snapshots), {(1, None), (2, None), (None, None)})
+
+            db_files = [f"{db_path}/dynamic-us_auctions_{crid}.gz" for crid in (1, 2)]
+            sizes = [os.path.getsize(file_path) for file_path in db_files]
+            with mock.patch("time.time", return_value=2000), mock.patch.object(
+                MapItemStringMarketValueRecord,
+                "from_response",
+                wraps=MapItemStringMarketValueRecord.from_response,
+            ) as from_response:
+                updater_main(**vars(args), bn_api=NotModifiedAPI(snapshots))
+                # crid 2 and commodities
+                self.assertEqual(from_response.call_count, 2)
+
+            # both got new records, crid 1 the records at 1500 again
+            self.assertGreater(os.path.getsize(db_files[0]), sizes[0])
+            self.assertGreater(os.path.getsize(db_files[1]), sizes[1])
+            db = MapItemStringMarketValueRecords.from_file(
+                BinaryFile(db_files[0], True)
+            )
+            for records in db.values():
+                self.assertListEqual(records.timestamp.tolist(), [1000, 1500, 2000])
+                self.assertEqual(records[-1].market_value, records[-2].market_value)
+                self.assertEqual(records[-1].min_buyout, records[-2].min_buyout)
+
+            meta_file = DBHelper(db_path).get_file(
+                Namespace.from_str("dynamic-us"), DBTypeEnum.META
+            )
+            meta = Meta.from_file(meta_file)
+            self.assertListEqual(meta.get_update_unchanged(), [(1, None)])
+
+            # due for compaction even if not modified, records of crid 1 from the
+            # day before are compressed into one, followed by the repeated one
+            with mock.patch("time.time", return_value=SECONDS_IN.DAY + 1000):
+                updater_main(**vars(args), bn_api=NotModifiedAPI(snapshots))
+
+            db_file = BinaryFile(db_files[0], True)
+            db = MapItemStringMarketValueRecords.from_file(db_file)
+            self.assertListEqual(
+                db[next(iter(db.keys()))].timestamp.tolist(),
+                [SECONDS_IN.DAY // 2, SECONDS_IN.DAY + 1000],
+            )
+
+            # no db file to repeat records into, fetched without validators
+            db_file.remove()
+            bn_api = DummyAPIWrapper(snapshots)
+            with mock.patch.object(
+                bn_api, "drop_validators", wraps=bn_api.drop_validators
+            ) as drop_validators, mock.patch(
+                "time.time", return_value=SECONDS_IN.DAY + 2000
+            ):
+                updater_main(**vars(args), bn_api=bn_api)
+                drop_validators.assert_called_once_with(
+                    mock.ANY, connected_realm_id=1, auction_house_id=None
+                )
+
+            # no increment to repeat, nothing committed for a failed snapshot
+            snapshots.clear()
+            with mock.patch(
+                "time.time", return_value=SECONDS_IN.DAY + 3000
+            ), mock.patch.object(
+                MapItemStringMarketValueRecord,
+                "from_response",
+                return_value=MapItemStringMarketValueRecord(),
+            ):
+                updater_main(**vars(args), bn_api=NotModifiedAPI(snapshots))
+
+            self.assertDictEqual(snapshots, {})
+            db = MapItemStringMarketValueRecords.from_file(db_file)
+            self.assertListEqual(
+                db[next(iter(db.keys()))].timestamp.tolist(), [SECONDS_IN.DAY + 2000]
+            )
+
+    def test_update_not_modified_and_export(self):
+        """export after snapshots not modified is the same as if they were"""
+
+        class NotModifiedAPI(DummyAPIWrapper):
+            def get_auctions(self, region, connected_realm_id, auction_house_id=None):
+                raise NotModifiedError()
+
+            def get_commodities(self, region):
+                raise NotModifiedError()
+
+        contents = []
+        for api_cls in (DummyAPIWrapper, NotModifiedAPI):
+            snapshots = {}
+            temp = TemporaryDirectory()
+            with temp:
+                db_path = f"{temp.name}/db"
+                wow_base = f"{temp.name}/wow"
+                ensure_path(f"{wow_base}/_retail_")
+                args = updater_parse_args(
+                    ["--db_path", db_path, "--conditional", "us"]
+                )
+                with mock.patch("time.time", return_value=1000):
+                    updater_main(**vars(args), bn_api=DummyAPIWrapper(snapshots))
+
+                with mock.patch("time.time", return_value=2000):
+                    updater_main(**vars(args), bn_api=api_cls(snapshots))
+
+                raw_args = [
+                    "--db_path",
+                    db_path,
+                    "--warcraft_base",
+                    wow_base,
+                    "us",
+                    "realm11",
+                    "realm21",
+                ]
+                exporter_main(**vars(exporter_parse_args(raw_args)))
+                lua_path = (
+                    f"{wow_base}/_retail_/Interface/AddOns/"
+                    "TradeSkillMaster_AppHelper/AppData.lua"
+                )
+                with open(lua_path) as f:
+                    contents.append(f.read())
+
+        self.assertIn("AUCTIONDB_REALM_DATA", contents[0])
+        self.assertIn("AUCTIONDB_REGION_COMMODITY", contents[0])
+        self.assertEqual(contents[0], contents[1])
+
     def test_update_and_export_hc(self):
         temp = TemporaryDirectory()
         wow_folder = "_classic_era_"
@@ -670,7 +1169,9 @@ class TestWorkflow(TestCase):
                         "end_ts": 2,
                         "duration": 1,
                     },
-                    "connected_realms": {100: [100, 101]},
+                    "connected_realms": {
+                        100: [{"name": "realm100"}, {"name": "realm101"}]
+                    },
                     "system": {},
                 }
             )